@@ -0,0 +1,247 @@
+"""
+PostgreSQL COPY-based ingest path for bulk loads.
+
+For imports of hundreds of thousands or millions of rows (e.g. migrating a
+customer's history) even `bulk_create` spends most of its time in the ORM. This
+path streams the parsed rows into a temporary staging table with
+`COPY FROM STDIN`, merges them into the transactions table with a single
+`INSERT ... SELECT` that skips known fingerprints, and updates balances from a
+grouped aggregate of the rows that were actually inserted.
+"""
+import csv
+import io
+from collections import Counter
+
+from django.db import connection, transaction
+
+from .ingest import assign_fingerprints, plan_category_accounts, resolve_category_account
+from .models import Account, Transaction, TransactionStatus
+from .numbering import reserve_account_numbers
+
+STAGING_TABLE = 'transaction_import_staging'
+CATEGORY_MAP_TABLE = 'transaction_import_categories'
+
+STAGING_COLUMNS = [
+    'row_index', 'date', 'amount', 'notes', 'category', 'category_key',
+    'fingerprint', 'fingerprint_occurrence',
+]
+
+NOTES_MAX_LENGTH = Transaction._meta.get_field('notes').max_length
+
+
+def supports_copy_ingest():
+    """The COPY path is only available on PostgreSQL."""
+    return connection.vendor == 'postgresql'
+
+
+class _CopyStream:
+    """Read-only file-like object that renders CSV lines on demand for COPY."""
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buffer = ''
+
+    def read(self, size=-1):
+        while size is None or size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+
+        if size is None or size < 0:
+            data, self._buffer = self._buffer, ''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
+def _iter_staging_lines(selected_account, rows):
+    """
+    Render each row as a CSV line for the staging table.
+
+    This runs while COPY owns the connection, so it must not query the database;
+    category accounts are resolved after the COPY from the distinct staged names.
+    """
+    occurrences = Counter()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    for row in rows:
+        assign_fingerprints(selected_account.id, [row], occurrences)
+        category = row.get('category') or ''
+
+        writer.writerow([
+            row['row_index'],
+            row['date'].isoformat(),
+            row['amount'],
+            (row.get('description') or '')[:NOTES_MAX_LENGTH],
+            category,
+            category.casefold(),
+            row['fingerprint'],
+            row['fingerprint_occurrence'],
+        ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _resolve_staged_categories(cursor, user, results):
+    """
+    Find or create the category account of every distinct staged category.
+
+    Named categories take their type from the first row that uses them, as in
+    the row-by-row importer. Returns (category_key, is_positive, account_id)
+    tuples; is_positive is only meaningful for the default ('') category.
+    """
+    cursor.execute(f"""
+        SELECT DISTINCT ON (category_key) category_key, category, amount > 0
+        FROM {STAGING_TABLE}
+        WHERE category_key <> ''
+        ORDER BY category_key, row_index
+    """)
+    named = cursor.fetchall()
+
+    cursor.execute(f"SELECT DISTINCT amount > 0 FROM {STAGING_TABLE} WHERE category_key = ''")
+    defaults = [row[0] for row in cursor.fetchall()]
+
+    # Reserve account numbers for all new categories at once
+    planned = [{'category': category, 'amount': 1 if is_positive else -1} for _, category, is_positive in named]
+    planned += [{'category': None, 'amount': 1 if is_positive else -1} for is_positive in defaults]
+    new_accounts = len(plan_category_accounts(user, planned)['new'])
+    numbers = iter(reserve_account_numbers(user, new_accounts)) if new_accounts else None
+
+    category_accounts = {}
+    mapping = []
+    for category_key, category, is_positive in named:
+        try:
+            account = resolve_category_account(user, category, is_positive, category_accounts, numbers)
+        except Exception as e:
+            results['errors'].append(f"Category '{category}': Error processing category - {str(e)}")
+            continue
+        mapping.append((category_key, is_positive, account.id))
+
+    for is_positive in defaults:
+        account = resolve_category_account(user, None, is_positive, category_accounts, numbers)
+        mapping.append(('', is_positive, account.id))
+
+    return mapping
+
+
+def copy_ingest_transactions(user, selected_account, rows, results):
+    """
+    Create transactions from parsed statement rows using COPY, skipping duplicates.
+
+    Takes the same arguments as `accounts.ingest.ingest_transactions` and
+    updates `results` the same way. The whole load runs in one database
+    transaction: either every new row is inserted and balances are updated, or
+    nothing is.
+
+    Returns:
+        dict: The updated results dictionary
+    """
+    transaction_table = Transaction._meta.db_table
+    account_table = Account._meta.db_table
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE TEMPORARY TABLE {STAGING_TABLE} (
+                row_index integer NOT NULL,
+                date date NOT NULL,
+                amount numeric(10, 2) NOT NULL,
+                notes varchar({NOTES_MAX_LENGTH}) NOT NULL,
+                category text NOT NULL,
+                category_key text NOT NULL,
+                fingerprint varchar(64) NOT NULL,
+                fingerprint_occurrence integer NOT NULL
+            ) ON COMMIT DROP
+        """)
+        cursor.execute(f"""
+            CREATE TEMPORARY TABLE {CATEGORY_MAP_TABLE} (
+                category_key text NOT NULL,
+                is_positive boolean NOT NULL,
+                account_id bigint NOT NULL
+            ) ON COMMIT DROP
+        """)
+
+        stream = _CopyStream(_iter_staging_lines(selected_account, rows))
+        cursor.cursor.copy_expert(
+            f"COPY {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) FROM STDIN "
+            f"WITH (FORMAT csv, FORCE_NOT_NULL (notes, category, category_key))",
+            stream
+        )
+
+        cursor.execute(f"SELECT COUNT(*) FROM {STAGING_TABLE}")
+        staged = cursor.fetchone()[0]
+
+        mapping = _resolve_staged_categories(cursor, user, results)
+        cursor.executemany(
+            f"INSERT INTO {CATEGORY_MAP_TABLE} (category_key, is_positive, account_id) VALUES (%s, %s, %s)",
+            mapping
+        )
+
+        # Merge new rows and apply their balance deltas in one statement. Rows
+        # whose fingerprint is already stored are skipped; ON CONFLICT covers a
+        # concurrent import of the same statement.
+        #
+        # For positive amounts the selected account is debited and the category
+        # credited; for negative amounts the other way round.
+        cursor.execute(f"""
+            WITH inserted AS (
+                INSERT INTO {transaction_table} (
+                    date, updated, amount, debit_id, credit_id, notes,
+                    is_reconciled, status, user_id, fingerprint, fingerprint_occurrence
+                )
+                SELECT s.date, now(), abs(s.amount),
+                       CASE WHEN s.amount > 0 THEN %(account_id)s ELSE m.account_id END,
+                       CASE WHEN s.amount > 0 THEN m.account_id ELSE %(account_id)s END,
+                       s.notes, false, %(status)s, %(user_id)s, s.fingerprint, s.fingerprint_occurrence
+                FROM {STAGING_TABLE} s
+                JOIN {CATEGORY_MAP_TABLE} m
+                  ON m.category_key = s.category_key
+                 AND (s.category_key <> '' OR m.is_positive = (s.amount > 0))
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {transaction_table} t
+                    WHERE t.fingerprint = s.fingerprint
+                      AND t.fingerprint_occurrence = s.fingerprint_occurrence
+                )
+                ORDER BY s.row_index
+                ON CONFLICT ON CONSTRAINT unique_transaction_fingerprint DO NOTHING
+                RETURNING debit_id, credit_id, amount
+            ),
+            deltas AS (
+                SELECT account_id, SUM(debit_total) AS debit_total, SUM(credit_total) AS credit_total
+                FROM (
+                    SELECT debit_id AS account_id, amount AS debit_total, 0 AS credit_total FROM inserted
+                    UNION ALL
+                    SELECT credit_id AS account_id, 0 AS debit_total, amount AS credit_total FROM inserted
+                ) entries
+                GROUP BY account_id
+            ),
+            balances AS (
+                UPDATE {account_table} a
+                SET balance = COALESCE(a.balance, 0) + CASE
+                    WHEN a.type IN ('Asset', 'Expense', 'Goal') THEN d.debit_total - d.credit_total
+                    WHEN a.type IN ('Liability', 'Income', 'Equity') THEN d.credit_total - d.debit_total
+                    ELSE 0
+                END
+                FROM deltas d
+                WHERE a.id = d.account_id
+                RETURNING a.id
+            )
+            SELECT
+                (SELECT COUNT(*) FROM inserted),
+                (SELECT COUNT(*) FROM {STAGING_TABLE} s
+                 WHERE NOT EXISTS (SELECT 1 FROM {CATEGORY_MAP_TABLE} m
+                                   WHERE m.category_key = s.category_key
+                                     AND (s.category_key <> '' OR m.is_positive = (s.amount > 0)))),
+                (SELECT COUNT(*) FROM balances)
+        """, {'account_id': selected_account.id, 'status': TransactionStatus.REVIEW, 'user_id': user.id})
+        inserted, unresolved, _ = cursor.fetchone()
+
+    results['success'] += inserted
+    results['failed'] += unresolved
+    results['duplicates'] += staged - inserted - unresolved
+    return results
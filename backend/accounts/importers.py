@@ -0,0 +1,279 @@
+"""
+Streaming parsers for bank statement formats other than CSV.
+
+Each parser reads a text stream incrementally and yields the same row
+dictionaries as `accounts.tasks.iter_csv_rows`, so every format goes through
+`accounts.ingest.ingest_transactions`. Nothing holds more than one read buffer
+and one transaction in memory, so multi-year exports import in constant memory.
+"""
+import html
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from .tasks import parse_date
+
+# Characters read from the stream per refill of the OFX tokenizer buffer
+OFX_READ_SIZE = 64 * 1024
+
+# QIF sections that contain bank-style transactions. Other sections (!Account,
+# !Type:Cat, !Type:Class, !Type:Memorized, !Type:Invst...) are skipped.
+QIF_TRANSACTION_TYPES = {'bank', 'cash', 'ccard', 'oth a', 'oth l'}
+
+
+def detect_statement_format(filename, head):
+    """
+    Detect the format of a statement file.
+
+    Args:
+        filename: The uploaded file name (may be empty)
+        head: The first few hundred characters of the file
+
+    Returns:
+        'ofx', 'qif', 'csv' or None if the format could not be detected
+    """
+    name = (filename or '').lower()
+    if name.endswith(('.ofx', '.qfx')):
+        return 'ofx'
+    if name.endswith('.qif'):
+        return 'qif'
+    if name.endswith('.csv'):
+        return 'csv'
+
+    sample = head.lstrip('\ufeff \r\n\t').upper()
+    if sample.startswith('OFXHEADER') or '<OFX>' in sample:
+        return 'ofx'
+    if sample.startswith('!TYPE') or sample.startswith('!ACCOUNT') or sample.startswith('!OPTION'):
+        return 'qif'
+    return None
+
+
+def _iter_ofx_tokens(stream):
+    """
+    Tokenize an OFX document (SGML or XML variant).
+
+    Yields ('open', TAG), ('close', TAG) and ('text', value) tuples. SGML leaf
+    elements have no closing tag, so consumers treat the text after an opening
+    tag as its value. Headers, processing instructions and comments are skipped.
+    """
+    buffer = ''
+    while True:
+        chunk = stream.read(OFX_READ_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+
+        pos = 0
+        while True:
+            start = buffer.find('<', pos)
+            if start == -1:
+                break
+            end = buffer.find('>', start)
+            if end == -1:
+                # The tag continues in the next chunk
+                break
+
+            text = buffer[pos:start].strip()
+            if text:
+                yield ('text', html.unescape(text))
+
+            tag = buffer[start + 1:end].strip()
+            pos = end + 1
+            if not tag or tag[0] in '?!':
+                continue
+            if tag.startswith('/'):
+                yield ('close', tag[1:].strip().upper())
+            elif tag.endswith('/'):
+                name = tag[:-1].split()[0].upper()
+                yield ('open', name)
+                yield ('close', name)
+            else:
+                yield ('open', tag.split()[0].upper())
+
+        buffer = buffer[pos:]
+
+    text = buffer.strip()
+    if text:
+        yield ('text', html.unescape(text))
+
+
+def _parse_ofx_date(value):
+    """Parse an OFX date such as 20240131, 20240131120000 or 20240131120000.000[-5:EST]."""
+    return datetime.strptime(value[:8], '%Y%m%d').date()
+
+
+def _parse_ofx_amount(value):
+    # The OFX spec allows a comma as the decimal separator
+    return Decimal(value.strip().replace(',', '.'))
+
+
+def iter_ofx_rows(stream, results):
+    """
+    Parse the transactions of an OFX/QFX statement.
+
+    Args:
+        stream: A text stream positioned at the start of the file
+        results (dict): The import results dictionary, updated in place
+
+    Yields:
+        dict: Parsed rows; the bank's FITID is passed on as `external_id`
+    """
+    txn = None
+    field = None
+    row_index = 0
+
+    for kind, value in _iter_ofx_tokens(stream):
+        if kind == 'open':
+            if value == 'STMTTRN':
+                txn = {}
+                row_index += 1
+            elif txn is not None:
+                field = value
+            continue
+
+        if kind == 'close':
+            if value == 'STMTTRN' and txn is not None:
+                row = _build_ofx_row(txn, row_index, results)
+                if row is not None:
+                    yield row
+                txn = None
+            field = None
+            continue
+
+        # Text: the value of the most recently opened leaf element. Nested
+        # aggregates (e.g. <PAYEE><NAME>) never override a top-level value.
+        if txn is not None and field:
+            txn.setdefault(field, value)
+            field = None
+
+
+def _build_ofx_row(txn, row_index, results):
+    results['total'] += 1
+
+    date_str = txn.get('DTPOSTED') or txn.get('DTUSER')
+    amount_str = txn.get('TRNAMT')
+    if not date_str or not amount_str:
+        results['failed'] += 1
+        results['errors'].append(f"Transaction {row_index}: Missing required fields")
+        return None
+
+    try:
+        parsed_date = _parse_ofx_date(date_str)
+    except ValueError:
+        results['failed'] += 1
+        results['errors'].append(f"Transaction {row_index}: Invalid date format '{date_str}'")
+        return None
+
+    try:
+        amount = _parse_ofx_amount(amount_str)
+    except InvalidOperation:
+        results['failed'] += 1
+        results['errors'].append(f"Transaction {row_index}: Error parsing amount '{amount_str}'")
+        return None
+
+    return {
+        'row_index': row_index,
+        'date': parsed_date,
+        'amount': amount,
+        'description': txn.get('NAME') or txn.get('MEMO') or '',
+        'category': None,
+        'external_id': txn.get('FITID'),
+    }
+
+
+def _parse_qif_date(value):
+    """Parse a QIF date such as 01/31/2024, 1/31/24 or 1/31'24."""
+    value = value.replace("'", '/').replace(' ', '')
+    parsed = parse_date(value)
+    if parsed is not None:
+        return parsed
+
+    for date_format in ['%m/%d/%y', '%d/%m/%y', '%m-%d-%y', '%d.%m.%Y', '%d.%m.%y']:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+
+    return None
+
+
+def iter_qif_rows(stream, results):
+    """
+    Parse the transactions of a QIF file.
+
+    Args:
+        stream: A text stream positioned at the start of the file
+        results (dict): The import results dictionary, updated in place
+
+    Yields:
+        dict: Parsed rows
+    """
+    record = {}
+    row_index = 0
+    # Files without a !Type header are treated as bank transactions
+    in_transactions = True
+
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.startswith('!'):
+            header = line[1:].lower()
+            if header.startswith('type:'):
+                in_transactions = header[len('type:'):].strip() in QIF_TRANSACTION_TYPES
+            elif header.startswith('account'):
+                in_transactions = False
+            record = {}
+            continue
+
+        code, value = line[0], line[1:].strip()
+        if code == '^':
+            if in_transactions and record:
+                row_index += 1
+                row = _build_qif_row(record, row_index, results)
+                if row is not None:
+                    yield row
+            record = {}
+        elif code in 'DTUPML' and code not in record:
+            record[code] = value
+
+    if in_transactions and record:
+        row_index += 1
+        row = _build_qif_row(record, row_index, results)
+        if row is not None:
+            yield row
+
+
+def _build_qif_row(record, row_index, results):
+    results['total'] += 1
+
+    date_str = record.get('D')
+    amount_str = record.get('T') or record.get('U')
+    if not date_str or not amount_str:
+        results['failed'] += 1
+        results['errors'].append(f"Transaction {row_index}: Missing required fields")
+        return None
+
+    parsed_date = _parse_qif_date(date_str)
+    if parsed_date is None:
+        results['failed'] += 1
+        results['errors'].append(f"Transaction {row_index}: Invalid date format '{date_str}'")
+        return None
+
+    try:
+        amount = Decimal(amount_str.replace('$', '').replace(',', ''))
+    except InvalidOperation:
+        results['failed'] += 1
+        results['errors'].append(f"Transaction {row_index}: Error parsing amount '{amount_str}'")
+        return None
+
+    # L holds "Category:Subcategory/Class"; transfers are written as [Account]
+    category = record.get('L', '').split('/')[0].strip('[] ') or None
+
+    return {
+        'row_index': row_index,
+        'date': parsed_date,
+        'amount': amount,
+        'description': record.get('P') or record.get('M') or '',
+        'category': category,
+    }
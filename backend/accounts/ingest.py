@@ -0,0 +1,266 @@
+"""
+Batched ingestion of parsed statement rows into transactions.
+
+Importers (CSV, OFX/QFX and QIF) parse a file into plain row dictionaries and hand them
+to `ingest_transactions`, which resolves category accounts, skips rows that were
+already imported and writes the rest in chunks with `bulk_create`.
+"""
+import hashlib
+import re
+from collections import Counter
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+
+from .models import Account, Transaction
+from .signals import update_account_balances
+
+# Number of rows looked up and written per round trip
+DEFAULT_CHUNK_SIZE = 500
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_description(description):
+    """Normalize a description so cosmetic differences don't defeat dedupe."""
+    if not description:
+        return ''
+    return _WHITESPACE_RE.sub(' ', description).strip().casefold()
+
+
+def compute_fingerprint(account_id, date, amount, description):
+    """
+    Compute the duplicate-detection fingerprint of an imported row.
+
+    Args:
+        account_id: The ID of the account the statement belongs to
+        date: The transaction date
+        amount: The signed amount as it appears on the statement
+        description: The raw description
+
+    Returns:
+        str: A hex SHA-256 digest
+    """
+    key = '|'.join([
+        str(account_id),
+        date.isoformat(),
+        f"{amount:.2f}",
+        normalize_description(description),
+    ])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def compute_external_fingerprint(account_id, external_id):
+    """
+    Compute the fingerprint of a row that carries a bank-provided ID (OFX FITID).
+
+    The bank's ID is stable across exports even when descriptions change, so it
+    is used as the dedupe key instead of the row contents.
+    """
+    key = f"{account_id}|id|{external_id}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def ingest_transactions(user, selected_account, rows, results, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Create transactions from parsed statement rows, skipping duplicates.
+
+    Args:
+        user: The user who owns the transactions
+        selected_account: The account the statement belongs to
+        rows: Iterable of dicts with keys `row_index`, `date`, `amount` (signed
+            Decimal), `description` and `category`. Rows with an `external_id`
+            are deduplicated on it; others on a fingerprint of their contents.
+        results: The import results dictionary, updated in place
+            ('success', 'duplicates', 'failed', 'errors')
+        chunk_size: Number of rows per existence lookup and bulk insert
+
+    Returns:
+        dict: The updated results dictionary
+    """
+    # Occurrences are counted across the whole import, in file order, so that
+    # re-importing an overlapping statement maps identical rows to the same keys
+    occurrences = Counter()
+    category_accounts = {}
+
+    for chunk in _chunked(rows, chunk_size):
+        _ingest_chunk(user, selected_account, chunk, results, occurrences, category_accounts)
+
+    return results
+
+
+def resolve_category_account(user, category, is_positive, category_accounts, numbers=None):
+    """
+    Find or create a category account, memoized for the duration of an import.
+
+    `numbers` is an optional iterator of reserved account numbers; new accounts
+    take the next one instead of allocating their own.
+    """
+    from .tasks import find_or_create_category_account
+
+    # Named categories are matched by name regardless of direction; the
+    # defaults depend on whether money is coming in or going out
+    key = ('name', category.casefold()) if category else ('default', is_positive)
+    if key not in category_accounts:
+        num = next(numbers, None) if numbers is not None else None
+        category_accounts[key] = find_or_create_category_account(user, category, is_positive, num=num)
+    return category_accounts[key]
+
+
+def assign_fingerprints(account_id, rows, occurrences):
+    """Set `fingerprint` and `fingerprint_occurrence` on each row, in order."""
+    for row in rows:
+        if row.get('external_id'):
+            row['fingerprint'] = compute_external_fingerprint(account_id, row['external_id'])
+        else:
+            row['fingerprint'] = compute_fingerprint(
+                account_id, row['date'], row['amount'], row.get('description')
+            )
+        occurrences[row['fingerprint']] += 1
+        row['fingerprint_occurrence'] = occurrences[row['fingerprint']]
+
+
+def find_existing_fingerprints(rows):
+    """Return the (fingerprint, occurrence) pairs of `rows` that are already stored."""
+    # One set-based lookup for the whole chunk
+    return set(
+        Transaction.objects.filter(
+            fingerprint__in={row['fingerprint'] for row in rows}
+        ).values_list('fingerprint', 'fingerprint_occurrence')
+    )
+
+
+def count_duplicates(selected_account, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Count the rows that `ingest_transactions` would skip as duplicates, without writing."""
+    occurrences = Counter()
+    duplicates = 0
+
+    for chunk in _chunked(rows, chunk_size):
+        assign_fingerprints(selected_account.id, chunk, occurrences)
+        existing = find_existing_fingerprints(chunk)
+        duplicates += sum(
+            1 for row in chunk if (row['fingerprint'], row['fingerprint_occurrence']) in existing
+        )
+
+    return duplicates
+
+
+def plan_category_accounts(user, rows):
+    """
+    Work out which category accounts an import would use, without writing.
+
+    Mirrors `accounts.tasks.find_or_create_category_account`.
+
+    Returns:
+        dict: 'existing' (names of matched accounts) and 'new' (list of
+        {'name', 'type'} for accounts that would be created)
+    """
+    accounts = list(Account.objects.filter(user=user).values_list('name', 'type'))
+    existing_names = {name.casefold(): name for name, _ in accounts}
+    existing_types = {account_type for _, account_type in accounts}
+
+    matched = {}
+    new = {}
+    for row in rows:
+        category = row.get('category')
+        is_positive = row['amount'] > 0
+        if category:
+            key = category.casefold()
+            if key in existing_names:
+                matched[key] = existing_names[key]
+            elif key not in new:
+                account_type = 'Income' if is_positive else 'Expense'
+                existing_types.add(account_type)
+                new[key] = {'name': category, 'type': account_type}
+        else:
+            account_type = 'Income' if is_positive else 'Expense'
+            if account_type not in existing_types:
+                existing_types.add(account_type)
+                new[('default', account_type)] = {'name': f'Uncategorized {account_type}', 'type': account_type}
+
+    return {
+        'existing': sorted(matched.values()),
+        'new': list(new.values()),
+    }
+
+
+def _ingest_chunk(user, selected_account, chunk, results, occurrences, category_accounts):
+    assign_fingerprints(selected_account.id, chunk, occurrences)
+    existing = find_existing_fingerprints(chunk)
+
+    pending = []
+    for row in chunk:
+        if (row['fingerprint'], row['fingerprint_occurrence']) in existing:
+            results['duplicates'] += 1
+            continue
+
+        is_positive = row['amount'] > 0
+        try:
+            category_account = resolve_category_account(
+                user, row.get('category'), is_positive, category_accounts
+            )
+        except Exception as e:
+            results['failed'] += 1
+            results['errors'].append(f"Row {row['row_index']}: Error processing category - {str(e)}")
+            continue
+
+        # For positive amounts (income):
+        # - Debit the selected account (money coming in)
+        # - Credit the category account (source of the money)
+        #
+        # For negative amounts (expense):
+        # - Debit the category account (where money is going)
+        # - Credit the selected account (money going out)
+        if is_positive:
+            debit_account = selected_account
+            credit_account = category_account
+        else:
+            debit_account = category_account
+            credit_account = selected_account
+
+        pending.append((row, Transaction(
+            date=row['date'],
+            amount=abs(row['amount']),
+            debit=debit_account,
+            credit=credit_account,
+            notes=row.get('description') or '',
+            user=user,
+            fingerprint=row['fingerprint'],
+            fingerprint_occurrence=row['fingerprint_occurrence'],
+        )))
+
+    if not pending:
+        return
+
+    account_ids = {selected_account.id}
+    account_ids.update(txn.debit_id for _, txn in pending)
+    account_ids.update(txn.credit_id for _, txn in pending)
+
+    try:
+        with transaction.atomic():
+            Transaction.objects.bulk_create([txn for _, txn in pending])
+            update_account_balances(account_ids)
+        results['success'] += len(pending)
+    except Exception:
+        # Fall back to row-by-row inserts so one bad row doesn't fail the whole
+        # chunk. A unique violation here means a concurrent import of the same
+        # statement got there first. Each save updates balances via signals.
+        for row, txn in pending:
+            try:
+                with transaction.atomic():
+                    txn.save()
+                results['success'] += 1
+            except IntegrityError:
+                results['duplicates'] += 1
+            except Exception as e:
+                results['failed'] += 1
+                results['errors'].append(f"Row {row['row_index']}: Error creating transaction - {str(e)}")
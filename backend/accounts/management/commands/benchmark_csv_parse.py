@@ -0,0 +1,64 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from accounts.parallel_csv import iter_parallel_csv_rows
+from accounts.tasks import iter_csv_rows
+
+class Command(BaseCommand):
+    help = 'Benchmarks CSV parsing throughput (rows/s) for different worker counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Number of synthetic rows to parse')
+        parser.add_argument('--workers', default='1,2,4,8', help='Comma-separated worker counts to compare')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per worker count (best is reported)')
+
+    def handle(self, *args, **options):
+        content = self._generate_csv(options['rows'])
+        column_mapping = {'date': 0, 'description': 1, 'amount': 2, 'category': 3, 'has_header': True}
+        worker_counts = [int(count) for count in options['workers'].split(',')]
+
+        self.stdout.write(
+            f"Parsing {options['rows']:,} rows ({len(content) / 1024 / 1024:.1f} MB), "
+            f"best of {options['repeat']} runs"
+        )
+        self.stdout.write(f"{'workers':>8} {'seconds':>9} {'rows/s':>12} {'speedup':>8}")
+
+        baseline = None
+        for workers in worker_counts:
+            best = None
+            for _ in range(options['repeat']):
+                results = {'total': 0, 'failed': 0, 'errors': []}
+                started = time.perf_counter()
+                if workers == 1:
+                    rows = iter_csv_rows(content, column_mapping, results)
+                else:
+                    rows = iter_parallel_csv_rows(content, column_mapping, results, workers)
+                parsed = sum(1 for _ in rows)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+
+            if parsed != options['rows'] or results['failed']:
+                self.stderr.write(f"Parsed {parsed} rows with {results['failed']} failures")
+
+            baseline = baseline or best
+            self.stdout.write(
+                f"{workers:>8} {best:>9.2f} {parsed / best:>12,.0f} {baseline / best:>7.2f}x"
+            )
+
+    def _generate_csv(self, count):
+        rng = random.Random(42)
+        descriptions = ['Coffee Shop', 'Grocery Store', '"Smith, John"', 'Gas Station', 'Payroll']
+        categories = ['Food', 'Groceries', 'Housing', 'Transportation', '']
+        start = date(2015, 1, 1)
+
+        lines = ['Date,Description,Amount,Category']
+        for i in range(count):
+            day = start + timedelta(days=i % 3650)
+            amount = Decimal(rng.randint(-50000, 50000)) / 100
+            index = i % len(descriptions)
+            lines.append(f"{day:%m/%d/%Y},{descriptions[index]},{amount:.2f},{categories[index]}")
+        return '\n'.join(lines) + '\n'
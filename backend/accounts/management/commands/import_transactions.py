@@ -0,0 +1,81 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.copy_ingest import copy_ingest_transactions, supports_copy_ingest
+from accounts.importers import detect_statement_format, iter_ofx_rows, iter_qif_rows
+from accounts.ingest import ingest_transactions
+from accounts.models import Account
+from accounts.tasks import iter_csv_rows
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-imports a CSV, OFX/QFX or QIF statement into an account. '
+        'Uses PostgreSQL COPY when available, so multi-million row histories load quickly.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the statement file')
+        parser.add_argument('--user', required=True, help='Email of the user who owns the account')
+        parser.add_argument('--account', type=int, required=True, help='ID of the account to import into')
+        parser.add_argument('--format', choices=['csv', 'ofx', 'qif'], help='File format (detected if omitted)')
+        parser.add_argument(
+            '--mapping',
+            default='{"date": 0, "description": 1, "amount": 2, "category": 3, "has_header": true}',
+            help='CSV column mapping as JSON'
+        )
+        parser.add_argument('--encoding', default='utf-8', help='File encoding')
+        parser.add_argument('--no-copy', action='store_true', help='Use bulk_create even on PostgreSQL')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['user'])
+            account = Account.objects.get(id=options['account'], user=user)
+        except (User.DoesNotExist, Account.DoesNotExist):
+            raise CommandError('User or account not found')
+
+        results = {
+            'total': 0,
+            'success': 0,
+            'duplicates': 0,
+            'failed': 0,
+            'errors': []
+        }
+
+        with open(options['path'], encoding=options['encoding'], errors='replace', newline='') as stream:
+            file_format = options['format'] or detect_statement_format(options['path'], stream.read(1024))
+            stream.seek(0)
+
+            if file_format == 'csv':
+                rows = iter_csv_rows(stream, json.loads(options['mapping']), results)
+            elif file_format == 'ofx':
+                rows = iter_ofx_rows(stream, results)
+            elif file_format == 'qif':
+                rows = iter_qif_rows(stream, results)
+            else:
+                raise CommandError('Could not detect the file format; pass --format')
+
+            use_copy = supports_copy_ingest() and not options['no_copy']
+            self.stdout.write(
+                f"Importing {options['path']} ({file_format}) into {account} "
+                f"using {'COPY' if use_copy else 'bulk_create'}..."
+            )
+
+            started = time.perf_counter()
+            if use_copy:
+                copy_ingest_transactions(user, account, rows, results)
+            else:
+                ingest_transactions(user, account, rows, results)
+            elapsed = time.perf_counter() - started
+
+        for error in results['errors'][:20]:
+            self.stderr.write(error)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {results['success']} of {results['total']} rows in {elapsed:.1f}s "
+            f"({results['duplicates']} duplicates skipped, {results['failed']} failed)"
+        ))
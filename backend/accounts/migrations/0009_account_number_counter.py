@@ -0,0 +1,45 @@
+# Generated manually for per-user account numbers
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def seed_account_number_counters(apps, schema_editor):
+    """Start each user's counter after their highest existing account number."""
+    Account = apps.get_model('accounts', 'Account')
+    AccountNumberCounter = apps.get_model('accounts', 'AccountNumberCounter')
+
+    highest = Account.objects.values('user_id').annotate(highest=models.Max('num'))
+    AccountNumberCounter.objects.bulk_create([
+        AccountNumberCounter(user_id=row['user_id'], next_num=max(row['highest'] + 1, 1000))
+        for row in highest
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0008_transaction_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='account',
+            name='num',
+            field=models.IntegerField(),
+        ),
+        migrations.AddConstraint(
+            model_name='account',
+            constraint=models.UniqueConstraint(fields=('user', 'num'), name='unique_account_num_per_user'),
+        ),
+        migrations.CreateModel(
+            name='AccountNumberCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='account_number_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('next_num', models.IntegerField()),
+            ],
+        ),
+        migrations.RunPython(seed_account_number_counters, migrations.RunPython.noop),
+    ]
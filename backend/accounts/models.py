@@ -51,7 +51,7 @@ class SubAccountType(models.Model):
 #account model
 class Account(models.Model):
     name = models.CharField(max_length=50)
-    num = models.IntegerField(unique=True)
+    num = models.IntegerField()
     type = models.CharField(max_length=10, choices=AccountTypes.choices)
     sub_type = models.ForeignKey(SubAccountType, on_delete=models.CASCADE, null=True, blank=True)
     # sub_type_name = models.CharField(max_length=50, blank=True, null=True)
@@ -60,6 +60,11 @@ class Account(models.Model):
     reconciled_balance = models.DecimalField(max_digits=10,decimal_places=2, null=True, blank=True, default=0)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='accounts')
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'num'], name='unique_account_num_per_user'),
+        ]
+
     def __str__(self):
         return f"{self.num} - {self.name} ({self.type})"
 
@@ -100,6 +105,14 @@ class Account(models.Model):
         # Use update to avoid triggering signals
         type(self).objects.filter(pk=self.pk).update(balance=self.balance)
 
+#next free account number of each user, see accounts.numbering
+class AccountNumberCounter(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='account_number_counter')
+    next_num = models.IntegerField()
+
+    def __str__(self):
+        return f"{self.user} - {self.next_num}"
+
 class TransactionStatus(models.TextChoices):
     REVIEW = 'review', 'Review'
     CATEGORIZED = 'categorized', 'Categorized'
@@ -128,6 +141,19 @@ class Transaction(models.Model):
         default=TransactionStatus.REVIEW
     )
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
+    # Duplicate detection for imported statements: a hash of the account, date,
+    # amount and normalized description, plus the occurrence of that hash within
+    # the import (so two identical coffees on the same day are both kept)
+    fingerprint = models.CharField(max_length=64, null=True, blank=True)
+    fingerprint_occurrence = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fingerprint', 'fingerprint_occurrence'],
+                name='unique_transaction_fingerprint',
+            ),
+        ]
 
     def __str__(self):
         return str(self.amount) + " - " + str(self.credit) + " -> " + str(self.debit) + " - " + str(self.notes)
@@ -0,0 +1,66 @@
+"""
+Per-user account number allocation.
+
+Account numbers are unique per user. New numbers come from a counter row per
+user (`AccountNumberCounter`) that is locked while it is bumped, so concurrent
+imports for the same user never hand out the same number, and imports for
+different users never touch the same row or index entry.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+
+from .models import Account, AccountNumberCounter
+
+# First number handed out to a user without any accounts
+FIRST_ACCOUNT_NUMBER = 1000
+
+
+def _lock_counter(user):
+    """Return the user's counter row, locked until the surrounding transaction ends."""
+    try:
+        return AccountNumberCounter.objects.select_for_update().get(user=user)
+    except AccountNumberCounter.DoesNotExist:
+        pass
+
+    highest = Account.objects.filter(user=user).aggregate(highest=Max('num'))['highest']
+    next_num = max(highest + 1, FIRST_ACCOUNT_NUMBER) if highest is not None else FIRST_ACCOUNT_NUMBER
+    try:
+        with transaction.atomic():
+            return AccountNumberCounter.objects.create(user=user, next_num=next_num)
+    except IntegrityError:
+        # Another process created the counter first
+        return AccountNumberCounter.objects.select_for_update().get(user=user)
+
+
+def reserve_account_numbers(user, count=1):
+    """
+    Reserve a block of consecutive account numbers for a user.
+
+    Numbers that are reserved but never used are simply skipped. Numbers the
+    user picked by hand for their own accounts are never handed out: if one of
+    them is at or above the counter, the block starts after it.
+
+    Args:
+        user: The user the accounts belong to
+        count (int): How many numbers to reserve
+
+    Returns:
+        range: The reserved account numbers
+    """
+    with transaction.atomic():
+        counter = _lock_counter(user)
+        start = counter.next_num
+
+        highest = Account.objects.filter(user=user, num__gte=start).aggregate(highest=Max('num'))['highest']
+        if highest is not None:
+            start = highest + 1
+
+        counter.next_num = start + count
+        counter.save(update_fields=['next_num'])
+
+    return range(start, start + count)
+
+
+def next_account_number(user):
+    """Reserve a single account number for a user."""
+    return reserve_account_numbers(user, 1)[0]
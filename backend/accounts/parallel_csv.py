@@ -0,0 +1,129 @@
+"""
+Parallel parsing of very large CSV files.
+
+The file is split at newline boundaries into byte ranges that are parsed and
+validated in a process pool. Parsed rows are handed back in file order, so the
+single writer (`accounts.ingest.ingest_transactions`) applies them exactly as it
+would for a serial parse, including duplicate occurrence counting.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections
+
+from .tasks import iter_csv_rows
+
+# Each worker gets several ranges so a slow range doesn't leave the others idle
+RANGES_PER_WORKER = 4
+
+
+def split_byte_ranges(data, parts, start=0):
+    """
+    Split `data[start:]` into roughly `parts` ranges that end on a newline.
+
+    A boundary is never placed inside a quoted field: if the number of quote
+    characters before a candidate boundary is odd, the boundary moves on to the
+    next newline.
+
+    Returns:
+        list: (start, end) byte offsets covering the data in order
+    """
+    length = len(data)
+    target = max((length - start) // max(parts, 1), 1)
+    ranges = []
+    quotes = 0
+    pos = start
+
+    while pos < length:
+        end = min(pos + target, length)
+        if end < length:
+            newline = data.find(b'\n', end - 1)
+            end = length if newline == -1 else newline + 1
+        while end < length and (quotes + data.count(b'"', pos, end)) % 2:
+            newline = data.find(b'\n', end)
+            end = length if newline == -1 else newline + 1
+        quotes += data.count(b'"', pos, end)
+        ranges.append((pos, end))
+        pos = end
+
+    return ranges
+
+
+def _parse_range(args):
+    """Parse one byte range in a worker process. Must not touch the database."""
+    chunk, column_mapping, start_index = args
+    results = {'total': 0, 'failed': 0, 'errors': []}
+    mapping = dict(column_mapping, has_header=False)
+    rows = list(iter_csv_rows(chunk.decode('utf-8'), mapping, results, start_index=start_index))
+    return rows, results
+
+
+def iter_parallel_csv_rows(file_content, column_mapping, results, workers):
+    """
+    Parse a CSV file in a pool of worker processes.
+
+    Drop-in replacement for `accounts.tasks.iter_csv_rows`: returns an iterator
+    of the same parsed rows in file order and records validation errors in
+    `results`. Row numbers in error messages are line numbers, which differ
+    from the serial parser's only when quoted fields contain newlines.
+
+    The worker processes are started, and the database connections closed so
+    they don't inherit them, before this returns rather than when the rows are
+    first read: the rows may be consumed inside a database transaction (e.g.
+    by the COPY ingest path), whose connection must stay open.
+
+    The pool uses the fork start method, so this must run in a regular process
+    (the web server or a management command), not inside a daemonic Celery
+    prefork child, which may not start processes of its own.
+
+    Args:
+        file_content (str): The CSV file content as a string
+        column_mapping (dict): Mapping of CSV columns to transaction fields
+        results (dict): The import results dictionary, updated in place
+        workers (int): Number of worker processes
+
+    Returns:
+        iterator: Parsed rows ready for `accounts.ingest.ingest_transactions`
+    """
+    data = file_content.encode('utf-8')
+
+    start = 0
+    if column_mapping.get('has_header', True):
+        newline = data.find(b'\n')
+        start = len(data) if newline == -1 else newline + 1
+
+    jobs = []
+    row_index = 1
+    for range_start, range_end in split_byte_ranges(data, workers * RANGES_PER_WORKER, start):
+        jobs.append((data[range_start:range_end], column_mapping, row_index))
+        row_index += data.count(b'\n', range_start, range_end)
+
+    # Workers only parse, but don't let them inherit open database sockets.
+    # A connection inside a transaction can't be closed; the workers never use
+    # it, and they exit without running finalizers that could close it
+    if not any(conn.in_atomic_block for conn in connections.all()):
+        connections.close_all()
+
+    context = multiprocessing.get_context('fork')
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    try:
+        # Submitting forks every worker now. map() returns results in
+        # submission order, which keeps the writer's view of the file
+        # identical to a serial parse
+        parsed = executor.map(_parse_range, jobs)
+    except BaseException:
+        executor.shutdown(cancel_futures=True)
+        raise
+    return _collect_parsed_rows(executor, parsed, results)
+
+
+def _collect_parsed_rows(executor, parsed, results):
+    """Yield the rows of each parsed range in order, then shut the pool down."""
+    try:
+        for rows, partial in parsed:
+            results['total'] += partial['total']
+            results['failed'] += partial['failed']
+            results['errors'].extend(partial['errors'])
+            yield from rows
+    finally:
+        executor.shutdown(cancel_futures=True)
@@ -51,6 +51,19 @@ class AccountSerializer(serializers.ModelSerializer):
         # Check if there's an active PlaidItem for this account
         return obj.plaid_connection.filter(status='active').exists()
 
+    def validate_num(self, value):
+        # Account numbers are unique per user
+        request = self.context.get('request')
+        if request is None:
+            return value
+
+        accounts = Account.objects.filter(user=request.user, num=value)
+        if self.instance is not None:
+            accounts = accounts.exclude(pk=self.instance.pk)
+        if accounts.exists():
+            raise serializers.ValidationError('You already have an account with this number.')
+        return value
+
 class TransactionSerializer(serializers.ModelSerializer):
     debit_account = AccountSerializer(source='debit', read_only=True)
     credit_account = AccountSerializer(source='credit', read_only=True)
@@ -3,9 +3,14 @@ from django.dispatch import receiver
 from django.db import transaction
 from django.db.models import Sum, Q
 from decimal import Decimal
+from contextlib import contextmanager
+import threading
 
 from .models import Transaction, Account
 
+# Accounts whose balance update is deferred, see defer_balance_updates()
+_deferred = threading.local()
+
 def update_account_balance(account_id):
     """
     Update the balance of an account based on all its transactions.
@@ -44,11 +49,95 @@ def update_account_balance(account_id):
     except Account.DoesNotExist:
         return None
 
+def update_account_balances(account_ids):
+    """
+    Update the balances of several accounts at once.
+
+    Used after bulk writes (which do not send post_save signals). Runs one grouped
+    aggregate for debits and one for credits regardless of how many accounts
+    are involved, then writes all balances with a single bulk update.
+    """
+    account_ids = set(account_ids)
+    if not account_ids:
+        return
+
+    debit_sums = dict(
+        Transaction.objects.filter(debit_id__in=account_ids)
+        .values('debit_id')
+        .annotate(total=Sum('amount'))
+        .values_list('debit_id', 'total')
+    )
+    credit_sums = dict(
+        Transaction.objects.filter(credit_id__in=account_ids)
+        .values('credit_id')
+        .annotate(total=Sum('amount'))
+        .values_list('credit_id', 'total')
+    )
+
+    accounts = list(Account.objects.filter(id__in=account_ids).only('id', 'type', 'balance'))
+    for account in accounts:
+        debit_sum = debit_sums.get(account.id) or Decimal('0.00')
+        credit_sum = credit_sums.get(account.id) or Decimal('0.00')
+
+        if account.type in ['Asset', 'Expense', 'Goal']:
+            account.balance = debit_sum - credit_sum
+        elif account.type in ['Liability', 'Income', 'Equity']:
+            account.balance = credit_sum - debit_sum
+
+    Account.objects.bulk_update(accounts, ['balance'])
+
+@contextmanager
+def defer_balance_updates():
+    """
+    Update account balances once at the end of a block instead of per row.
+
+    Inside the block, saving or deleting a transaction only records the two
+    accounts involved; when the block exits normally, all recorded accounts are
+    updated with `update_account_balances`. Nested blocks join the outer one.
+    """
+    if getattr(_deferred, 'account_ids', None) is not None:
+        yield
+        return
+
+    _deferred.account_ids = set()
+    try:
+        yield
+        account_ids = _deferred.account_ids
+    finally:
+        _deferred.account_ids = None
+
+    update_account_balances(account_ids)
+
+def queue_balance_updates(account_ids):
+    """
+    Update the balances of accounts changed by bulk writes.
+
+    Inside `defer_balance_updates` the accounts join the deferred update;
+    otherwise they are updated immediately.
+    """
+    deferred = getattr(_deferred, 'account_ids', None)
+    if deferred is None:
+        update_account_balances(account_ids)
+    else:
+        deferred.update(account_ids)
+
+def _defer_balance_update(instance):
+    """Record the accounts of a transaction if balance updates are deferred."""
+    account_ids = getattr(_deferred, 'account_ids', None)
+    if account_ids is None:
+        return False
+
+    account_ids.update((instance.debit_id, instance.credit_id))
+    return True
+
 @receiver(post_save, sender=Transaction)
 def update_balances_on_transaction_change(sender, instance, created, **kwargs):
     """
     Update account balances when a transaction is created or updated.
     """
+    if _defer_balance_update(instance):
+        return
+
     # Use transaction.atomic to ensure both accounts are updated or neither is
     with transaction.atomic():
         # Update both accounts involved in the transaction
@@ -60,6 +149,9 @@ def update_balances_on_transaction_delete(sender, instance, **kwargs):
     """
     Update account balances when a transaction is deleted.
     """
+    if _defer_balance_update(instance):
+        return
+
     # Use transaction.atomic to ensure both accounts are updated or neither is
     with transaction.atomic():
         # Update both accounts involved in the transaction
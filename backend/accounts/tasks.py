@@ -1,17 +1,38 @@
 import csv
 import io
+import re
+import uuid
 from decimal import Decimal
 from datetime import datetime
 from celery import shared_task
-from django.db import transaction
+from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth import get_user_model
-from .models import Account, Transaction
+from .models import Account
+from .numbering import next_account_number
+from .ingest import ingest_transactions
+from .copy_ingest import copy_ingest_transactions, supports_copy_ingest
 
 User = get_user_model()
 
-def parse_date(date_str):
-    """Parse a date string using multiple formats."""
-    date_formats = ['%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%m-%d-%Y', '%d-%m-%Y']
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%m-%d-%Y', '%d-%m-%Y']
+
+# Header patterns used to guess the column mapping of a CSV file
+COLUMN_PATTERNS = [
+    ('date', re.compile(r'date|time', re.IGNORECASE)),
+    ('description', re.compile(r'desc|memo|note|narration|payee', re.IGNORECASE)),
+    ('amount', re.compile(r'amount|sum|total|value', re.IGNORECASE)),
+    ('category', re.compile(r'category|cat|type|account', re.IGNORECASE)),
+]
+
+def parse_date(date_str, date_format=None):
+    """
+    Parse a date string using multiple formats.
+
+    If `date_format` is given (e.g. detected from a preview of the file) it is
+    tried first, so ambiguous dates like 03/04/2024 are read consistently.
+    """
+    date_formats = [date_format] + DATE_FORMATS if date_format else DATE_FORMATS
 
     for date_format in date_formats:
         try:
@@ -21,40 +42,62 @@ def parse_date(date_str):
 
     return None
 
-def find_or_create_category_account(user, category, is_positive):
-    """Find or create a category account based on the transaction type."""
+def detect_date_format(date_strings):
+    """
+    Detect the date format used by a sample of date strings.
+
+    Returns the first known format that parses every non-empty value, or None.
+    """
+    values = [value.strip() for value in date_strings if value and value.strip()]
+    if not values:
+        return None
+
+    for date_format in DATE_FORMATS:
+        try:
+            for value in values:
+                datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+        return date_format
+
+    return None
+
+def detect_column_mapping(header):
+    """Guess the column mapping of a CSV file from its header row."""
+    mapping = {'date': None, 'description': None, 'amount': None, 'category': None, 'has_header': True}
+
+    for index, name in enumerate(header):
+        for field, pattern in COLUMN_PATTERNS:
+            if mapping[field] is None and pattern.search(name):
+                mapping[field] = index
+                break
+
+    return mapping
+
+def find_or_create_category_account(user, category, is_positive, num=None):
+    """
+    Find or create a category account based on the transaction type.
+
+    New accounts take `num` if given (e.g. from a block reserved with
+    `accounts.numbering.reserve_account_numbers`), otherwise the user's next
+    free account number.
+    """
     # If category is not provided, use a default expense or income account
     if not category:
-        if is_positive:
-            # For positive amounts, use a default income account
-            category_account = Account.objects.filter(
-                user=user,
-                type='Income'
-            ).first()
-
-            if not category_account:
-                # Create a default income account if none exists
-                category_account = Account.objects.create(
-                    name='Uncategorized Income',
-                    num=90000,  # Use a high number to avoid conflicts
-                    type='Income',
-                    user=user
-                )
-        else:
-            # For negative amounts, use a default expense account
-            category_account = Account.objects.filter(
-                user=user,
-                type='Expense'
-            ).first()
-
-            if not category_account:
-                # Create a default expense account if none exists
-                category_account = Account.objects.create(
-                    name='Uncategorized Expense',
-                    num=80000,  # Use a high number to avoid conflicts
-                    type='Expense',
-                    user=user
-                )
+        account_type = 'Income' if is_positive else 'Expense'
+        category_account = Account.objects.filter(
+            user=user,
+            type=account_type
+        ).first()
+
+        if not category_account:
+            # Create a default income or expense account if none exists
+            category_account = Account.objects.create(
+                name=f'Uncategorized {account_type}',
+                num=num or next_account_number(user),
+                type=account_type,
+                user=user
+            )
     else:
         # Try to find an account with a matching name
         category_account = Account.objects.filter(
@@ -67,30 +110,112 @@ def find_or_create_category_account(user, category, is_positive):
             # Determine account type based on amount direction
             account_type = 'Income' if is_positive else 'Expense'
 
-            # Find the highest account number and increment
-            highest_num = Account.objects.filter(user=user).order_by('-num').first()
-            new_num = (highest_num.num + 1) if highest_num else 1000
-
             category_account = Account.objects.create(
                 name=category,
-                num=new_num,
+                num=num or next_account_number(user),
                 type=account_type,
                 user=user
             )
 
     return category_account
 
+def iter_csv_rows(file_content, column_mapping, results, start_index=1, max_rows=None):
+    """
+    Parse and validate the rows of a CSV file.
+
+    Rows that fail validation are counted and recorded in `results` and are not
+    yielded.
+
+    Args:
+        file_content (str): The CSV file content as a string, or an open text
+            stream for files too large to hold in memory
+        column_mapping (dict): Mapping of CSV columns to transaction fields
+        results (dict): The import results dictionary, updated in place
+        start_index (int): Row number of the first data row, used when parsing
+            a slice of a larger file
+        max_rows (int): Stop after this many rows; results['truncated'] is set
+            if the file has more
+
+    Yields:
+        dict: Parsed rows ready for `accounts.ingest.ingest_transactions`
+    """
+    # Parse the CSV file
+    csv_file = io.StringIO(file_content) if isinstance(file_content, str) else file_content
+    reader = csv.reader(csv_file)
+
+    # Skip header row if it exists
+    if column_mapping.get('has_header', True):
+        next(reader, None)
+
+    # Process each row
+    for row_index, row in enumerate(reader, start=start_index):
+        # Skip empty rows
+        if not any(row):
+            continue
+
+        if max_rows is not None and results['total'] >= max_rows:
+            results['truncated'] = True
+            break
+        results['total'] += 1
+
+        # Extract data from the row based on column mapping
+        try:
+            date_str = row[column_mapping['date']] if 'date' in column_mapping else None
+            description = row[column_mapping['description']] if column_mapping.get('description') is not None else None
+            amount_str = row[column_mapping['amount']] if 'amount' in column_mapping else None
+            category = row[column_mapping['category']] if column_mapping.get('category') is not None else None
+        except (IndexError, TypeError):
+            results['failed'] += 1
+            results['errors'].append(f"Row {row_index}: Column index out of range. Check your column mapping.")
+            continue
+
+        # Validate required fields
+        if not date_str or not amount_str:
+            results['failed'] += 1
+            results['errors'].append(f"Row {row_index}: Missing required fields")
+            continue
+
+        # Parse date
+        parsed_date = parse_date(date_str, column_mapping.get('date_format'))
+        if parsed_date is None:
+            results['failed'] += 1
+            results['errors'].append(f"Row {row_index}: Invalid date format '{date_str}'")
+            continue
+
+        # Parse amount
+        try:
+            # Remove currency symbols and commas
+            cleaned_amount = amount_str.replace('$', '').replace(',', '').strip()
+            amount = Decimal(cleaned_amount)
+        except Exception as e:
+            results['failed'] += 1
+            results['errors'].append(f"Row {row_index}: Error parsing amount - {str(e)}")
+            continue
+
+        yield {
+            'row_index': row_index,
+            'date': parsed_date,
+            'amount': amount,
+            'description': description,
+            'category': category,
+        }
+
 @shared_task
-def process_csv_transactions(file_content, column_mapping, selected_account_id, user_id):
+def process_csv_transactions(file_content, column_mapping, selected_account_id, user_id, workers=1):
     """
     Process a CSV file and create transactions.
 
+    Rows are parsed lazily and written in chunks; rows that were already imported
+    (same account, date, amount and description) are skipped as duplicates.
+
     Args:
         file_content (str): The CSV file content as a string
         column_mapping (dict): Mapping of CSV columns to transaction fields
             e.g. {'date': 0, 'description': 1, 'amount': 2, 'category': 3}
         selected_account_id (int): The ID of the account to associate transactions with
         user_id (int): The ID of the user who uploaded the file
+        workers (int): Number of processes to parse with. Files smaller than
+            settings.CSV_IMPORT_PARALLEL_MIN_BYTES are always parsed in-process.
 
     Returns:
         dict: A dictionary containing the results of the operation
@@ -100,6 +225,7 @@ def process_csv_transactions(file_content, column_mapping, selected_account_id,
         'status': 'processing',
         'total': 0,
         'success': 0,
+        'duplicates': 0,
         'failed': 0,
         'errors': []
     }
@@ -112,100 +238,16 @@ def process_csv_transactions(file_content, column_mapping, selected_account_id,
         user = User.objects.get(id=user_id)
         selected_account = Account.objects.get(id=selected_account_id, user=user)
 
-        # Parse the CSV file
-        csv_file = io.StringIO(file_content)
-        reader = csv.reader(csv_file)
-
-        # Skip header row if it exists
-        if column_mapping.get('has_header', True):
-            next(reader)
-
-        # Process each row
-        for row_index, row in enumerate(reader, start=1):
-            # Skip empty rows
-            if not any(row):
-                continue
-
-            results['total'] += 1
-
-            # Extract data from the row based on column mapping
-            try:
-                date_str = row[column_mapping['date']] if 'date' in column_mapping else None
-                description = row[column_mapping['description']] if 'description' in column_mapping else None
-                amount_str = row[column_mapping['amount']] if 'amount' in column_mapping else None
-                category = row[column_mapping['category']] if 'category' in column_mapping else None
-            except IndexError:
-                results['failed'] += 1
-                results['errors'].append(f"Row {row_index}: Column index out of range. Check your column mapping.")
-                continue
-
-            # Validate required fields
-            if not date_str or not amount_str:
-                results['failed'] += 1
-                results['errors'].append(f"Row {row_index}: Missing required fields")
-                continue
-
-            # Parse date
-            parsed_date = parse_date(date_str)
-            if parsed_date is None:
-                results['failed'] += 1
-                results['errors'].append(f"Row {row_index}: Invalid date format '{date_str}'")
-                continue
-
-            # Parse amount
-            try:
-                # Remove currency symbols and commas
-                cleaned_amount = amount_str.replace('$', '').replace(',', '').strip()
-                amount = Decimal(cleaned_amount)
-
-                # Determine if this is a debit or credit
-                is_positive = amount > 0
-                amount = abs(amount)  # Use absolute value for the transaction
-            except Exception as e:
-                results['failed'] += 1
-                results['errors'].append(f"Row {row_index}: Error parsing amount - {str(e)}")
-                continue
-
-            # Find or create the category account
-            try:
-                category_account = find_or_create_category_account(user, category, is_positive)
-            except Exception as e:
-                results['failed'] += 1
-                results['errors'].append(f"Row {row_index}: Error processing category - {str(e)}")
-                continue
-
-            # Create the transaction
-            try:
-                # For positive amounts (income):
-                # - Debit the selected account (money coming in)
-                # - Credit the category account (source of the money)
-                #
-                # For negative amounts (expense):
-                # - Debit the category account (where money is going)
-                # - Credit the selected account (money going out)
-                if is_positive:
-                    debit_account = selected_account
-                    credit_account = category_account
-                else:
-                    debit_account = category_account
-                    credit_account = selected_account
-
-                # Create the transaction using atomic transaction
-                with transaction.atomic():
-                    Transaction.objects.create(
-                        date=parsed_date,
-                        amount=amount,
-                        debit=debit_account,
-                        credit=credit_account,
-                        notes=description or '',
-                        user=user
-                    )
-
-                results['success'] += 1
-            except Exception as e:
-                results['failed'] += 1
-                results['errors'].append(f"Row {row_index}: Error creating transaction - {str(e)}")
-                continue
+        if workers > 1 and len(file_content) >= settings.CSV_IMPORT_PARALLEL_MIN_BYTES:
+            from .parallel_csv import iter_parallel_csv_rows
+            rows = iter_parallel_csv_rows(file_content, column_mapping, results, workers)
+        else:
+            rows = iter_csv_rows(file_content, column_mapping, results)
+
+        if len(file_content) >= settings.CSV_IMPORT_COPY_MIN_BYTES and supports_copy_ingest():
+            copy_ingest_transactions(user, selected_account, rows, results)
+        else:
+            ingest_transactions(user, selected_account, rows, results)
 
         # Update status to completed
         results['status'] = 'completed'
@@ -216,3 +258,193 @@ def process_csv_transactions(file_content, column_mapping, selected_account_id,
         results['status'] = 'failed'
         results['error'] = str(e)
         return results
+
+def _serialize_preview_row(row):
+    return {
+        'row_index': row['row_index'],
+        'date': row['date'].isoformat(),
+        'amount': str(row['amount']),
+        'description': row.get('description'),
+        'category': row.get('category'),
+    }
+
+def preview_csv_transactions(file_content, column_mapping, selected_account_id, user_id, sample_size=20):
+    """
+    Parse a CSV file and report what importing it would do, without writing.
+
+    At most CSV_PREVIEW_MAX_ROWS rows are parsed, so previewing a large file
+    stays quick. When the file has more, `truncated` is set and the counts and
+    planned accounts only cover the rows parsed. Otherwise the parsed rows are
+    cached under an upload token so that the commit call
+    (`import_previewed_csv`) does not need to parse the file again.
+
+    Args:
+        file_content (str): The CSV file content as a string
+        column_mapping (dict): Mapping of CSV columns to transaction fields, or
+            None to detect it from the header row
+        selected_account_id (int): The ID of the account to associate transactions with
+        user_id (int): The ID of the user who uploaded the file
+        sample_size (int): Number of parsed rows to include in the response
+
+    Returns:
+        dict: Detected columns, mapping and date format, a sample of parsed rows,
+        the accounts that would be created, counts, whether the file was
+        truncated and the upload token (None if truncated)
+    """
+    from .ingest import count_duplicates, plan_category_accounts
+
+    user = User.objects.get(id=user_id)
+    selected_account = Account.objects.get(id=selected_account_id, user=user)
+
+    first_row = next(csv.reader(io.StringIO(file_content)), [])
+    if not column_mapping:
+        column_mapping = detect_column_mapping(first_row)
+    column_mapping = dict(column_mapping)
+    has_header = column_mapping.get('has_header', True)
+
+    # Detect the date format from a sample of the date column
+    if column_mapping.get('date') is not None and not column_mapping.get('date_format'):
+        reader = csv.reader(io.StringIO(file_content))
+        if has_header:
+            next(reader, None)
+        date_index = column_mapping['date']
+        sample = [row[date_index] for _, row in zip(range(200), reader) if len(row) > date_index]
+        column_mapping['date_format'] = detect_date_format(sample)
+
+    results = {
+        'total': 0,
+        'failed': 0,
+        'errors': [],
+        'truncated': False
+    }
+    rows = []
+    if column_mapping.get('date') is not None and column_mapping.get('amount') is not None:
+        rows = list(iter_csv_rows(file_content, column_mapping, results, max_rows=settings.CSV_PREVIEW_MAX_ROWS))
+
+    preview = {
+        'columns': first_row if has_header else [f'Column {index + 1}' for index in range(len(first_row))],
+        'column_mapping': column_mapping,
+        'date_format': column_mapping.get('date_format'),
+        'total': results['total'],
+        'valid': len(rows),
+        'failed': results['failed'],
+        'errors': results['errors'][:sample_size],
+        'duplicates': count_duplicates(selected_account, rows),
+        'accounts': plan_category_accounts(user, rows),
+        'sample': [_serialize_preview_row(row) for row in rows[:sample_size]],
+        # The counts above are of the first `total` rows only
+        'truncated': results['truncated'],
+        'upload_token': None,
+    }
+
+    # A truncated preview has only part of the rows; the commit call parses
+    # the whole file instead
+    if rows and not results['truncated']:
+        upload_token = uuid.uuid4().hex
+        cache.set(
+            f'csv-preview:{upload_token}',
+            {
+                'user_id': user_id,
+                'selected_account_id': int(selected_account_id),
+                'rows': rows,
+                'results': results,
+            },
+            timeout=settings.CSV_PREVIEW_TTL
+        )
+        preview['upload_token'] = upload_token
+
+    return preview
+
+def import_previewed_csv(upload_token, selected_account_id, user_id):
+    """
+    Import the rows parsed by `preview_csv_transactions`.
+
+    Returns:
+        dict: The import results, or None if the preview has expired or belongs
+        to another user or account (the caller should parse the file instead)
+    """
+    cache_key = f'csv-preview:{upload_token}'
+    preview = cache.get(cache_key)
+    if (
+        preview is None
+        or preview['user_id'] != user_id
+        or preview['selected_account_id'] != int(selected_account_id)
+    ):
+        return None
+
+    # A preview can only be committed once
+    cache.delete(cache_key)
+
+    results = {
+        'status': 'processing',
+        'total': preview['results']['total'],
+        'success': 0,
+        'duplicates': 0,
+        'failed': preview['results']['failed'],
+        'errors': list(preview['results']['errors'])
+    }
+
+    try:
+        user = User.objects.get(id=user_id)
+        selected_account = Account.objects.get(id=selected_account_id, user=user)
+
+        ingest_transactions(user, selected_account, preview['rows'], results)
+
+        results['status'] = 'completed'
+        return results
+
+    except Exception as e:
+        results['status'] = 'failed'
+        results['error'] = str(e)
+        return results
+
+def process_statement_file(stream, file_format, selected_account_id, user_id):
+    """
+    Import an OFX/QFX or QIF statement and create transactions.
+
+    This is a plain function rather than a Celery task because it reads from an
+    open stream (e.g. an uploaded file), which cannot be sent to a worker.
+
+    Args:
+        stream: A text stream positioned at the start of the file
+        file_format (str): 'ofx' (also used for QFX) or 'qif'
+        selected_account_id (int): The ID of the account to associate transactions with
+        user_id (int): The ID of the user who uploaded the file
+
+    Returns:
+        dict: A dictionary containing the results of the operation
+    """
+    from .importers import iter_ofx_rows, iter_qif_rows
+
+    results = {
+        'status': 'processing',
+        'format': file_format,
+        'total': 0,
+        'success': 0,
+        'duplicates': 0,
+        'failed': 0,
+        'errors': []
+    }
+
+    parsers = {
+        'ofx': iter_ofx_rows,
+        'qif': iter_qif_rows,
+    }
+
+    try:
+        if file_format not in parsers:
+            raise ValueError(f"Unsupported statement format: {file_format}")
+
+        user = User.objects.get(id=user_id)
+        selected_account = Account.objects.get(id=selected_account_id, user=user)
+
+        rows = parsers[file_format](stream, results)
+        ingest_transactions(user, selected_account, rows, results)
+
+        results['status'] = 'completed'
+        return results
+
+    except Exception as e:
+        results['status'] = 'failed'
+        results['error'] = str(e)
+        return results
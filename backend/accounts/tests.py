@@ -0,0 +1,104 @@
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from .models import Account, AccountTypes, Transaction
+from .numbering import reserve_account_numbers
+from .tasks import import_previewed_csv, preview_csv_transactions, process_csv_transactions
+
+User = get_user_model()
+
+MAPPING = {'date': 0, 'description': 1, 'amount': 2, 'category': 3, 'has_header': True}
+
+
+def csv_content(rows):
+    lines = ['Date,Description,Amount,Category']
+    for index in range(rows):
+        amount = f"{(index % 50) + 1}.25" if index % 3 else f"-{(index % 40) + 1}.50"
+        category = 'Groceries' if index % 3 else 'Salary'
+        lines.append(f'2024-01-{(index % 28) + 1:02d},"Purchase {index}, store",{amount},{category}')
+    return '\n'.join(lines) + '\n'
+
+
+def create_account(user):
+    return Account.objects.create(
+        user=user,
+        name='Checking',
+        num=reserve_account_numbers(user, 1)[0],
+        type=AccountTypes.asset,
+        balance=0,
+    )
+
+
+class CsvPreviewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='csv-preview@example.com', first_name='Csv', last_name='Preview')
+        self.account = create_account(self.user)
+
+    @override_settings(CSV_PREVIEW_MAX_ROWS=50)
+    def test_preview_is_cached_when_the_file_fits(self):
+        preview = preview_csv_transactions(csv_content(50), MAPPING, self.account.id, self.user.id)
+
+        self.assertFalse(preview['truncated'])
+        self.assertEqual(preview['total'], 50)
+        self.assertEqual(preview['valid'], 50)
+        self.assertIsNotNone(preview['upload_token'])
+
+        results = import_previewed_csv(preview['upload_token'], self.account.id, self.user.id)
+        self.assertEqual(results['status'], 'completed', results.get('error'))
+        self.assertEqual(results['success'], 50)
+
+    @override_settings(CSV_PREVIEW_MAX_ROWS=50)
+    def test_large_file_is_previewed_from_its_first_rows(self):
+        preview = preview_csv_transactions(csv_content(120), MAPPING, self.account.id, self.user.id)
+
+        self.assertTrue(preview['truncated'])
+        self.assertEqual(preview['total'], 50)
+        self.assertEqual(preview['valid'], 50)
+        self.assertEqual(preview['duplicates'], 0)
+        # Only part of the rows were parsed, so there's nothing to reuse
+        self.assertIsNone(preview['upload_token'])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'The COPY ingest path needs PostgreSQL')
+class ParallelCopyImportTests(TransactionTestCase):
+    """
+    A large CSV import parsed in a process pool and loaded with COPY.
+
+    TransactionTestCase, because the parallel parser closes the database
+    connections before starting its workers, which a test transaction would
+    not survive.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='csv-import@example.com', first_name='Csv', last_name='Import')
+        self.account = create_account(self.user)
+
+    @override_settings(CSV_IMPORT_PARALLEL_MIN_BYTES=0, CSV_IMPORT_COPY_MIN_BYTES=0)
+    def test_parallel_parse_with_copy_ingest(self):
+        content = csv_content(3000)
+
+        results = process_csv_transactions(content, MAPPING, self.account.id, self.user.id, workers=2)
+
+        self.assertEqual(results['status'], 'completed', results.get('error'))
+        self.assertEqual(results['total'], 3000)
+        self.assertEqual(results['success'], 3000)
+        self.assertEqual(results['failed'], 0)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 3000)
+
+        expected = sum(
+            Decimal(f"{(index % 50) + 1}.25") if index % 3 else -Decimal(f"{(index % 40) + 1}.50")
+            for index in range(3000)
+        )
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, expected)
+
+        # Importing the same file again only finds duplicates
+        again = process_csv_transactions(content, MAPPING, self.account.id, self.user.id, workers=2)
+        self.assertEqual(again['status'], 'completed', again.get('error'))
+        self.assertEqual(again['success'], 0)
+        self.assertEqual(again['duplicates'], 3000)
@@ -1,6 +1,7 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
 from .models import SubAccountType, Account, Transaction
@@ -324,36 +325,82 @@ class TransactionViewSet(viewsets.ModelViewSet):
             )
 
     @action(detail=False, methods=['post'])
-    def upload_csv(self, request):
+    def preview_csv(self, request):
         """
-        Upload and process a CSV file of transactions.
+        Parse a CSV file and report what importing it would do, without writing.
 
         Expected request data:
         - file_content: The CSV file content as a string
-        - column_mapping: Mapping of CSV columns to transaction fields
-            e.g. {'date': 0, 'description': 1, 'amount': 2, 'category': 3}
         - selected_account_id: The ID of the account to associate transactions with
+        - column_mapping: (optional) Mapping of CSV columns to transaction fields.
+            Detected from the header row if omitted.
+
+        The response includes an upload_token; passing it to upload_csv imports
+        the rows parsed here instead of parsing the file again. Files longer than
+        CSV_PREVIEW_MAX_ROWS rows are only previewed from their first rows:
+        truncated is true, the counts cover those rows, and there's no upload_token.
         """
-        from .tasks import process_csv_transactions
+        from .tasks import preview_csv_transactions
 
-        # Get request data
         file_content = request.data.get('file_content')
         column_mapping = request.data.get('column_mapping')
         selected_account_id = request.data.get('selected_account_id')
 
-        # Validate required fields
         if not file_content:
             return Response(
                 {"detail": "File content is required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if not column_mapping:
+        if not selected_account_id:
             return Response(
-                {"detail": "Column mapping is required"},
+                {"detail": "Selected account ID is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not Account.objects.filter(id=selected_account_id, user=request.user).exists():
+            return Response(
+                {"detail": "Selected account not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            preview = preview_csv_transactions(
+                file_content=file_content,
+                column_mapping=column_mapping,
+                selected_account_id=selected_account_id,
+                user_id=request.user.id
+            )
+        except Exception as e:
+            print(f"Error previewing CSV: {e}")
+            return Response(
+                {"detail": f"Error previewing CSV file: {str(e)}"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        return Response(preview)
+
+    @action(detail=False, methods=['post'])
+    def upload_csv(self, request):
+        """
+        Upload and process a CSV file of transactions.
+
+        Expected request data:
+        - file_content: The CSV file content as a string
+        - column_mapping: Mapping of CSV columns to transaction fields
+            e.g. {'date': 0, 'description': 1, 'amount': 2, 'category': 3}
+        - selected_account_id: The ID of the account to associate transactions with
+        - upload_token: (optional) Token returned by preview_csv. When it is still
+            valid the previewed rows are imported and the file is not parsed again.
+        """
+        from .tasks import import_previewed_csv, process_csv_transactions
+
+        # Get request data
+        file_content = request.data.get('file_content')
+        column_mapping = request.data.get('column_mapping')
+        selected_account_id = request.data.get('selected_account_id')
+        upload_token = request.data.get('upload_token')
+
         if not selected_account_id:
             return Response(
                 {"detail": "Selected account ID is required"},
@@ -369,6 +416,30 @@ class TransactionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        # Reuse the rows parsed by preview_csv if the preview is still cached
+        if upload_token:
+            result = import_previewed_csv(
+                upload_token=upload_token,
+                selected_account_id=selected_account_id,
+                user_id=request.user.id
+            )
+            if result is not None:
+                print(f"CSV processing result (from preview): {result}")
+                return Response(result)
+
+        # Validate required fields
+        if not file_content:
+            return Response(
+                {"detail": "File content is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not column_mapping:
+            return Response(
+                {"detail": "Column mapping is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         # Process the CSV file
         # Note: We're calling the function directly instead of as a Celery task
         # This is because we want to get the result immediately
@@ -376,7 +447,8 @@ class TransactionViewSet(viewsets.ModelViewSet):
             file_content=file_content,
             column_mapping=column_mapping,
             selected_account_id=selected_account_id,
-            user_id=request.user.id
+            user_id=request.user.id,
+            workers=settings.CSV_IMPORT_WORKERS
         )
 
         # Add debug logging
@@ -384,3 +456,67 @@ class TransactionViewSet(viewsets.ModelViewSet):
 
         # Return the result
         return Response(result)
+
+    @action(detail=False, methods=['post'])
+    def upload_statement(self, request):
+        """
+        Upload and import an OFX/QFX or QIF statement file.
+
+        Expected request data (multipart/form-data):
+        - file: The statement file
+        - selected_account_id: The ID of the account to associate transactions with
+        - format: (optional) 'ofx' or 'qif'. Detected from the file name or
+            content if omitted.
+        """
+        import io
+        from .importers import detect_statement_format
+        from .tasks import process_statement_file
+
+        uploaded_file = request.FILES.get('file')
+        selected_account_id = request.data.get('selected_account_id')
+
+        if not uploaded_file:
+            return Response(
+                {"detail": "A statement file is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not selected_account_id:
+            return Response(
+                {"detail": "Selected account ID is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Validate that the account exists and belongs to the user
+        if not Account.objects.filter(id=selected_account_id, user=request.user).exists():
+            return Response(
+                {"detail": "Selected account not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        # Read the file as a text stream so large statements are never loaded
+        # into memory in full (Django spools big uploads to a temporary file)
+        stream = io.TextIOWrapper(uploaded_file.file, encoding='utf-8', errors='replace')
+
+        file_format = request.data.get('format')
+        if not file_format:
+            head = stream.read(1024)
+            stream.seek(0)
+            file_format = detect_statement_format(uploaded_file.name, head)
+
+        if file_format not in ('ofx', 'qif'):
+            return Response(
+                {"detail": "Unsupported statement format. Upload an OFX, QFX or QIF file, or use the CSV import."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        result = process_statement_file(
+            stream=stream,
+            file_format=file_format,
+            selected_account_id=selected_account_id,
+            user_id=request.user.id
+        )
+
+        print(f"Statement import result: {result}")
+
+        return Response(result)
@@ -26,11 +26,21 @@ app.conf.beat_schedule = {
         'schedule': crontab(hour=2, minute=0),  # Run at 2:00 AM every day
         'args': (),
     },
-    'retry-plaid-errors-daily': {
-        'task': 'plaid_integration.tasks.retry_plaid_errors',
+    'reconcile-plaid-balances-daily': {
+        'task': 'plaid_integration.tasks.reconcile_plaid_balances',
+        'schedule': crontab(hour=4, minute=0),  # Run at 4:00 AM every day, after the nightly sync
+        'args': (),
+    },
+    'prune-plaid-sync-runs-daily': {
+        'task': 'plaid_integration.tasks.prune_plaid_sync_runs',
         'schedule': crontab(hour=3, minute=0),  # Run at 3:00 AM every day
         'args': (),
     },
+    'retry-plaid-errors': {
+        'task': 'plaid_integration.tasks.retry_plaid_errors',
+        'schedule': crontab(minute='*/5'),  # Every 5 minutes; only Items whose retry is due are loaded
+        'args': (),
+    },
 }
 
 @app.task(bind=True)
@@ -138,6 +138,140 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Syncs users are waiting for get their own queue, so they don't queue up behind
+# the nightly fan-out; run a worker for it (see docker-compose.yml)
+CELERY_TASK_ROUTES = {
+    'plaid_integration.tasks.run_sync_job': {'queue': 'plaid_interactive'},
+    'plaid_integration.tasks.backfill_plaid_item': {'queue': 'plaid_backfill'},
+}
 
 # Custom user model
 AUTH_USER_MODEL = 'accounts.User'
+
+# CSV import settings
+# Number of processes used to parse very large CSV uploads (1 disables parallel parsing)
+CSV_IMPORT_WORKERS = int(os.environ.get('CSV_IMPORT_WORKERS', '1'))
+# Uploads smaller than this are always parsed in-process
+CSV_IMPORT_PARALLEL_MIN_BYTES = int(os.environ.get('CSV_IMPORT_PARALLEL_MIN_BYTES', str(32 * 1024 * 1024)))
+# Uploads at least this large are loaded with PostgreSQL COPY instead of bulk_create
+CSV_IMPORT_COPY_MIN_BYTES = int(os.environ.get('CSV_IMPORT_COPY_MIN_BYTES', str(16 * 1024 * 1024)))
+# How long a parsed CSV preview is kept for the commit call to reuse
+CSV_PREVIEW_TTL = int(os.environ.get('CSV_PREVIEW_TTL', str(30 * 60)))
+# The preview parses at most this many rows: the counts of longer files come from
+# their first rows, and only files that fit are cached for the commit call to reuse
+CSV_PREVIEW_MAX_ROWS = int(os.environ.get('CSV_PREVIEW_MAX_ROWS', '20000'))
+
+# Plaid API client settings
+# Base URL of the Plaid API; overrides PLAID_ENV (e.g. to point at a local stand-in)
+PLAID_HOST = os.environ.get('PLAID_HOST', '')
+# Keep-alive connections kept open to Plaid per process
+PLAID_POOL_SIZE = int(os.environ.get('PLAID_POOL_SIZE', '10'))
+# Institution metadata stored locally is fetched from Plaid again once older than this (seconds)
+PLAID_INSTITUTION_TTL = int(os.environ.get('PLAID_INSTITUTION_TTL', str(7 * 24 * 60 * 60)))
+# An Item's account list is cached for this long (seconds), for the linking and mapping flow
+PLAID_ACCOUNTS_CACHE_TTL = int(os.environ.get('PLAID_ACCOUNTS_CACHE_TTL', '300'))
+PLAID_CONNECT_TIMEOUT = float(os.environ.get('PLAID_CONNECT_TIMEOUT', '5'))
+PLAID_READ_TIMEOUT = float(os.environ.get('PLAID_READ_TIMEOUT', '60'))
+
+# Plaid API rate limits per minute, per client ID and per Item, enforced across
+# all processes before each call. Keep them at or below Plaid's published limits
+PLAID_RATE_LIMITS = {
+    'transactions_sync': {'client': 2500, 'item': 50},
+    'accounts_get': {'client': 15000, 'item': 15},
+    'institutions_get_by_id': {'client': 400},
+    'item_public_token_exchange': {'client': 2500},
+    'link_token_create': {'client': 5000},
+    'item_webhook_update': {'client': 500, 'item': 10},
+    'webhook_verification_key_get': {'client': 500},
+    # Share of transactions_sync that backfills of newly linked Items may use together
+    'transactions_sync_backfill': {'client': 500},
+    # Any other endpoint
+    'default': {'client': 500, 'item': 15},
+}
+# A call waits this many seconds at most for the rate limiter before it is
+# rescheduled (Celery) or refused with 429 (web requests)
+PLAID_RATE_LIMIT_MAX_WAIT = float(os.environ.get('PLAID_RATE_LIMIT_MAX_WAIT', '5'))
+
+# Plaid sync fan-out: at most this many Items sync at once across all workers...
+PLAID_SYNC_MAX_CONCURRENCY = int(os.environ.get('PLAID_SYNC_MAX_CONCURRENCY', '8'))
+# ...and at most this many per institution, so one slow bank can't take every worker
+PLAID_SYNC_MAX_PER_INSTITUTION = int(os.environ.get('PLAID_SYNC_MAX_PER_INSTITUTION', '2'))
+# A sync slot is released automatically after this long if its worker dies; a
+# running sync extends its slots with every page
+PLAID_SYNC_SLOT_TTL = int(os.environ.get('PLAID_SYNC_SLOT_TTL', str(15 * 60)))
+# Seconds before a sync that found no free slot tries again
+PLAID_SYNC_RETRY_DELAY = int(os.environ.get('PLAID_SYNC_RETRY_DELAY', '30'))
+
+# A sync holds a lease on its Plaid Item so no other sync of the Item overlaps it;
+# the lease expires after this many seconds without a new page (e.g. if the worker died)
+PLAID_SYNC_LEASE_TTL = int(os.environ.get('PLAID_SYNC_LEASE_TTL', '120'))
+# How many /transactions/sync pages are downloaded ahead of the page being written
+PLAID_SYNC_PREFETCH_PAGES = int(os.environ.get('PLAID_SYNC_PREFETCH_PAGES', '2'))
+
+# The history of a newly linked Item is imported in chunks of this many pages, each
+# committed with its cursor, so a failure only loses the chunk in progress
+PLAID_BACKFILL_CHUNK_PAGES = int(os.environ.get('PLAID_BACKFILL_CHUNK_PAGES', '10'))
+# Seconds between two chunks of a backfill, letting other work on the backfill queue in
+PLAID_BACKFILL_CHUNK_DELAY = int(os.environ.get('PLAID_BACKFILL_CHUNK_DELAY', '1'))
+# A user's sync job that hasn't made progress for this long is considered lost,
+# and a new request starts another one instead of waiting for it
+PLAID_SYNC_JOB_STALE_AFTER = int(os.environ.get('PLAID_SYNC_JOB_STALE_AFTER', str(15 * 60)))
+
+# Plaid sync retries: an Item whose sync failed with a transient error is
+# retried after this many seconds, doubling with every failure in a row...
+PLAID_RETRY_BASE_DELAY = int(os.environ.get('PLAID_RETRY_BASE_DELAY', str(5 * 60)))
+# ...up to this many seconds between attempts
+PLAID_RETRY_MAX_DELAY = int(os.environ.get('PLAID_RETRY_MAX_DELAY', str(24 * 60 * 60)))
+
+# Plaid webhooks: the public URL of the webhook endpoint (/api/plaid/webhook/),
+# given to Plaid when an Item is linked. Leave empty to rely on the nightly sync only
+PLAID_WEBHOOK_URL = os.environ.get('PLAID_WEBHOOK_URL', '')
+# Seconds to wait after a webhook before syncing, so a burst of webhooks for an Item becomes one sync
+PLAID_WEBHOOK_SYNC_DELAY = int(os.environ.get('PLAID_WEBHOOK_SYNC_DELAY', '60'))
+# Webhooks signed longer ago than this are rejected (Plaid recommends 5 minutes)
+PLAID_WEBHOOK_MAX_AGE = int(os.environ.get('PLAID_WEBHOOK_MAX_AGE', str(5 * 60)))
+# With webhooks on, the nightly sync skips Items synced within this many hours
+PLAID_SYNC_SKIP_RECENT_HOURS = int(os.environ.get('PLAID_SYNC_SKIP_RECENT_HOURS', '6'))
+
+# Every Plaid sync is recorded with its phase timings (SyncRun); records older than this many days are deleted
+PLAID_SYNC_RUN_RETENTION_DAYS = int(os.environ.get('PLAID_SYNC_RUN_RETENTION_DAYS', '30'))
+# The daily balance check flags linked accounts whose difference between ledger and bank
+# balance moved by more than this since their last good check
+PLAID_BALANCE_TOLERANCE = float(os.environ.get('PLAID_BALANCE_TOLERANCE', '1.00'))
+# Level of the Plaid integration's log messages; DEBUG logs every page of every sync
+PLAID_LOG_LEVEL = os.environ.get('PLAID_LOG_LEVEL', 'INFO')
+
+# Redis, for the cache and for locks shared by the web and Celery processes
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379/0')
+
+# Cache (shared by the web and Celery processes)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+}
+
+# Logging: the Plaid integration logs to the console, in the web and Celery processes alike
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {
+            'format': '%(asctime)s %(levelname)s %(name)s: %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'loggers': {
+        'plaid_integration': {
+            'handlers': ['console'],
+            'level': PLAID_LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
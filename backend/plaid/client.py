@@ -1,12 +1,6 @@
 import os
-import plaid
-from plaid.api import plaid_api
-from plaid.model.country_code import CountryCode
-from plaid.model.products import Products
-from plaid.model.link_token_create_request import LinkTokenCreateRequest
-from plaid.model.link_token_create_request_user import LinkTokenCreateRequestUser
-from plaid.model.item_public_token_exchange_request import ItemPublicTokenExchangeRequest
-from plaid.model.transactions_sync_request import TransactionsSyncRequest
+# The SDK is imported on first use; the local `plaid` app shadows it
+from plaid_integration.sdk import load_plaid_sdk, models, plaid_api
 from datetime import datetime, timedelta
 from django.conf import settings
 
@@ -23,6 +17,8 @@ def get_plaid_client():
     if not PLAID_CLIENT_ID or not PLAID_SECRET:
         raise ValueError("Plaid API credentials not configured. Please set PLAID_CLIENT_ID and PLAID_SECRET environment variables.")
 
+    plaid = load_plaid_sdk()
+
     # Configure API environment
     if PLAID_ENV == 'sandbox':
         host = plaid.Environment.Sandbox
@@ -42,7 +38,7 @@ def get_plaid_client():
         }
     )
     api_client = plaid.ApiClient(configuration)
-    return plaid_api.PlaidApi(api_client)
+    return plaid_api().PlaidApi(api_client)
 
 def create_link_token(user_id, account_id=None):
     """
@@ -58,13 +54,13 @@ def create_link_token(user_id, account_id=None):
     client = get_plaid_client()
 
     # Create a Link token for the given user
-    request = LinkTokenCreateRequest(
-        user=LinkTokenCreateRequestUser(
+    request = models.LinkTokenCreateRequest(
+        user=models.LinkTokenCreateRequestUser(
             client_user_id=str(user_id)
         ),
         client_name="Koala Budget",
-        products=[Products("transactions")],
-        country_codes=[CountryCode("US"), CountryCode("CA")],
+        products=[models.Products("transactions")],
+        country_codes=[models.CountryCode("US"), models.CountryCode("CA")],
         language="en",
         webhook="https://webhook.example.com",  # Replace with your webhook URL
     )
@@ -84,7 +80,7 @@ def exchange_public_token(public_token):
     """
     client = get_plaid_client()
 
-    request = ItemPublicTokenExchangeRequest(
+    request = models.ItemPublicTokenExchangeRequest(
         public_token=public_token
     )
     response = client.item_public_token_exchange(request)
@@ -114,12 +110,12 @@ def get_transactions(access_token, cursor=None, start_date=None, end_date=None):
 
     # Create request - only include cursor if it's not None
     if cursor is not None:
-        request = TransactionsSyncRequest(
+        request = models.TransactionsSyncRequest(
             access_token=access_token,
             cursor=cursor
         )
     else:
-        request = TransactionsSyncRequest(
+        request = models.TransactionsSyncRequest(
             access_token=access_token
         )
 
@@ -143,12 +139,9 @@ def get_institution(institution_id):
     """
     client = get_plaid_client()
 
-    from plaid.model.institutions_get_by_id_request import InstitutionsGetByIdRequest
-    from plaid.model.country_code import CountryCode
-
-    request = InstitutionsGetByIdRequest(
+    request = models.InstitutionsGetByIdRequest(
         institution_id=institution_id,
-        country_codes=[CountryCode('US'), CountryCode('CA')]
+        country_codes=[models.CountryCode('US'), models.CountryCode('CA')]
     )
 
     response = client.institutions_get_by_id(request)
@@ -166,9 +159,7 @@ def get_accounts(access_token):
     """
     client = get_plaid_client()
 
-    from plaid.model.accounts_get_request import AccountsGetRequest
-
-    request = AccountsGetRequest(
+    request = models.AccountsGetRequest(
         access_token=access_token
     )
 
@@ -0,0 +1,55 @@
+from django.contrib import admin
+
+from .models import BalanceCheck, PlaidItem, SyncRun
+from .runs import sync_run_summary
+
+@admin.register(SyncRun)
+class SyncRunAdmin(admin.ModelAdmin):
+    """
+    Plaid syncs, with their phase timings. Sort by duration or cursor lag to
+    find slow or lagging Items; the list starts with a summary of the last 7 days.
+    """
+    list_display = (
+        'item_id', 'institution_name', 'status', 'backfill', 'started_at', 'duration',
+        'fetch_seconds', 'fetch_wait_seconds', 'apply_seconds', 'commit_seconds',
+        'pages', 'added', 'modified', 'removed', 'api_calls', 'error_count', 'cursor_lag'
+    )
+    list_filter = ('status', 'backfill', 'started_at')
+    search_fields = ('item_id', 'institution_name', 'error_message')
+    ordering = ('-started_at',)
+    date_hierarchy = 'started_at'
+
+    # Written by syncs only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = dict(extra_context or {})
+        extra_context['summary'] = sync_run_summary(SyncRun.objects.all(), PlaidItem.objects.all())
+        return super().changelist_view(request, extra_context=extra_context)
+
+@admin.register(BalanceCheck)
+class BalanceCheckAdmin(admin.ModelAdmin):
+    """
+    Daily comparisons of bank and ledger balances of linked accounts. Filter
+    on flagged to find the accounts that are out of balance.
+    """
+    list_display = (
+        'account', 'plaid_item', 'checked_at', 'plaid_balance', 'ledger_balance', 'difference', 'drift',
+        'flagged'
+    )
+    list_filter = ('flagged', 'checked_at')
+    search_fields = ('account__name', 'plaid_item__item_id', 'plaid_item__institution_name')
+    ordering = ('-checked_at',)
+    date_hierarchy = 'checked_at'
+    list_select_related = ('account', 'plaid_item__account')
+
+    # Written by the balance check only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
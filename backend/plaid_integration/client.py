@@ -1,50 +1,174 @@
 import os
 import sys
-# Add the plaid-python package to the import path explicitly
-import plaid as plaid_package
-from plaid_package.api import plaid_api
-from plaid_package.model.country_code import CountryCode
-from plaid_package.model.products import Products
-from plaid_package.model.link_token_create_request import LinkTokenCreateRequest
-from plaid_package.model.link_token_create_request_user import LinkTokenCreateRequestUser
-from plaid_package.model.item_public_token_exchange_request import ItemPublicTokenExchangeRequest
-from plaid_package.model.transactions_sync_request import TransactionsSyncRequest
+import json
+import threading
+# The SDK is imported on first use, see sdk.py; the local `plaid` app shadows it
+from .sdk import load_plaid_sdk, models, plaid_api
 from datetime import datetime, timedelta
 from django.conf import settings
+from .ratelimit import PlaidRateLimited, record_metric, wait_for_rate_limit
 
 # Plaid API configuration
 PLAID_CLIENT_ID = os.getenv('PLAID_CLIENT_ID', '')
 PLAID_SECRET = os.getenv('PLAID_SECRET', '')
 PLAID_ENV = os.getenv('PLAID_ENV', 'sandbox')  # sandbox, development, or production
 
-# Configure Plaid client
-def get_plaid_client():
+# Returned by /transactions/sync when the Item's data changes between pages;
+# pagination must restart from the cursor the sync started with
+TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION = 'TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION'
+
+# Seconds to wait before retrying a call Plaid refused with RATE_LIMIT_EXCEEDED;
+# Plaid's limits are counted per minute
+PLAID_RATE_LIMIT_RETRY_AFTER = 60
+
+def get_error_code(exception):
     """
-    Initialize and return a Plaid API client.
+    Get the Plaid error code (e.g. ITEM_LOGIN_REQUIRED) of an API exception.
+
+    Returns:
+        The error code string, or None if the exception is not a Plaid API error
     """
-    if not PLAID_CLIENT_ID or not PLAID_SECRET:
-        raise ValueError("Plaid API credentials not configured. Please set PLAID_CLIENT_ID and PLAID_SECRET environment variables.")
+    body = getattr(exception, 'body', None)
+    if not body:
+        return None
+    try:
+        return json.loads(body).get('error_code')
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+_pooled_rest_client_class = None
+
+def _pooled_rest_client(configuration, pool_size, timeout):
+    """
+    Create a REST client with a sized connection pool and default timeouts.
+
+    The SDK only applies timeouts that are passed to each API call; this
+    applies the configured (connect, read) timeouts to every request instead.
+    The class is built on first use so the SDK isn't imported before then.
+    """
+    global _pooled_rest_client_class
+
+    if _pooled_rest_client_class is None:
+        load_plaid_sdk()
+        from plaid import rest
+
+        class PooledRESTClient(rest.RESTClientObject):
+            def __init__(self, configuration, pool_size, timeout):
+                super().__init__(configuration, maxsize=pool_size)
+                self.timeout = timeout
+
+            def request(self, *args, _request_timeout=None, **kwargs):
+                return super().request(*args, _request_timeout=_request_timeout or self.timeout, **kwargs)
+
+        _pooled_rest_client_class = PooledRESTClient
 
-    # Configure API environment
+    return _pooled_rest_client_class(configuration, pool_size, timeout)
+
+# The process-wide client, see get_plaid_client()
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+def _get_plaid_host():
+    if settings.PLAID_HOST:
+        return settings.PLAID_HOST
+    plaid_package = load_plaid_sdk()
     if PLAID_ENV == 'sandbox':
-        host = plaid_package.Environment.Sandbox
+        return plaid_package.Environment.Sandbox
     elif PLAID_ENV == 'development':
-        host = plaid_package.Environment.Development
+        return plaid_package.Environment.Development
     elif PLAID_ENV == 'production':
-        host = plaid_package.Environment.Production
-    else:
-        raise ValueError(f"Invalid PLAID_ENV value: {PLAID_ENV}. Must be 'sandbox', 'development', or 'production'.")
+        return plaid_package.Environment.Production
+    raise ValueError(f"Invalid PLAID_ENV value: {PLAID_ENV}. Must be 'sandbox', 'development', or 'production'.")
+
+def create_plaid_client():
+    """
+    Create a new Plaid API client with its own connection pool.
+
+    Most code should use get_plaid_client() instead.
+    """
+    if not PLAID_CLIENT_ID or not PLAID_SECRET:
+        raise ValueError("Plaid API credentials not configured. Please set PLAID_CLIENT_ID and PLAID_SECRET environment variables.")
 
-    # Configure and return client
+    plaid_package = load_plaid_sdk()
     configuration = plaid_package.Configuration(
-        host=host,
+        host=_get_plaid_host(),
         api_key={
             'clientId': PLAID_CLIENT_ID,
             'secret': PLAID_SECRET,
         }
     )
     api_client = plaid_package.ApiClient(configuration)
-    return plaid_api.PlaidApi(api_client)
+    api_client.rest_client = _pooled_rest_client(
+        configuration,
+        pool_size=settings.PLAID_POOL_SIZE,
+        timeout=(settings.PLAID_CONNECT_TIMEOUT, settings.PLAID_READ_TIMEOUT)
+    )
+    return plaid_api().PlaidApi(api_client)
+
+def get_plaid_client():
+    """
+    Return the process-wide Plaid API client, creating it on first use.
+
+    The client is shared by all threads of a process so HTTP keep-alive
+    connections and TLS sessions are reused between calls. Sockets must not be
+    shared across processes, so a forked child (e.g. a Celery prefork worker)
+    builds its own client the first time it needs one.
+    """
+    global _client, _client_pid
+
+    pid = os.getpid()
+    client = _client
+    if client is not None and _client_pid == pid:
+        return client
+
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            _client = create_plaid_client()
+            _client_pid = pid
+        return _client
+
+def reset_plaid_client():
+    """Drop the process-wide client; the next call creates a new one."""
+    global _client, _client_pid
+
+    with _client_lock:
+        _client = None
+        _client_pid = None
+
+def call_plaid(endpoint, request, access_token=None, raw=False):
+    """
+    Call a Plaid API endpoint through the shared rate limiter.
+
+    Args:
+        endpoint: The PlaidApi method name, e.g. 'transactions_sync'
+        request: The request model
+        access_token: The access token of the Item the call is about, if any,
+            so the Item's own limit applies too
+        raw: Return the response as parsed JSON (dictionaries and lists, with
+            dates as strings) instead of SDK models. Building the SDK models
+            type-checks every field and is by far the slowest part of large
+            responses
+
+    Raises:
+        PlaidRateLimited: If our limiter or Plaid refused the call
+    """
+    wait_for_rate_limit(endpoint, access_token)
+    try:
+        if not raw:
+            return getattr(get_plaid_client(), endpoint)(request)
+        response = getattr(get_plaid_client(), endpoint)(request, _preload_content=False)
+        try:
+            return json.loads(response.data)
+        finally:
+            response.release_conn()
+    except load_plaid_sdk().ApiException as e:
+        if e.status == 429:
+            # Plaid's count disagrees with ours (e.g. another client ID or an
+            # outdated limit); back off for a whole window
+            record_metric(endpoint, 'plaid_limited')
+            raise PlaidRateLimited(endpoint, PLAID_RATE_LIMIT_RETRY_AFTER) from e
+        raise
 
 def create_link_token(user_id, account_id=None):
     """
@@ -57,21 +181,24 @@ def create_link_token(user_id, account_id=None):
     Returns:
         The link token string
     """
-    client = get_plaid_client()
-
     # Create a Link token for the given user
-    request = LinkTokenCreateRequest(
-        user=LinkTokenCreateRequestUser(
+    options = {}
+    if settings.PLAID_WEBHOOK_URL:
+        # Plaid notifies this URL when the Item has new transactions or errors
+        options['webhook'] = settings.PLAID_WEBHOOK_URL
+
+    request = models.LinkTokenCreateRequest(
+        user=models.LinkTokenCreateRequestUser(
             client_user_id=str(user_id)
         ),
         client_name="Koala Budget",
-        products=[Products("transactions")],
-        country_codes=[CountryCode("US"), CountryCode("CA")],
+        products=[models.Products("transactions")],
+        country_codes=[models.CountryCode("US"), models.CountryCode("CA")],
         language="en",
-        webhook="https://webhook.example.com",  # Replace with your webhook URL
+        **options
     )
 
-    response = client.link_token_create(request)
+    response = call_plaid('link_token_create', request)
     return response['link_token']
 
 def exchange_public_token(public_token):
@@ -84,18 +211,48 @@ def exchange_public_token(public_token):
     Returns:
         A tuple of (access_token, item_id)
     """
-    client = get_plaid_client()
-
-    request = ItemPublicTokenExchangeRequest(
+    request = models.ItemPublicTokenExchangeRequest(
         public_token=public_token
     )
-    response = client.item_public_token_exchange(request)
+    response = call_plaid('item_public_token_exchange', request)
 
     return response['access_token'], response['item_id']
 
+def update_item_webhook(access_token, webhook):
+    """
+    Change the webhook URL Plaid notifies for an existing Plaid Item.
+
+    Args:
+        access_token: The access token for the Plaid Item
+        webhook: The new webhook URL
+    """
+    request = models.ItemWebhookUpdateRequest(
+        access_token=access_token,
+        webhook=webhook
+    )
+    call_plaid('item_webhook_update', request, access_token)
+
+def get_webhook_verification_key(key_id):
+    """
+    Get the public key Plaid signs webhooks with.
+
+    Args:
+        key_id: The key ID from the webhook's JWT header
+
+    Returns:
+        The key as a JWK dictionary
+    """
+    request = models.WebhookVerificationKeyGetRequest(key_id=key_id)
+    response = call_plaid('webhook_verification_key_get', request)
+    return response.to_dict()['key']
+
 def get_transactions(access_token, cursor=None, start_date=None, end_date=None):
     """
-    Get transactions for a Plaid Item.
+    Get one page of transaction updates for a Plaid Item.
+
+    Callers must keep requesting pages with the returned cursor until has_more
+    is False, and restart from their original cursor if Plaid raises
+    TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION.
 
     Args:
         access_token: The access token for the Plaid Item
@@ -104,10 +261,11 @@ def get_transactions(access_token, cursor=None, start_date=None, end_date=None):
         end_date: Optional end date for transactions
 
     Returns:
-        A tuple of (transactions, cursor, has_more)
+        A tuple of (transactions, removed_ids, cursor, has_more), where
+        transactions are the added and modified transactions, as the
+        dictionaries Plaid sent, and removed_ids the Plaid IDs of removed
+        transactions
     """
-    client = get_plaid_client()
-
     # Set default date range if not provided
     if not start_date:
         start_date = (datetime.now() - timedelta(days=30)).date()
@@ -116,19 +274,20 @@ def get_transactions(access_token, cursor=None, start_date=None, end_date=None):
 
     # Create request - only include cursor if it's not None
     if cursor is not None:
-        request = TransactionsSyncRequest(
+        request = models.TransactionsSyncRequest(
             access_token=access_token,
             cursor=cursor
         )
     else:
-        request = TransactionsSyncRequest(
+        request = models.TransactionsSyncRequest(
             access_token=access_token
         )
 
-    response = client.transactions_sync(request)
+    response = call_plaid('transactions_sync', request, access_token, raw=True)
 
     return (
         response['added'] + response['modified'],
+        [removed['transaction_id'] for removed in response['removed']],
         response['next_cursor'],
         response['has_more']
     )
@@ -141,19 +300,16 @@ def get_institution(institution_id):
         institution_id: The Plaid institution ID
 
     Returns:
-        Institution information
+        The institution as the dictionary Plaid sent, including its URL, color
+        and logo when Plaid has them
     """
-    client = get_plaid_client()
-
-    from plaid_package.model.institutions_get_by_id_request import InstitutionsGetByIdRequest
-    from plaid_package.model.country_code import CountryCode
-
-    request = InstitutionsGetByIdRequest(
+    request = models.InstitutionsGetByIdRequest(
         institution_id=institution_id,
-        country_codes=[CountryCode('US'), CountryCode('CA')]
+        country_codes=[models.CountryCode('US'), models.CountryCode('CA')],
+        options=models.InstitutionsGetByIdRequestOptions(include_optional_metadata=True)
     )
 
-    response = client.institutions_get_by_id(request)
+    response = call_plaid('institutions_get_by_id', request, raw=True)
     return response['institution']
 
 def get_accounts(access_token):
@@ -164,15 +320,11 @@ def get_accounts(access_token):
         access_token: The access token for the Plaid Item
 
     Returns:
-        List of accounts
+        List of accounts, as the dictionaries Plaid sent
     """
-    client = get_plaid_client()
-
-    from plaid_package.model.accounts_get_request import AccountsGetRequest
-
-    request = AccountsGetRequest(
+    request = models.AccountsGetRequest(
         access_token=access_token
     )
 
-    response = client.accounts_get(request)
+    response = call_plaid('accounts_get', request, access_token, raw=True)
     return response['accounts']
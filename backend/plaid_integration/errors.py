@@ -0,0 +1,120 @@
+"""
+Classification of Plaid sync errors and scheduling of retries.
+
+A permanent error (e.g. ITEM_LOGIN_REQUIRED) can only be fixed by the user
+linking the Item again through Plaid Link, so the Item is parked with status
+'relink_required' and isn't retried. Anything else (institution downtime,
+Plaid internal errors, network trouble, ...) is treated as transient: the Item
+gets status 'error' and is retried with exponential backoff.
+
+PENDING_EXPIRATION is neither: the user's consent runs out in about a week and
+the Item keeps working until then. Only the expiry is recorded, so the user
+can be asked to re-link in time.
+"""
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import PlaidItem
+
+# Plaid error codes that need the user to go through Plaid Link again
+PERMANENT_ERROR_CODES = {
+    'ITEM_LOGIN_REQUIRED',
+    'INVALID_CREDENTIALS',
+    'INVALID_MFA',
+    'INVALID_UPDATED_USERNAME',
+    'INSUFFICIENT_CREDENTIALS',
+    'ITEM_LOCKED',
+    'ITEM_NOT_SUPPORTED',
+    'USER_SETUP_REQUIRED',
+    'MFA_NOT_SUPPORTED',
+    'NO_ACCOUNTS',
+    'ACCESS_NOT_GRANTED',
+    'INVALID_ACCESS_TOKEN',
+    'ITEM_NOT_FOUND',
+    'USER_PERMISSION_REVOKED',
+}
+
+# Warns that the user's consent will soon expire; not a failure
+PENDING_EXPIRATION = 'PENDING_EXPIRATION'
+# How long before consent expires Plaid sends PENDING_EXPIRATION
+CONSENT_EXPIRATION_NOTICE = timedelta(days=7)
+
+
+def is_permanent_error(error_code):
+    """Whether a Plaid error code can only be fixed by re-linking the Item."""
+    return error_code in PERMANENT_ERROR_CODES
+
+
+def retry_delay(attempts):
+    """
+    Time to wait before retrying an Item that has failed `attempts` times in
+    a row.
+
+    The delay doubles with every attempt, from PLAID_RETRY_BASE_DELAY up to
+    PLAID_RETRY_MAX_DELAY. Half of it is random, so Items that failed together
+    (e.g. during an institution outage) don't all retry at the same moment.
+    """
+    delay = min(settings.PLAID_RETRY_MAX_DELAY, settings.PLAID_RETRY_BASE_DELAY * 2 ** max(0, attempts - 1))
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+
+def record_consent_expiration(item_ids, expires_at=None):
+    """
+    Record when the user's consent for a Plaid Item runs out.
+
+    The status of the Item is left as it is: it keeps syncing until then.
+
+    Args:
+        item_ids: IDs of the PlaidItem rows of the Plaid Item
+        expires_at: When consent expires; CONSENT_EXPIRATION_NOTICE from now
+            if Plaid didn't say
+    """
+    now = timezone.now()
+    PlaidItem.objects.filter(id__in=item_ids).exclude(status='disconnected').update(
+        consent_expires_at=expires_at or now + CONSENT_EXPIRATION_NOTICE,
+        updated_at=now
+    )
+
+
+def record_item_error(item_ids, message, error_code=None):
+    """
+    Record a failed sync on the PlaidItem rows of a Plaid Item.
+
+    Args:
+        item_ids: IDs of the PlaidItem rows of the Plaid Item
+        message: The error message to show
+        error_code: The Plaid error code, if the error came from Plaid
+
+    Returns:
+        The new status, 'error' or 'relink_required'; the status is left as
+        it was for PENDING_EXPIRATION, which only records the expiry
+    """
+    if error_code == PENDING_EXPIRATION:
+        record_consent_expiration(item_ids)
+        return PlaidItem.objects.filter(id__in=item_ids).values_list('status', flat=True).first()
+
+    items = PlaidItem.objects.filter(id__in=item_ids).exclude(status='disconnected')
+    now = timezone.now()
+
+    if is_permanent_error(error_code):
+        items.update(
+            status='relink_required',
+            error_message=message,
+            next_retry_at=None,
+            updated_at=now
+        )
+        return 'relink_required'
+
+    attempts = (items.aggregate(attempts=Max('retry_attempts'))['attempts'] or 0) + 1
+    items.update(
+        status='error',
+        error_message=message,
+        retry_attempts=attempts,
+        next_retry_at=now + retry_delay(attempts),
+        updated_at=now
+    )
+    return 'error'
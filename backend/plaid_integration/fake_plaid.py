@@ -0,0 +1,354 @@
+"""
+Local HTTP stand-in for the Plaid API, for benchmarks and offline testing.
+
+Serves just enough of /transactions/sync, /accounts/get,
+/institutions/get_by_id, /item/public_token/exchange, /link/token/create and
+/webhook_verification_key/get for the SDK to deserialize the responses. Latency can be added per request and per
+new connection (standing in for the TCP and TLS handshakes that a pooled
+client avoids), and /transactions/sync can be made to fail now and then.
+
+Every access token gets the same history of `transactions` transactions,
+served oldest first in pages. After the first page, each page also modifies
+and removes some transactions of the page before it, as Plaid does when
+pending transactions post.
+
+    server = FakePlaidServer(latency=0.02, connect_latency=0.05)
+    server.start()
+    # point the client at server.url (settings.PLAID_HOST)
+    server.stop()
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec
+
+CATEGORIES = [
+    ['Food and Drink', 'Restaurants'],
+    ['Shops', 'Supermarkets and Groceries'],
+    ['Travel', 'Gas Stations'],
+    ['Transfer', 'Payroll'],
+    ['Service', 'Utilities'],
+]
+
+MERCHANTS = ['Coffee Shop', 'Grocery Store', 'Gas Station', 'Payroll', 'Power Company']
+
+# Errors that can be injected into /transactions/sync: (HTTP status, error_type, message)
+SYNC_ERRORS = {
+    'INSTITUTION_DOWN': (400, 'INSTITUTION_ERROR', 'this institution is not currently responding to this request'),
+    'INTERNAL_SERVER_ERROR': (500, 'API_ERROR', 'an unexpected error occurred'),
+    'RATE_LIMIT_EXCEEDED': (429, 'RATE_LIMIT_EXCEEDED', 'rate limit exceeded for attempted transactions sync calls'),
+    'TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION': (
+        400, 'TRANSACTIONS_ERROR', 'underlying transaction data changed since last page was fetched'
+    ),
+    'ITEM_LOGIN_REQUIRED': (400, 'ITEM_ERROR', 'the login details of this item have changed'),
+}
+
+
+def fake_transaction(index, account_id, item_key='', start_date=date(2020, 1, 1)):
+    """
+    Build the JSON of the index-th fake transaction of an account.
+
+    Plaid transaction IDs are globally unique, so the ID includes `item_key`
+    (derived from the access token) as well as the account.
+    """
+    kind = index % len(CATEGORIES)
+    # Plaid amounts are positive for money leaving the account
+    amount = -2500.0 if kind == 3 else round(5 + (index * 7919 % 20000) / 100, 2)
+    day = (start_date + timedelta(days=index % 1500)).isoformat()
+
+    return {
+        'transaction_id': f"txn-{item_key}{account_id}-{index}",
+        'account_id': account_id,
+        'amount': amount,
+        'iso_currency_code': 'USD',
+        'unofficial_currency_code': None,
+        'category': CATEGORIES[kind],
+        'category_id': f"1300{kind}000",
+        'check_number': None,
+        'date': day,
+        'datetime': None,
+        'authorized_date': day,
+        'authorized_datetime': None,
+        'location': {
+            'address': None, 'city': None, 'region': None, 'postal_code': None,
+            'country': None, 'lat': None, 'lon': None, 'store_number': None,
+        },
+        'name': f"{MERCHANTS[kind]} #{index % 97}",
+        'merchant_name': MERCHANTS[kind],
+        'payment_meta': {
+            'by_order_of': None, 'payee': None, 'payer': None, 'payment_method': None,
+            'payment_processor': None, 'ppd_id': None, 'reason': None, 'reference_number': None,
+        },
+        'payment_channel': 'in store',
+        'pending': False,
+        'pending_transaction_id': None,
+        'account_owner': None,
+        'transaction_code': None,
+        'transaction_type': 'place',
+    }
+
+
+class WebhookSigner:
+    """
+    Signs webhook bodies the way Plaid does, with a locally generated key.
+
+        signer = WebhookSigner()
+        headers = {'Plaid-Verification': signer.sign(body)}
+        verify_webhook(body, headers['Plaid-Verification'], get_key=signer.get_key)
+    """
+
+    def __init__(self, key_id=None):
+        # A new key ID per key, so a key cached by the app is never reused
+        self.key_id = key_id or f"fake-{uuid.uuid4().hex}"
+        self.private_key = ec.generate_private_key(ec.SECP256R1())
+
+    @property
+    def jwk(self):
+        """The public key in the format of /webhook_verification_key/get."""
+        jwk = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(self.private_key.public_key()))
+        jwk.update({'alg': 'ES256', 'kid': self.key_id, 'use': 'sig', 'created_at': 1560466150, 'expired_at': None})
+        return jwk
+
+    def get_key(self, key_id):
+        if key_id != self.key_id:
+            raise KeyError(key_id)
+        return self.jwk
+
+    def sign(self, body, issued_at=None):
+        """Build the Plaid-Verification header for a request body (bytes)."""
+        claims = {
+            'iat': int(time.time() if issued_at is None else issued_at),
+            'request_body_sha256': hashlib.sha256(body).hexdigest(),
+        }
+        return jwt.encode(claims, self.private_key, algorithm='ES256', headers={'kid': self.key_id})
+
+
+class FakePlaidHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real API
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY every
+    # kept-alive response waits for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        # A new connection: pay the simulated handshake once
+        if self.server.connect_latency:
+            time.sleep(self.server.connect_latency)
+        self.server.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        self.server.count('requests')
+        self.server.count(self.path)
+
+        latency = self.server.latency
+        if self.server.latency_jitter:
+            latency += self.server.random().uniform(0, self.server.latency_jitter)
+        if latency:
+            time.sleep(latency)
+
+        handler = getattr(self, 'handle_' + self.path.strip('/').replace('/', '_'), None)
+        if handler is None:
+            self.send_json(404, {'error_code': 'NOT_FOUND', 'error_message': self.path})
+            return
+
+        status, payload = handler(body)
+        payload.setdefault('request_id', uuid.uuid4().hex[:15])
+        self.send_json(status, payload)
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def handle_link_token_create(self, body):
+        return 200, {'link_token': f"link-sandbox-{uuid.uuid4()}", 'expiration': '2030-01-01T00:00:00Z'}
+
+    def handle_item_public_token_exchange(self, body):
+        return 200, {'access_token': f"access-sandbox-{uuid.uuid4()}", 'item_id': uuid.uuid4().hex}
+
+    def handle_institutions_get_by_id(self, body):
+        return 200, {
+            'institution': {
+                'institution_id': body.get('institution_id', 'ins_1'),
+                'name': 'Fake Bank',
+                'products': ['transactions'],
+                'country_codes': ['US'],
+                'routing_numbers': [],
+                'oauth': False,
+            }
+        }
+
+    def handle_accounts_get(self, body):
+        accounts = [
+            {
+                'account_id': account_id,
+                'balances': {
+                    'available': 100.0, 'current': 110.0, 'limit': None,
+                    'iso_currency_code': 'USD', 'unofficial_currency_code': None,
+                },
+                'mask': f"{index:04d}",
+                'name': f"Fake Account {index}",
+                'official_name': None,
+                'type': 'depository',
+                'subtype': 'checking',
+            }
+            for index, account_id in enumerate(self.server.account_ids)
+        ]
+        return 200, {'accounts': accounts, 'item': self.fake_item()}
+
+    def handle_transactions_sync(self, body):
+        server = self.server
+        error = server.pick_error()
+        if error:
+            status, error_type, message = SYNC_ERRORS[error]
+            server.count(f"error:{error}")
+            return status, {
+                'error_type': error_type,
+                'error_code': error,
+                'error_message': message,
+                'display_message': None,
+            }
+
+        offset = int((body.get('cursor') or 'cursor-0').rsplit('-', 1)[1])
+        count = min(body.get('count') or server.page_size, server.page_size)
+        end = min(offset + count, server.transactions)
+
+        item_key = hashlib.sha1(body.get('access_token', '').encode('utf-8')).hexdigest()[:8] + '-'
+
+        def transaction(index):
+            account_id = server.account_ids[index % len(server.account_ids)]
+            return fake_transaction(index // len(server.account_ids), account_id, item_key)
+
+        added = [transaction(index) for index in range(offset, end)]
+
+        # Change the start of the previous page and remove its end
+        previous = max(0, offset - count)
+        modified_count = int((offset - previous) * server.modified_ratio)
+        removed_count = min(int((offset - previous) * server.removed_ratio), offset - previous - modified_count)
+        modified = []
+        for index in range(previous, previous + modified_count):
+            txn = transaction(index)
+            txn['amount'] = round(txn['amount'] + 1, 2)
+            txn['name'] += ' (posted)'
+            modified.append(txn)
+        removed = [
+            {'transaction_id': transaction(index)['transaction_id']}
+            for index in range(offset - removed_count, offset)
+        ]
+
+        return 200, {
+            'added': added,
+            'modified': modified,
+            'removed': removed,
+            'next_cursor': f"cursor-{end}",
+            'has_more': end < server.transactions,
+        }
+
+    def handle_webhook_verification_key_get(self, body):
+        try:
+            return 200, {'key': self.server.webhook_signer.get_key(body.get('key_id'))}
+        except KeyError:
+            return 400, {
+                'error_type': 'INVALID_INPUT',
+                'error_code': 'INVALID_WEBHOOK_VERIFICATION_KEY_ID',
+                'error_message': 'invalid key_id provided',
+                'display_message': None,
+            }
+
+    def fake_item(self):
+        return {
+            'item_id': 'fake-item',
+            'webhook': None,
+            'error': None,
+            'available_products': [],
+            'billed_products': ['transactions'],
+            'consent_expiration_time': None,
+            'update_type': 'background',
+        }
+
+
+class FakePlaidServer(ThreadingHTTPServer):
+    """
+    A fake Plaid API served from a background thread.
+
+    Args:
+        latency: Seconds added to every request
+        connect_latency: Seconds added to every new connection
+        transactions: Transactions returned by a full /transactions/sync
+        page_size: Transactions per /transactions/sync page (Plaid's maximum is 500)
+        accounts: Number of accounts the fake Item has
+        modified_ratio: Share of the previous page each page modifies
+        removed_ratio: Share of the previous page each page removes
+        latency_jitter: Up to this many random seconds added to every request
+        errors: Dictionary of SYNC_ERRORS code to the probability of a
+            /transactions/sync call failing with it
+        seed: Seed of the random latency and errors
+    """
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, connect_latency=0.0,
+                 transactions=0, page_size=500, accounts=1, modified_ratio=0.0,
+                 removed_ratio=0.0, latency_jitter=0.0, errors=None, seed=None):
+        super().__init__((host, port), FakePlaidHandler)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.connect_latency = connect_latency
+        self.transactions = transactions
+        self.page_size = page_size
+        self.modified_ratio = modified_ratio
+        self.removed_ratio = removed_ratio
+        self.errors = errors or {}
+        self._random = random.Random(seed)
+        self.account_ids = [f"fake-account-{index}" for index in range(accounts)]
+        self.webhook_signer = WebhookSigner()
+        self.counters = {}
+        self._counter_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name):
+        with self._counter_lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def random(self):
+        return self._random
+
+    def pick_error(self):
+        """The error the next /transactions/sync call fails with, if any."""
+        roll = self._random.random()
+        for code, probability in self.errors.items():
+            if roll < probability:
+                return code
+            roll -= probability
+        return None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,106 @@
+"""
+Sync jobs started by users.
+
+A user-triggered sync runs in a Celery task (tasks.run_sync_job) and is
+tracked as a job: a dictionary in the cache that the client polls through the
+sync_status endpoint. There is at most one queued or running job per Plaid
+Item; asking to sync an Item that already has one returns that job.
+"""
+import uuid
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+# Cache key prefixes: the current job of a Plaid Item, and each job's state
+ITEM_JOB_KEY = 'plaid-sync:item-job'
+JOB_KEY = 'plaid-sync:job'
+
+# How long a job's state is kept
+JOB_TIMEOUT = 60 * 60
+
+# Job states; a job is 'queued' until a worker picks it up (again, after a
+# rate limit or while another sync of the Item finishes)
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCESS = 'success'
+ERROR = 'error'
+FINISHED_STATES = (SUCCESS, ERROR)
+
+
+def _item_job_key(plaid_item):
+    return f"{ITEM_JOB_KEY}:{plaid_item.user_id}:{plaid_item.item_id}"
+
+
+def get_sync_job(job_id):
+    return cache.get(f"{JOB_KEY}:{job_id}")
+
+
+def update_sync_job(job_id, **fields):
+    """Update a job's state. Only the task running the job writes to it."""
+    job = get_sync_job(job_id)
+    if job is None:
+        return None
+    job.update(fields, updated_at=timezone.now().isoformat())
+    cache.set(f"{JOB_KEY}:{job_id}", job, JOB_TIMEOUT)
+    return job
+
+
+def is_pending(job):
+    """
+    Whether a job is still waiting or running.
+
+    A job that hasn't been updated for PLAID_SYNC_JOB_STALE_AFTER seconds is
+    taken as lost (e.g. its worker was killed), so the Item can be synced again.
+    """
+    if job is None or job['state'] in FINISHED_STATES:
+        return False
+    updated_at = datetime.fromisoformat(job['updated_at'])
+    return timezone.now() - updated_at < timedelta(seconds=settings.PLAID_SYNC_JOB_STALE_AFTER)
+
+
+def start_sync_job(plaid_item):
+    """
+    Create a sync job for a Plaid Item, unless it already has one pending.
+
+    Args:
+        plaid_item: Any PlaidItem row of the Plaid Item
+
+    Returns:
+        A tuple of (job, created); the task must be queued if created is True
+    """
+    item_key = _item_job_key(plaid_item)
+
+    for _ in range(2):
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'user_id': plaid_item.user_id,
+            'plaid_item_id': plaid_item.id,
+            'item_id': plaid_item.item_id,
+            'state': QUEUED,
+            'created_at': timezone.now().isoformat(),
+            'updated_at': timezone.now().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None,
+        }
+        cache.set(f"{JOB_KEY}:{job_id}", job, JOB_TIMEOUT)
+        if cache.add(item_key, job_id, JOB_TIMEOUT):
+            return job, True
+
+        # Coalesce with the job the Item already has, if it isn't done yet
+        cache.delete(f"{JOB_KEY}:{job_id}")
+        current = get_sync_job(cache.get(item_key))
+        if is_pending(current):
+            return current, False
+        # Its job is finished (or lost): start a new one
+        cache.delete(item_key)
+
+    # Another request took the Item between our two attempts
+    current = get_sync_job(cache.get(item_key))
+    if current is None:
+        raise RuntimeError(f"Could not start a sync job for Plaid Item {plaid_item.item_id}")
+    return current, False
@@ -0,0 +1,251 @@
+"""
+Redis-backed coordination primitives shared by the web and Celery processes.
+"""
+import time
+import uuid
+
+import redis
+from django.conf import settings
+
+_redis_client = None
+
+
+def get_redis():
+    """Return a Redis client for settings.REDIS_URL (created on first use)."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis_client
+
+
+# Take a slot in every semaphore or in none of them. Expired slots (whose
+# holder died without releasing them) are dropped first.
+#   KEYS: the semaphore keys
+#   ARGV: now, expiry of the new slot, token, then the limit of each key
+_ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now)
+    if redis.call('ZCARD', key) >= tonumber(ARGV[3 + i]) then
+        return 0
+    end
+end
+for i, key in ipairs(KEYS) do
+    redis.call('ZADD', key, ARGV[2], ARGV[3])
+    redis.call('EXPIRE', key, math.ceil(tonumber(ARGV[2]) - now) + 60)
+end
+return 1
+"""
+
+# Push back the expiry of a slot in every semaphore, only while the slot is
+# still held in all of them: an expired slot may already be counted as free.
+#   KEYS: the semaphore keys
+#   ARGV: now, new expiry of the slot, token
+_EXTEND_SLOTS_SCRIPT = """
+local now = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    local expiry = redis.call('ZSCORE', key, ARGV[3])
+    if not expiry or tonumber(expiry) <= now then
+        return 0
+    end
+end
+for i, key in ipairs(KEYS) do
+    redis.call('ZADD', key, 'XX', ARGV[2], ARGV[3])
+    redis.call('EXPIRE', key, math.ceil(tonumber(ARGV[2]) - now) + 60)
+end
+return 1
+"""
+
+
+class Semaphores:
+    """
+    Take one slot in several counting semaphores at once.
+
+    Each semaphore is a Redis sorted set of slot tokens scored by their expiry
+    time, so a slot held by a worker that crashed frees itself after `ttl`
+    seconds. Slots are taken in all semaphores or none, which avoids holding a
+    global slot while waiting for a per-institution one. Work that may outlast
+    `ttl` extends its slots as it goes.
+
+        slots = Semaphores({'sync:global': 8, 'sync:bank-a': 2}, ttl=900)
+        if slots.acquire():
+            try:
+                for page in pages:
+                    ...
+                    slots.extend()
+            finally:
+                slots.release()
+    """
+
+    def __init__(self, limits, ttl):
+        self.limits = limits
+        self.ttl = ttl
+        self.token = uuid.uuid4().hex
+        self.acquired = False
+
+    def acquire(self):
+        """Try to take a slot in every semaphore without waiting. Returns True on success."""
+        now = time.time()
+        keys = list(self.limits)
+        args = [now, now + self.ttl, self.token] + [self.limits[key] for key in keys]
+        self.acquired = bool(get_redis().eval(_ACQUIRE_SCRIPT, len(keys), *keys, *args))
+        return self.acquired
+
+    def extend(self):
+        """
+        Push the expiry of the slots back to `ttl` from now. Returns False if
+        a slot expired in the meantime; release() still frees the others.
+        """
+        if not self.acquired:
+            return False
+        now = time.time()
+        keys = list(self.limits)
+        return bool(get_redis().eval(_EXTEND_SLOTS_SCRIPT, len(keys), *keys, now, now + self.ttl, self.token))
+
+    def release(self):
+        if not self.acquired:
+            return
+        pipe = get_redis().pipeline()
+        for key in self.limits:
+            pipe.zrem(key, self.token)
+        pipe.execute()
+        self.acquired = False
+
+    @staticmethod
+    def in_use(key):
+        """Number of live slots currently held in a semaphore."""
+        client = get_redis()
+        client.zremrangebyscore(key, '-inf', time.time())
+        return client.zcard(key)
+
+
+# Take `cost` tokens from every bucket or from none of them. Buckets refill
+# continuously; the time comes from Redis so all workers agree on it.
+#   KEYS: the bucket keys
+#   ARGV: cost, then the refill rate (tokens per second) and capacity of each key
+# Returns 0 if the tokens were taken, otherwise the seconds until they will be
+# available (as a string: Lua numbers are truncated to integers on return)
+_TAKE_TOKENS_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local wait = 0
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local capacity = tonumber(ARGV[2 * i + 1])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < cost then
+        wait = math.max(wait, (cost - tokens) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local capacity = tonumber(ARGV[2 * i + 1])
+    redis.call('HSET', key, 'tokens', levels[i] - cost, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 60)
+end
+return '0'
+"""
+
+
+class TokenBuckets:
+    """
+    Take a token from several token buckets at once.
+
+    Each bucket is a Redis hash holding its token count and when it was last
+    updated; tokens are refilled at `rate` per second up to `capacity`. A
+    token is taken from every bucket or from none, so a call that is refused
+    by one bucket doesn't use up the others.
+
+        buckets = TokenBuckets({'rate:sync': (10, 50), 'rate:sync:item-1': (1, 5)})
+        wait = buckets.take()
+        if wait:
+            ...  # try again in `wait` seconds
+
+    Args:
+        buckets: Dictionary of bucket key to (rate per second, capacity)
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+
+    def take(self, cost=1):
+        """Try to take tokens without waiting. Returns 0 on success, otherwise the seconds to wait."""
+        keys = list(self.buckets)
+        args = [cost]
+        for key in keys:
+            args.extend(self.buckets[key])
+        return float(get_redis().eval(_TAKE_TOKENS_SCRIPT, len(keys), *keys, *args))
+
+
+# Delete or extend a lease only while it is still held by the same token
+#   KEYS: the lease key
+#   ARGV: token (and for extend, the new expiry in milliseconds)
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_EXTEND_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class Lease:
+    """
+    An exclusive lock that expires unless its holder keeps extending it.
+
+    The lock is a Redis key holding a random token, so a holder can only
+    release or extend its own lease: if it stalls past `ttl` and another
+    process takes the lease over, extend() tells it so.
+
+        lease = Lease('sync:item-1', ttl=120)
+        if lease.acquire():
+            try:
+                for page in pages:
+                    ...
+                    if not lease.extend():
+                        break  # someone else holds the lease now
+            finally:
+                lease.release()
+    """
+
+    def __init__(self, key, ttl):
+        self.key = key
+        self.ttl = ttl
+        self.token = uuid.uuid4().hex
+        self.acquired = False
+
+    def acquire(self):
+        """Take the lease without waiting. Returns True on success."""
+        self.acquired = bool(get_redis().set(self.key, self.token, nx=True, px=int(self.ttl * 1000)))
+        return self.acquired
+
+    def extend(self):
+        """Push the expiry back to `ttl` from now. Returns False if the lease was lost."""
+        if not self.acquired:
+            return False
+        self.acquired = bool(get_redis().eval(_EXTEND_LEASE_SCRIPT, 1, self.key, self.token, int(self.ttl * 1000)))
+        return self.acquired
+
+    def release(self):
+        if not self.acquired:
+            return
+        get_redis().eval(_RELEASE_LEASE_SCRIPT, 1, self.key, self.token)
+        self.acquired = False
+
+    @staticmethod
+    def is_held(key):
+        return bool(get_redis().exists(key))
@@ -0,0 +1,69 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from plaid_integration import client
+from plaid_integration.fake_plaid import FakePlaidServer
+from plaid_integration.sdk import models
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks Plaid API call latency against a local stand-in for Plaid, '
+        'comparing a new client per call with the shared pooled client'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=200, help='API calls per mode')
+        parser.add_argument('--threads', type=int, default=1, help='Concurrent callers')
+        parser.add_argument('--latency', type=float, default=5, help='Server time per request (ms)')
+        parser.add_argument(
+            '--connect-latency', type=float, default=30,
+            help='Extra time per new connection (ms), standing in for the TCP and TLS handshakes'
+        )
+        parser.add_argument('--pool-size', type=int, default=10, help='PLAID_POOL_SIZE for the pooled client')
+
+    def handle(self, *args, **options):
+        server = FakePlaidServer(
+            latency=options['latency'] / 1000,
+            connect_latency=options['connect_latency'] / 1000,
+        ).start()
+
+        try:
+            with override_settings(PLAID_HOST=server.url, PLAID_POOL_SIZE=options['pool_size']), \
+                    mock.patch.multiple(client, PLAID_CLIENT_ID='fake-client-id', PLAID_SECRET='fake-secret'):
+                self.stdout.write(
+                    f"{options['calls']} calls per mode, {options['threads']} threads, "
+                    f"{options['latency']:.0f} ms per request, {options['connect_latency']:.0f} ms per new connection"
+                )
+                self.stdout.write(f"{'mode':<16} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'calls/s':>9} {'connections':>12}")
+
+                self._run('new per call', lambda: client.create_plaid_client(), server, options)
+
+                client.reset_plaid_client()
+                self._run('pooled', client.get_plaid_client, server, options)
+                client.reset_plaid_client()
+        finally:
+            server.stop()
+
+    def _run(self, mode, get_client, server, options):
+        def call(_):
+            started = time.perf_counter()
+            get_client().accounts_get(models.AccountsGetRequest(access_token='access-fake'))
+            return time.perf_counter() - started
+
+        server.counters.clear()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            latencies = sorted(executor.map(call, range(options['calls'])))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{mode:<16} {statistics.mean(latencies) * 1000:>8.1f} "
+            f"{latencies[len(latencies) // 2] * 1000:>8.1f} "
+            f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:>8.1f} "
+            f"{len(latencies) / elapsed:>9.1f} {server.counters.get('connections', 0):>12}"
+        )
@@ -0,0 +1,99 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter for each measurement: starts a process the way
+# manage.py (or a Celery worker) does, optionally loading the Plaid SDK the way
+# importing the Plaid client used to, and reports what that took
+STARTUP_SCRIPT = '''
+import json, os, resource, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+if {worker!r}:
+    from core.celery import app
+    app.loader.import_default_modules()
+if {eager!r}:
+    from plaid_integration.sdk import plaid_api
+    plaid_api()
+elapsed = time.perf_counter() - started
+# The local `plaid` app has the same package name; it lives in this directory
+sdk_modules = [
+    name for name, module in list(sys.modules.items())
+    if name.split('.')[0] == 'plaid' and not (getattr(module, '__file__', None) or '').startswith(os.getcwd())
+]
+print(json.dumps({{
+    'seconds': elapsed,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'sdk_modules': sdk_modules,
+}}))
+'''
+
+class Command(BaseCommand):
+    help = (
+        'Measures the startup time and memory of manage.py and of a Celery worker with the Plaid '
+        'SDK imported on first use (lazy) and imported at startup (eager), using python -X importtime'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Processes started per measurement; medians are shown')
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be at least 1')
+
+        self.stdout.write(
+            f"{'process':<16} {'sdk':<6} {'startup ms':>11} {'sdk import ms':>14} {'sdk modules':>12} {'max rss MB':>11}"
+        )
+        for process, worker in (('manage.py', False), ('celery worker', True)):
+            for mode, eager in (('lazy', False), ('eager', True)):
+                runs = [self._start(worker, eager) for _ in range(options['runs'])]
+                self.stdout.write(
+                    f"{process:<16} {mode:<6} "
+                    f"{statistics.median(run['seconds'] for run in runs) * 1000:>11.0f} "
+                    f"{statistics.median(run['sdk_import_us'] for run in runs) / 1000:>14.0f} "
+                    f"{len(runs[0]['sdk_modules']):>12} "
+                    f"{statistics.median(run['max_rss_kb'] for run in runs) / 1024:>11.1f}"
+                )
+
+    def _start(self, worker, eager):
+        """
+        Start a process and measure it.
+
+        Returns:
+            The child's measurements, plus sdk_import_us: the time spent
+            importing SDK modules, summed from the -X importtime log
+        """
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT.format(worker=worker, eager=eager)],
+            cwd=settings.BASE_DIR,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"Startup failed:\n{result.stderr[-2000:]}")
+
+        measurements = json.loads(result.stdout.strip().splitlines()[-1])
+        sdk_modules = set(measurements['sdk_modules'])
+        measurements['sdk_import_us'] = 0
+        for line in result.stderr.splitlines():
+            # "import time: <self us> | <cumulative us> | <indented module name>"
+            if not line.startswith('import time:'):
+                continue
+            try:
+                self_us, _, name = line[len('import time:'):].split('|')
+                if name.strip() in sdk_modules:
+                    measurements['sdk_import_us'] += int(self_us)
+            except ValueError:
+                # The header line
+                continue
+        return measurements
@@ -0,0 +1,183 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from accounts.models import Account, AccountTypes, Transaction
+from accounts.numbering import reserve_account_numbers
+from accounts.signals import defer_balance_updates
+from core.celery import app
+from plaid_integration import client, tasks
+from plaid_integration.fake_plaid import SYNC_ERRORS, FakePlaidServer
+from plaid_integration.models import PlaidItem
+from plaid_integration.views import PlaidViewSet
+
+User = get_user_model()
+
+BENCHMARK_EMAIL = 'plaid-sync-benchmark@example.com'
+
+class QueryCounter:
+    """Counts the database queries run while installed with connection.execute_wrapper()."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks Plaid transaction sync end to end against a local stand-in for Plaid: '
+        'transactions per second and database queries per transaction'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=4, help='Plaid Items to sync')
+        parser.add_argument('--accounts', type=int, default=2, help='Accounts per Plaid Item')
+        parser.add_argument('--transactions', type=int, default=2000, help='Transactions per Plaid Item')
+        parser.add_argument('--page-size', type=int, default=500, help='Transactions per /transactions/sync page')
+        parser.add_argument('--modified', type=float, default=0.1, help='Share of each page modified by the next one')
+        parser.add_argument('--removed', type=float, default=0.05, help='Share of each page removed by the next one')
+        parser.add_argument('--latency', type=float, default=0, help='Server time per request (ms)')
+        parser.add_argument('--error-rate', type=float, default=0, help='Probability of a /transactions/sync call failing')
+        parser.add_argument(
+            '--error-code', default='INSTITUTION_DOWN', choices=sorted(SYNC_ERRORS),
+            help='Plaid error injected by --error-rate'
+        )
+        parser.add_argument(
+            '--mode', default='both', choices=['view', 'all', 'both'],
+            help='Sync each Item through the manual sync view, through sync_all_plaid_accounts, or both'
+        )
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark user and its data afterwards')
+
+    def handle(self, *args, **options):
+        errors = {options['error_code']: options['error_rate']} if options['error_rate'] else {}
+        server = FakePlaidServer(
+            latency=options['latency'] / 1000,
+            transactions=options['transactions'],
+            page_size=options['page_size'],
+            accounts=options['accounts'],
+            modified_ratio=options['modified'],
+            removed_ratio=options['removed'],
+            errors=errors,
+            seed=42,
+        ).start()
+
+        # No throttling: this measures our side of the sync
+        unlimited = {'default': {'client': 10 ** 9, 'item': 10 ** 9}}
+
+        try:
+            with override_settings(PLAID_HOST=server.url, PLAID_RATE_LIMITS=unlimited), \
+                    mock.patch.multiple(client, PLAID_CLIENT_ID='fake-client-id', PLAID_SECRET='fake-secret'):
+                client.reset_plaid_client()
+                user = self._create_fixtures(options)
+
+                self.stdout.write(
+                    f"{options['items']} Items x {options['accounts']} accounts, "
+                    f"{options['transactions']:,} transactions per Item in pages of {options['page_size']}, "
+                    f"{options['modified']:.0%} modified, {options['removed']:.0%} removed, "
+                    f"{options['latency']:.0f} ms latency, {options['error_rate']:.0%} {options['error_code']}"
+                )
+                self.stdout.write(
+                    f"{'mode':<10} {'seconds':>8} {'changes':>9} {'tx/s':>9} {'queries':>9} "
+                    f"{'queries/tx':>11} {'failed':>7}"
+                )
+
+                if options['mode'] in ('view', 'both'):
+                    self._run('view', user, server, self._sync_each)
+                if options['mode'] in ('all', 'both'):
+                    self._run('all', user, server, self._sync_all)
+
+                if not options['keep']:
+                    with defer_balance_updates():
+                        user.delete()
+        finally:
+            client.reset_plaid_client()
+            server.stop()
+
+    def _create_fixtures(self, options):
+        User.objects.filter(email=BENCHMARK_EMAIL).delete()
+        user = User.objects.create_user(email=BENCHMARK_EMAIL, first_name='Plaid', last_name='Benchmark')
+
+        numbers = iter(reserve_account_numbers(user, options['items'] * options['accounts']))
+        for item in range(options['items']):
+            for index in range(options['accounts']):
+                account = Account.objects.create(
+                    user=user,
+                    name=f"Benchmark bank {item}.{index}",
+                    num=next(numbers),
+                    type=AccountTypes.asset,
+                    inBankFeed=True
+                )
+                PlaidItem.objects.create(
+                    user=user,
+                    account=account,
+                    item_id=f"benchmark-item-{item}",
+                    access_token=f"access-benchmark-{item}",
+                    plaid_account_id=f"fake-account-{index}",
+                    institution_name=f"Benchmark Bank {item % 3}"
+                )
+        return user
+
+    def _reset(self, user):
+        """Put the benchmark Items back to never synced, without their transactions."""
+        with defer_balance_updates():
+            Transaction.objects.filter(user=user).delete()
+        PlaidItem.objects.filter(user=user).update(
+            cursor=None, last_sync=None, status='active', error_message=None, retry_attempts=0, next_retry_at=None
+        )
+
+    def _run(self, mode, user, server, sync):
+        self._reset(user)
+        server.counters.clear()
+
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            changes, failed = sync(user)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{mode:<10} {elapsed:>8.2f} {changes:>9,} {changes / elapsed:>9,.0f} {counter.count:>9,} "
+            f"{counter.count / max(changes, 1):>11.3f} {failed:>7}"
+        )
+
+    def _sync_each(self, user):
+        """Sync every Item one after another through the manual sync view."""
+        view = PlaidViewSet()
+        changes = failed = 0
+        for plaid_item in tasks.unique_plaid_items(PlaidItem.objects.filter(user=user)):
+            try:
+                result = view._sync_transactions_for_item(plaid_item)
+            except Exception:
+                failed += 1
+                continue
+            changes += result['added'] + result['modified'] + result['removed']
+        return changes, failed
+
+    def _sync_all(self, user):
+        """Sync every Item through the nightly task, with Celery running tasks in-process."""
+        unique_plaid_items = tasks.unique_plaid_items
+
+        def benchmark_items_only(plaid_items):
+            # Never touch real Items: their access tokens would be sent to the stand-in
+            return unique_plaid_items(plaid_items.filter(user=user))
+
+        eager = app.conf.task_always_eager
+        app.conf.task_always_eager = True
+        try:
+            with mock.patch.object(tasks, 'unique_plaid_items', side_effect=benchmark_items_only), \
+                    override_settings(PLAID_SYNC_RETRY_DELAY=0):
+                tasks.sync_all_plaid_accounts()
+        finally:
+            app.conf.task_always_eager = eager
+
+        summary = cache.get(tasks.LAST_SYNC_SUMMARY_KEY)
+
+        changes = summary['transactions_added'] + summary['transactions_modified'] + summary['transactions_removed']
+        return changes, summary['error']
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from plaid_integration.ratelimit import get_rate_limit_metrics, reset_rate_limit_metrics
+
+class Command(BaseCommand):
+    help = 'Shows how often Plaid API calls were throttled by the shared rate limiter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after showing them')
+
+    def handle(self, *args, **options):
+        metrics = get_rate_limit_metrics()
+        if not metrics:
+            self.stdout.write('No Plaid calls recorded')
+        else:
+            self.stdout.write(
+                f"{'endpoint':<30} {'calls':>9} {'throttled':>10} {'wait s':>9} {'avg wait s':>11} "
+                f"{'rescheduled':>12} {'Plaid 429':>10}"
+            )
+            for endpoint, counters in sorted(metrics.items()):
+                throttled = counters['throttled']
+                average = counters['wait_seconds'] / throttled if throttled else 0
+                self.stdout.write(
+                    f"{endpoint:<30} {counters['calls']:>9} {throttled:>10} {counters['wait_seconds']:>9.1f} "
+                    f"{average:>11.2f} {counters['rejected']:>12} {counters['plaid_limited']:>10}"
+                )
+
+        if options['reset']:
+            reset_rate_limit_metrics()
+            self.stdout.write('Counters reset')
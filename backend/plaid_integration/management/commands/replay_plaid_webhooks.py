@@ -0,0 +1,71 @@
+import json
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from plaid_integration import client
+from plaid_integration.fake_plaid import FakePlaidServer
+from plaid_integration.tasks import sync_plaid_item
+
+class Command(BaseCommand):
+    help = (
+        'Replays recorded Plaid webhook payloads through the webhook endpoint, '
+        'signed with a local key and verified against a local stand-in for Plaid'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('payloads', nargs='+', help='JSON files of recorded webhook bodies')
+        parser.add_argument('--item-id', help='Replace the item_id of every payload, e.g. with a local Plaid Item')
+        parser.add_argument(
+            '--run-syncs', action='store_true',
+            help='Run the syncs the webhooks schedule right away, instead of only reporting them'
+        )
+
+    def handle(self, *args, **options):
+        server = FakePlaidServer().start()
+        scheduled = []
+
+        def record_sync(args=(), kwargs=None, **extra):
+            scheduled.append(args[0])
+            if options['run_syncs']:
+                sync_plaid_item.apply(args=args, kwargs=kwargs)
+
+        try:
+            with override_settings(PLAID_HOST=server.url), \
+                    mock.patch.multiple(client, PLAID_CLIENT_ID='fake-client-id', PLAID_SECRET='fake-secret'), \
+                    mock.patch.object(sync_plaid_item, 'apply_async', side_effect=record_sync):
+                client.reset_plaid_client()
+                for path in options['payloads']:
+                    self._replay(path, server, scheduled, options)
+        finally:
+            client.reset_plaid_client()
+            server.stop()
+
+    def _replay(self, path, server, scheduled, options):
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+            payload = json.loads(body)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Can't read {path}: {str(e)}")
+
+        if options['item_id']:
+            payload['item_id'] = options['item_id']
+            body = json.dumps(payload).encode('utf-8')
+
+        scheduled.clear()
+        response = Client().post(
+            reverse('plaid-webhook'),
+            data=body,
+            content_type='application/json',
+            HTTP_PLAID_VERIFICATION=server.webhook_signer.sign(body)
+        )
+        self.stdout.write(
+            f"{path}: {payload.get('webhook_type')} {payload.get('webhook_code')} "
+            f"-> {response.status_code} {response.json()}"
+        )
+        for plaid_item_id in scheduled:
+            self.stdout.write(f"  sync scheduled for PlaidItem {plaid_item_id}")
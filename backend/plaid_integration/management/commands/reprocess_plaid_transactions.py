@@ -0,0 +1,122 @@
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import Transaction, TransactionStatus
+from accounts.signals import defer_balance_updates, queue_balance_updates
+from plaid_integration.models import PlaidTransaction
+from plaid_integration.sync import parse_plaid_transaction, transaction_accounts
+
+class Command(BaseCommand):
+    help = (
+        'Re-derives the date, amount, description and category of imported Plaid transactions '
+        'from their stored Plaid payloads, without calling Plaid. Like a sync, only changes '
+        'transactions that are still in review'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only reprocess the transactions of the user with this email')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Transactions read and written per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Count the changes without saving them')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        links = PlaidTransaction.objects.filter(transaction__status=TransactionStatus.REVIEW)
+        if options['user']:
+            links = links.filter(plaid_item__user__email=options['user'])
+
+        missing = links.filter(raw__isnull=True).count()
+        if missing:
+            self.stdout.write(f"{missing:,} transactions were imported before payloads were stored and are skipped")
+
+        links = links.filter(raw__isnull=False).select_related(
+            'transaction', 'plaid_item__account', 'plaid_item__user'
+        ).order_by('id')
+
+        # Category accounts per user, resolved once for the whole run
+        category_accounts = defaultdict(dict)
+        scanned = changed = failed = 0
+        started = time.perf_counter()
+        last_id = 0
+
+        while True:
+            # Keyset pagination: each batch is an index range scan, however far in
+            batch = list(links.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            scanned += len(batch)
+
+            with transaction.atomic(), defer_balance_updates():
+                updates, account_ids, errors = self._reprocess(batch, category_accounts)
+                failed += errors
+                changed += len(updates)
+                if options['dry_run']:
+                    # Also drops the category accounts created on the way
+                    category_accounts.clear()
+                    transaction.set_rollback(True)
+                elif updates:
+                    now = timezone.now()
+                    for txn in updates:
+                        txn.updated = now
+                    Transaction.objects.bulk_update(
+                        updates, ['date', 'amount', 'notes', 'debit', 'credit', 'updated']
+                    )
+                    # Bulk writes don't send signals
+                    queue_balance_updates(account_ids)
+
+            self.stdout.write(f"{scanned:,} transactions checked, {changed:,} changed")
+
+        elapsed = time.perf_counter() - started
+        verb = 'would change' if options['dry_run'] else 'changed'
+        self.stdout.write(self.style.SUCCESS(
+            f"Reprocessed {scanned:,} Plaid transactions in {elapsed:.1f}s "
+            f"({scanned / max(elapsed, 0.001):,.0f}/s): {verb} {changed:,}, {failed:,} failed"
+        ))
+
+    def _reprocess(self, batch, category_accounts):
+        """
+        Re-derive the transactions of a batch of PlaidTransaction links.
+
+        Returns:
+            A tuple of (changed transactions, IDs of the accounts whose balance
+            changes, number of payloads that couldn't be parsed)
+        """
+        updates = []
+        account_ids = set()
+        errors = 0
+
+        for link in batch:
+            txn = link.transaction
+            try:
+                date_obj, amount, notes, category_name = parse_plaid_transaction(link.raw)
+            except Exception as e:
+                self.stderr.write(f"Can't parse Plaid transaction {link.plaid_transaction_id}: {str(e)}")
+                errors += 1
+                continue
+
+            debit, credit = transaction_accounts(
+                link.plaid_item, amount, category_name, category_accounts[link.plaid_item.user_id]
+            )
+            derived = {
+                'date': date_obj,
+                'amount': abs(amount),
+                'notes': notes or f"Plaid transaction {link.plaid_transaction_id}",
+                'debit_id': debit.id,
+                'credit_id': credit.id,
+            }
+            if all(getattr(txn, field) == value for field, value in derived.items()):
+                continue
+
+            # Both the old and the new accounts' balances change
+            account_ids.update((txn.debit_id, txn.credit_id, debit.id, credit.id))
+            for field, value in derived.items():
+                setattr(txn, field, value)
+            updates.append(txn)
+
+        return updates, account_ids, errors
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from plaid_integration.client import update_item_webhook
+from plaid_integration.models import PlaidItem
+from plaid_integration.tasks import unique_plaid_items
+
+class Command(BaseCommand):
+    help = 'Points every linked Plaid Item at PLAID_WEBHOOK_URL (for Items linked before it was set)'
+
+    def handle(self, *args, **options):
+        if not settings.PLAID_WEBHOOK_URL:
+            raise CommandError('PLAID_WEBHOOK_URL is not set')
+
+        plaid_items = unique_plaid_items(PlaidItem.objects.exclude(status='disconnected'))
+        updated = 0
+        for plaid_item in plaid_items:
+            try:
+                update_item_webhook(plaid_item.access_token, settings.PLAID_WEBHOOK_URL)
+                updated += 1
+            except Exception as e:
+                self.stderr.write(f"Plaid Item {plaid_item.item_id}: {str(e)}")
+
+        self.stdout.write(f"Updated the webhook of {updated} of {len(plaid_items)} Plaid Items")
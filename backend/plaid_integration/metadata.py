@@ -0,0 +1,98 @@
+"""
+Local copies of Plaid metadata used while linking accounts.
+
+Institutions rarely change, so they are stored in the Institution table and
+fetched from Plaid again only once older than PLAID_INSTITUTION_TTL. If Plaid
+can't be reached then, the stored copy is used as is.
+
+An Item's account list is cached for PLAID_ACCOUNTS_CACHE_TTL seconds: the
+linking and mapping flow asks for it several times in a row, and balances a
+few minutes old are fine there.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.utils import timezone
+
+from .client import get_accounts, get_institution
+from .models import Institution
+
+logger = logging.getLogger(__name__)
+
+# Cache key prefix of the account lists
+ACCOUNTS_KEY = 'plaid-meta:accounts'
+
+
+def get_institution_metadata(institution_id):
+    """
+    Get an institution, from the local table if it is recent enough.
+
+    Args:
+        institution_id: The Plaid institution ID
+
+    Returns:
+        The Institution
+
+    Raises:
+        Whatever the Plaid call raised, if there is no local copy to fall
+        back on
+    """
+    institution = Institution.objects.filter(institution_id=institution_id).first()
+    now = timezone.now()
+    if institution and now - institution.fetched_at < timedelta(seconds=settings.PLAID_INSTITUTION_TTL):
+        return institution
+
+    try:
+        data = get_institution(institution_id)
+    except Exception as e:
+        if institution is None:
+            raise
+        logger.warning(f"Couldn't refresh institution {institution_id}, using the stored copy: {str(e)}")
+        return institution
+
+    fields = {
+        'name': data.get('name') or institution_id,
+        'url': data.get('url'),
+        'primary_color': data.get('primary_color'),
+        'logo': data.get('logo'),
+        'fetched_at': now,
+    }
+    try:
+        institution, _ = Institution.objects.update_or_create(institution_id=institution_id, defaults=fields)
+    except IntegrityError:
+        # Another request stored it at the same time
+        Institution.objects.filter(institution_id=institution_id).update(**fields)
+        institution = Institution.objects.get(institution_id=institution_id)
+    return institution
+
+
+def _accounts_key(access_token):
+    # Access tokens are secrets; don't put them in cache keys
+    return f"{ACCOUNTS_KEY}:{hashlib.sha1(access_token.encode('utf-8')).hexdigest()[:16]}"
+
+
+def get_item_accounts(access_token):
+    """
+    Get the accounts of a Plaid Item, cached for PLAID_ACCOUNTS_CACHE_TTL.
+
+    Args:
+        access_token: The access token for the Plaid Item
+
+    Returns:
+        List of accounts, as the dictionaries Plaid sent
+    """
+    key = _accounts_key(access_token)
+    accounts = cache.get(key)
+    if accounts is None:
+        accounts = get_accounts(access_token)
+        cache.set(key, accounts, settings.PLAID_ACCOUNTS_CACHE_TTL)
+    return accounts
+
+
+def forget_item_accounts(access_token):
+    """Drop the cached account list of a Plaid Item, e.g. once it changed."""
+    cache.delete(_accounts_key(access_token))
@@ -0,0 +1,35 @@
+# Generated by Django 4.1.13 on 2026-10-18 23:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('plaid_integration', '0002_copy_data_from_accounts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plaiditem',
+            name='next_retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='plaiditem',
+            name='retry_attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='plaiditem',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plaid_integration_items', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='plaiditem',
+            index=models.Index(fields=['status', 'next_retry_at'], name='plaiditem_status_retry_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.13 on 2026-10-19 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plaid_integration', '0003_plaiditem_retry_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plaiditem',
+            name='backfill_pages',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='plaiditem',
+            name='backfill_status',
+            field=models.CharField(default='complete', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='plaiditem',
+            name='backfill_transactions',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-19 00:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plaid_integration', '0004_plaiditem_backfill'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plaidtransaction',
+            name='raw',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
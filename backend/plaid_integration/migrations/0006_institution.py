@@ -0,0 +1,27 @@
+# Generated by Django 4.1.13 on 2026-10-19 00:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plaid_integration', '0005_plaidtransaction_raw'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Institution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('institution_id', models.CharField(max_length=255, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('url', models.CharField(blank=True, max_length=500, null=True)),
+                ('primary_color', models.CharField(blank=True, max_length=20, null=True)),
+                ('logo', models.TextField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.1.13 on 2026-10-19 00:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plaid_integration', '0006_institution'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_id', models.CharField(max_length=255)),
+                ('institution_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('backfill', models.BooleanField(default=False)),
+                ('status', models.CharField(default='running', max_length=20)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('duration', models.FloatField(blank=True, null=True)),
+                ('fetch_seconds', models.FloatField(default=0)),
+                ('fetch_wait_seconds', models.FloatField(default=0)),
+                ('apply_seconds', models.FloatField(default=0)),
+                ('commit_seconds', models.FloatField(default=0)),
+                ('pages', models.IntegerField(default=0)),
+                ('added', models.IntegerField(default=0)),
+                ('modified', models.IntegerField(default=0)),
+                ('removed', models.IntegerField(default=0)),
+                ('api_calls', models.IntegerField(default=0)),
+                ('restarts', models.IntegerField(default=0)),
+                ('error_count', models.IntegerField(default=0)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('cursor_lag', models.FloatField(blank=True, null=True)),
+                ('plaid_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_runs', to='plaid_integration.plaiditem')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='syncrun',
+            index=models.Index(fields=['started_at'], name='syncrun_started_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='syncrun',
+            index=models.Index(fields=['item_id', 'started_at'], name='syncrun_item_started_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.13 on 2026-10-19 00:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_account_number_counter'),
+        ('plaid_integration', '0007_syncrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheck',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checked_at', models.DateTimeField()),
+                ('plaid_balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('available_balance', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('currency', models.CharField(blank=True, max_length=10, null=True)),
+                ('ledger_balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('difference', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('flagged', models.BooleanField(default=False)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plaid_balance_checks', to='accounts.account')),
+                ('plaid_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_checks', to='plaid_integration.plaiditem')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='balancecheck',
+            index=models.Index(fields=['account', 'checked_at'], name='balancecheck_account_idx'),
+        ),
+    ]
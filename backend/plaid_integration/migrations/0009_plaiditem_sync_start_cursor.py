@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-19 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plaid_integration', '0008_balancecheck'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plaiditem',
+            name='sync_start_cursor',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
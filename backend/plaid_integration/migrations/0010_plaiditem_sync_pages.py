@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-19 01:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plaid_integration', '0009_plaiditem_sync_start_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plaiditem',
+            name='sync_pages',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-19 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plaid_integration', '0010_plaiditem_sync_pages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plaiditem',
+            name='consent_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
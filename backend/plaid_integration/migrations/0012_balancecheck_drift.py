@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-19 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plaid_integration', '0011_plaiditem_consent_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='balancecheck',
+            name='drift',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+    ]
@@ -17,8 +17,16 @@ class PlaidItem(models.Model):
     institution_name = models.CharField(max_length=255, null=True, blank=True)
     last_sync = models.DateTimeField(null=True, blank=True)
     cursor = models.CharField(max_length=255, null=True, blank=True)  # Store cursor for transaction syncing
-    status = models.CharField(max_length=50, default='active')  # active, error, disconnected
+    sync_start_cursor = models.CharField(max_length=255, null=True, blank=True)  # Cursor the unfinished pagination began with ('' if without one)
+    sync_pages = models.IntegerField(default=0)  # Pages applied since sync_start_cursor
+    status = models.CharField(max_length=50, default='active')  # active, error, relink_required, disconnected
     error_message = models.TextField(null=True, blank=True)
+    retry_attempts = models.IntegerField(default=0)  # Failed syncs in a row
+    next_retry_at = models.DateTimeField(null=True, blank=True)  # When an Item in error is synced again
+    consent_expires_at = models.DateTimeField(null=True, blank=True)  # When the user's consent runs out, if Plaid warned of it; re-linking renews it
+    backfill_status = models.CharField(max_length=20, default='complete')  # pending, running, complete
+    backfill_pages = models.IntegerField(default=0)  # History pages imported by the backfill so far
+    backfill_transactions = models.IntegerField(default=0)  # Transactions imported by the backfill so far
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -27,6 +35,28 @@ class PlaidItem(models.Model):
 
     class Meta:
         unique_together = ('user', 'account')
+        indexes = [
+            # Finding the Items due for a retry
+            models.Index(fields=['status', 'next_retry_at'], name='plaiditem_status_retry_idx'),
+        ]
+
+class Institution(models.Model):
+    """
+    A financial institution's metadata from Plaid.
+    Kept locally so linking an account doesn't need a Plaid call every time;
+    refreshed lazily once older than PLAID_INSTITUTION_TTL (see metadata.py).
+    """
+    institution_id = models.CharField(max_length=255, unique=True)
+    name = models.CharField(max_length=255)
+    url = models.CharField(max_length=500, null=True, blank=True)
+    primary_color = models.CharField(max_length=20, null=True, blank=True)
+    logo = models.TextField(null=True, blank=True)  # Base64-encoded PNG
+    fetched_at = models.DateTimeField()  # When the metadata was last fetched from Plaid
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.institution_id})"
 
 class PlaidTransaction(models.Model):
     """
@@ -36,7 +66,71 @@ class PlaidTransaction(models.Model):
     plaid_item = models.ForeignKey(PlaidItem, on_delete=models.CASCADE, related_name='plaid_transactions')
     transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='plaid_integration_source')
     plaid_transaction_id = models.CharField(max_length=255, unique=True)
+    raw = models.JSONField(null=True, blank=True)  # Plaid's latest version of the transaction, without null fields
     imported_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Plaid Transaction: {self.plaid_transaction_id}"
+
+class SyncRun(models.Model):
+    """
+    One sync of a Plaid Item, with how long each of its phases took.
+    Written by sync.py; runs.py builds the summaries of slow and lagging Items.
+    """
+    plaid_item = models.ForeignKey(PlaidItem, on_delete=models.CASCADE, related_name='sync_runs')  # The row the sync was started for
+    item_id = models.CharField(max_length=255)  # The Plaid Item, shared by all its rows
+    institution_name = models.CharField(max_length=255, null=True, blank=True)
+    backfill = models.BooleanField(default=False)  # A chunk of a backfill rather than a regular sync
+    status = models.CharField(max_length=20, default='running')  # running, success, partial, rate_limited, interrupted, error
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration = models.FloatField(null=True, blank=True)  # Seconds, start to finish
+    fetch_seconds = models.FloatField(default=0)  # Spent calling Plaid, including rate limit waits (in the fetch thread)
+    fetch_wait_seconds = models.FloatField(default=0)  # Spent waiting for the fetch thread's next page
+    apply_seconds = models.FloatField(default=0)  # Spent writing transactions
+    commit_seconds = models.FloatField(default=0)  # Spent moving the cursor, updating balances and committing
+    pages = models.IntegerField(default=0)
+    added = models.IntegerField(default=0)
+    modified = models.IntegerField(default=0)
+    removed = models.IntegerField(default=0)
+    api_calls = models.IntegerField(default=0)  # /transactions/sync calls, including failed ones
+    restarts = models.IntegerField(default=0)  # Pagination restarts because the Item changed
+    error_count = models.IntegerField(default=0)  # Transactions that couldn't be parsed, plus the error that ended the run
+    error_message = models.TextField(null=True, blank=True)
+    cursor_lag = models.FloatField(null=True, blank=True)  # Seconds since the Item was last synced to the end; null if never
+
+    def __str__(self):
+        return f"Sync of {self.item_id} at {self.started_at} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # Summaries over recent runs, and pruning old ones
+            models.Index(fields=['started_at'], name='syncrun_started_idx'),
+            models.Index(fields=['item_id', 'started_at'], name='syncrun_item_started_idx'),
+        ]
+
+class BalanceCheck(models.Model):
+    """
+    A comparison of the balance the bank reports for a linked account with the
+    account's balance in the ledger. Written daily by reconcile.py; the history
+    shows when and how fast an account started to drift.
+    """
+    plaid_item = models.ForeignKey(PlaidItem, on_delete=models.CASCADE, related_name='balance_checks')
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='plaid_balance_checks')
+    checked_at = models.DateTimeField()
+    plaid_balance = models.DecimalField(max_digits=12, decimal_places=2)  # The bank's current balance
+    available_balance = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    currency = models.CharField(max_length=10, null=True, blank=True)
+    ledger_balance = models.DecimalField(max_digits=12, decimal_places=2)  # Computed from the account's transactions
+    difference = models.DecimalField(max_digits=12, decimal_places=2)  # Ledger minus bank
+    drift = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # How far the difference moved from the baseline (see reconcile.py)
+    flagged = models.BooleanField(default=False)  # The drift is beyond PLAID_BALANCE_TOLERANCE
+
+    def __str__(self):
+        return f"Balance check of {self.account.name} at {self.checked_at}: {self.difference}"
+
+    class Meta:
+        indexes = [
+            # An account's history, and its latest check
+            models.Index(fields=['account', 'checked_at'], name='balancecheck_account_idx'),
+        ]
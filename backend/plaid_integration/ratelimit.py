@@ -0,0 +1,143 @@
+"""
+Rate limiting of Plaid API calls, shared by every web and Celery process.
+
+Plaid limits most endpoints per client and per Item. Every call made through
+plaid_integration.client first takes a token from the endpoint's client-wide
+bucket and, for calls about an Item, from the Item's bucket. When a bucket is
+empty the call waits for a token, up to PLAID_RATE_LIMIT_MAX_WAIT seconds;
+beyond that PlaidRateLimited is raised so the caller can reschedule the work
+instead of holding a worker.
+
+Waits are counted in Redis for all processes; see get_rate_limit_metrics().
+"""
+import hashlib
+import logging
+import time
+
+import redis
+from django.conf import settings
+
+from .locks import TokenBuckets, get_redis
+
+logger = logging.getLogger(__name__)
+
+# Redis key prefix of the token buckets
+BUCKET_KEY = 'plaid-rate:bucket'
+# Redis hash of the throttling counters
+METRICS_KEY = 'plaid-rate:metrics'
+
+# Counters kept per endpoint in METRICS_KEY
+METRIC_NAMES = ('calls', 'throttled', 'wait_seconds', 'rejected', 'plaid_limited')
+
+
+class PlaidRateLimited(Exception):
+    """
+    A Plaid call was refused by a rate limit, ours or Plaid's.
+
+    Attributes:
+        endpoint: The Plaid endpoint, e.g. 'transactions_sync'
+        retry_after: Seconds after which the call is expected to succeed
+    """
+
+    def __init__(self, endpoint, retry_after):
+        super().__init__(f"Rate limit reached for Plaid {endpoint}, retry in {retry_after:.1f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+def _bucket(per_minute):
+    """
+    Token bucket (rate, capacity) for a per-minute limit.
+
+    A quarter of the limit may be used at once and the rest is refilled over
+    the minute, so no sliding minute ever sees more than the limit.
+    """
+    return (per_minute * 0.75 / 60, max(1.0, per_minute * 0.25))
+
+
+def _item_key(access_token):
+    # Access tokens are secrets; don't put them in Redis keys
+    return hashlib.sha1(access_token.encode('utf-8')).hexdigest()[:16]
+
+
+def get_buckets(endpoint, access_token=None):
+    """The token buckets a call to `endpoint` takes from."""
+    limits = settings.PLAID_RATE_LIMITS.get(endpoint) or settings.PLAID_RATE_LIMITS['default']
+    buckets = {}
+    if limits.get('client'):
+        buckets[f"{BUCKET_KEY}:{endpoint}"] = _bucket(limits['client'])
+    if access_token and limits.get('item'):
+        buckets[f"{BUCKET_KEY}:{endpoint}:item:{_item_key(access_token)}"] = _bucket(limits['item'])
+    return buckets
+
+
+def record_metric(endpoint, name, amount=1):
+    try:
+        if name == 'wait_seconds':
+            get_redis().hincrbyfloat(METRICS_KEY, f"{endpoint}:{name}", amount)
+        else:
+            get_redis().hincrby(METRICS_KEY, f"{endpoint}:{name}", amount)
+    except redis.RedisError:
+        pass
+
+
+def wait_for_rate_limit(endpoint, access_token=None, max_wait=None):
+    """
+    Take a token for a Plaid call, waiting for one if necessary.
+
+    If Redis is unavailable the call is let through: Plaid's own limits still
+    apply, and it is better than failing every sync.
+
+    Args:
+        endpoint: The Plaid endpoint, e.g. 'transactions_sync'
+        access_token: The access token of the Item the call is about, if any
+        max_wait: Longest total wait in seconds, defaults to
+            PLAID_RATE_LIMIT_MAX_WAIT
+
+    Raises:
+        PlaidRateLimited: If no token is available within max_wait
+    """
+    buckets = TokenBuckets(get_buckets(endpoint, access_token))
+    max_wait = settings.PLAID_RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+    waited = 0.0
+
+    while True:
+        try:
+            wait = buckets.take()
+        except redis.RedisError as e:
+            logger.warning(f"Plaid rate limiter unavailable, not limiting {endpoint}: {str(e)}")
+            return
+
+        if not wait:
+            record_metric(endpoint, 'calls')
+            if waited:
+                record_metric(endpoint, 'throttled')
+                record_metric(endpoint, 'wait_seconds', waited)
+            return
+
+        if waited + wait > max_wait:
+            record_metric(endpoint, 'rejected')
+            logger.info(f"Plaid {endpoint} rate limited, rescheduling (next token in {wait:.1f}s)")
+            raise PlaidRateLimited(endpoint, wait)
+
+        time.sleep(wait)
+        waited += wait
+
+
+def get_rate_limit_metrics():
+    """
+    Get the throttling counters of every endpoint.
+
+    Returns:
+        A dictionary of endpoint to a dictionary of the METRIC_NAMES counters
+    """
+    metrics = {}
+    for field, value in get_redis().hgetall(METRICS_KEY).items():
+        endpoint, name = field.decode('utf-8').rsplit(':', 1)
+        counters = metrics.setdefault(endpoint, dict.fromkeys(METRIC_NAMES, 0))
+        counters[name] = round(float(value), 3) if name == 'wait_seconds' else int(value)
+    return metrics
+
+
+def reset_rate_limit_metrics():
+    get_redis().delete(METRICS_KEY)
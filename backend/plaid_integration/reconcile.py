@@ -0,0 +1,164 @@
+"""
+Reconciliation of bank balances with the ledger.
+
+Once a day, the balance Plaid reports for every linked account is compared
+with the account's balance computed from its transactions. Every comparison is
+stored as a BalanceCheck.
+
+The two rarely agree outright: the ledger only holds the history Plaid
+imported, not the balance the account had before it. So what is watched is
+the difference moving: each check is compared with a baseline, the difference
+of the account's latest check that wasn't flagged (the first check is its own
+baseline). Drift from missed or wrongly removed transactions shows up as the
+difference moving away from it; drift beyond PLAID_BALANCE_TOLERANCE is
+flagged, and stays flagged until the difference comes back.
+
+Plaid refreshes the balances of /accounts/get about once a day, and a pending
+transaction can be counted on one side before the other, so a flag that clears
+by the next check is usually nothing to worry about.
+"""
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounts.models import Account, Transaction
+
+from .client import get_accounts
+from .models import BalanceCheck
+from .sync import SyncAlreadyRunning, get_item_group, is_sync_running
+
+logger = logging.getLogger(__name__)
+
+
+def ledger_balances(account_ids):
+    """
+    Compute the balances of accounts from their transactions, in one query.
+
+    Unlike Account.balance, which is kept up to date as transactions change,
+    this always reflects the transactions as they are.
+
+    Args:
+        account_ids: IDs of the accounts
+
+    Returns:
+        A dictionary of account ID to balance
+    """
+    def total(side):
+        sums = (
+            Transaction.objects.filter(**{side: OuterRef('pk')})
+            .values(side)
+            .annotate(total=Sum('amount'))
+            .values('total')
+        )
+        return Coalesce(Subquery(sums), Value(Decimal('0.00')), output_field=DecimalField())
+
+    balances = {}
+    accounts = Account.objects.filter(id__in=account_ids).annotate(
+        debit_sum=total('debit'),
+        credit_sum=total('credit')
+    ).values_list('id', 'type', 'debit_sum', 'credit_sum')
+    for account_id, account_type, debit_sum, credit_sum in accounts:
+        # The same sign convention as accounts.signals.update_account_balances
+        if account_type in ['Asset', 'Expense', 'Goal']:
+            balances[account_id] = debit_sum - credit_sum
+        elif account_type in ['Liability', 'Income', 'Equity']:
+            balances[account_id] = credit_sum - debit_sum
+        else:
+            balances[account_id] = Decimal('0.00')
+    return balances
+
+
+def baseline_differences(account_ids):
+    """
+    Get the difference each account's drift is measured from: that of its
+    latest check that wasn't flagged, in one query.
+
+    Returns:
+        A dictionary of account ID to difference, without the accounts that
+        were never checked
+    """
+    latest = (
+        BalanceCheck.objects.filter(account=OuterRef('pk'), flagged=False)
+        .order_by('-checked_at', '-id')
+        .values('difference')[:1]
+    )
+    baselines = Account.objects.filter(id__in=account_ids).annotate(
+        baseline=Subquery(latest, output_field=DecimalField())
+    ).values_list('id', 'baseline')
+    return {account_id: baseline for account_id, baseline in baselines if baseline is not None}
+
+
+def reconcile_item(plaid_item):
+    """
+    Compare the bank balances of a Plaid Item's accounts with the ledger.
+
+    Plaid is called once for the whole Item, and the ledger balances of all
+    its mapped accounts are computed together.
+
+    Args:
+        plaid_item: Any PlaidItem row of the Plaid Item
+
+    Returns:
+        The BalanceChecks stored, one per mapped account Plaid reported a
+        balance for
+
+    Raises:
+        SyncAlreadyRunning: If the Item is being synced; its ledger is about
+            to change, so check again later
+    """
+    # Rows without a Plaid account take the transactions of several bank
+    # accounts, so there's no single bank balance to compare them with
+    items = [
+        item for item in get_item_group(plaid_item)
+        if item.plaid_account_id and item.status != 'disconnected'
+    ]
+    if not items:
+        return []
+    if is_sync_running(plaid_item):
+        raise SyncAlreadyRunning(f"Plaid Item {plaid_item.item_id} is being synced")
+
+    plaid_accounts = {account['account_id']: account for account in get_accounts(plaid_item.access_token)}
+    ledger = ledger_balances([item.account_id for item in items])
+    baselines = baseline_differences([item.account_id for item in items])
+
+    tolerance = Decimal(str(settings.PLAID_BALANCE_TOLERANCE))
+    now = timezone.now()
+    checks = []
+    for item in items:
+        balances = (plaid_accounts.get(item.plaid_account_id) or {}).get('balances') or {}
+        if balances.get('current') is None:
+            logger.info(f"Plaid reported no balance for account {item.plaid_account_id} of Plaid Item {item.item_id}")
+            continue
+
+        plaid_balance = Decimal(str(balances['current'])).quantize(Decimal('0.01'))
+        available = balances.get('available')
+        ledger_balance = ledger.get(item.account_id, Decimal('0.00'))
+        difference = ledger_balance - plaid_balance
+        # The first check of an account sets its baseline
+        drift = difference - baselines.get(item.account_id, difference)
+        checks.append(BalanceCheck(
+            plaid_item=item,
+            account=item.account,
+            checked_at=now,
+            plaid_balance=plaid_balance,
+            available_balance=Decimal(str(available)).quantize(Decimal('0.01')) if available is not None else None,
+            currency=balances.get('iso_currency_code') or balances.get('unofficial_currency_code'),
+            ledger_balance=ledger_balance,
+            difference=difference,
+            drift=drift,
+            flagged=abs(drift) > tolerance
+        ))
+
+    BalanceCheck.objects.bulk_create(checks)
+    for check in checks:
+        if check.flagged:
+            logger.warning(
+                f"Account {check.account.name} (Plaid Item {plaid_item.item_id}) is out of balance: "
+                f"ledger {check.ledger_balance}, bank {check.plaid_balance}, difference {check.difference} "
+                f"({check.drift:+} since the last good check)"
+            )
+    return checks
@@ -0,0 +1,184 @@
+"""
+Records of Plaid syncs, and summaries built from them.
+
+Every sync of a Plaid Item writes a SyncRun: when it started, how it ended and
+how long it spent fetching pages from Plaid, writing transactions and
+committing them. The summaries show which Items are slowest to sync and which
+are furthest behind, for the admin and the sync_summary API.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from .models import SyncRun
+
+logger = logging.getLogger(__name__)
+
+# Final states of a sync run
+RUN_SUCCESS = 'success'
+# A backfill chunk that stopped with more pages to come
+RUN_PARTIAL = 'partial'
+RUN_RATE_LIMITED = 'rate_limited'
+# Another sync took over the Item's lease
+RUN_INTERRUPTED = 'interrupted'
+RUN_ERROR = 'error'
+
+
+def new_run_stats():
+    """The phase timings and counters a sync collects for its SyncRun."""
+    return {
+        'fetch_seconds': 0.0,
+        'fetch_wait_seconds': 0.0,
+        'apply_seconds': 0.0,
+        'commit_seconds': 0.0,
+        'api_calls': 0,
+        'restarts': 0,
+    }
+
+
+def start_sync_run(plaid_item, items, backfill=False):
+    """
+    Record the start of a sync.
+
+    Args:
+        plaid_item: The PlaidItem row the sync was started for
+        items: Every row of the Plaid Item
+        backfill: Whether the sync is a backfill chunk
+
+    Returns:
+        The SyncRun
+    """
+    now = timezone.now()
+    synced = [item.last_sync for item in items]
+    # Measured from the row synced longest ago, where the sync starts from
+    cursor_lag = None if None in synced else (now - min(synced)).total_seconds()
+    return SyncRun.objects.create(
+        plaid_item=plaid_item,
+        item_id=plaid_item.item_id,
+        institution_name=plaid_item.institution_name,
+        backfill=backfill,
+        started_at=now,
+        cursor_lag=cursor_lag,
+    )
+
+
+def finish_sync_run(run, status, result, stats, error=None):
+    """
+    Record the end of a sync.
+
+    A failure to save the record is logged, never raised: it mustn't hide how
+    the sync itself went.
+
+    Args:
+        run: The SyncRun from start_sync_run
+        status: One of the RUN_* states
+        result: The sync results dictionary
+        stats: The phase timings and counters, see new_run_stats
+        error: The exception that ended the sync, if any
+    """
+    now = timezone.now()
+    error_count = len(result['errors']) + (1 if error is not None else 0)
+    try:
+        SyncRun.objects.filter(id=run.id).update(
+            status=status,
+            finished_at=now,
+            duration=(now - run.started_at).total_seconds(),
+            pages=result['pages'],
+            added=result['added'],
+            modified=result['modified'],
+            removed=result['removed'],
+            error_count=error_count,
+            error_message=str(error) if error is not None else None,
+            **{field: round(value, 3) if isinstance(value, float) else value for field, value in stats.items()}
+        )
+    except DatabaseError as e:
+        logger.warning(f"Couldn't record the sync run of Plaid Item {run.item_id}: {str(e)}")
+
+
+def sync_run_summary(runs, plaid_items, days=7, limit=10):
+    """
+    Summarize recent syncs: the slowest Items, and those furthest behind.
+
+    Args:
+        runs: The SyncRun queryset to summarize, e.g. one user's runs
+        plaid_items: The PlaidItem queryset the lag is measured over
+        days: How many days of runs to summarize
+        limit: How many Items each list holds
+
+    Returns:
+        A dictionary with the number of runs per status, the slowest Items by
+        mean sync duration (with their mean phase timings), and the Items
+        synced longest ago
+    """
+    now = timezone.now()
+    since = now - timedelta(days=days)
+    recent = runs.filter(started_at__gte=since)
+
+    slowest = (
+        recent.exclude(duration__isnull=True)
+        .values('item_id')
+        .annotate(
+            institution_name=Max('institution_name'),
+            runs=Count('id'),
+            failed=Count('id', filter=Q(status=RUN_ERROR)),
+            mean_duration=Avg('duration'),
+            max_duration=Max('duration'),
+            mean_fetch_seconds=Avg('fetch_seconds'),
+            mean_fetch_wait_seconds=Avg('fetch_wait_seconds'),
+            mean_apply_seconds=Avg('apply_seconds'),
+            mean_commit_seconds=Avg('commit_seconds'),
+            pages=Sum('pages'),
+            api_calls=Sum('api_calls'),
+            errors=Sum('error_count'),
+            max_cursor_lag=Max('cursor_lag'),
+        )
+        .order_by('-mean_duration')[:limit]
+    )
+
+    # Lag as it stands now, from the row of each Item synced longest ago;
+    # Items never synced to the end come first
+    lagging = (
+        plaid_items.exclude(status='disconnected')
+        .values('item_id')
+        .annotate(
+            institution_name=Max('institution_name'),
+            status=Max('status'),
+            backfill_status=Max('backfill_status'),
+            never_synced=Count('id', filter=Q(last_sync__isnull=True)),
+            oldest_sync=Min('last_sync'),
+        )
+        .order_by('-never_synced', 'oldest_sync')[:limit]
+    )
+    most_lagging = []
+    for entry in lagging:
+        oldest_sync = entry.pop('oldest_sync')
+        last_sync = None if entry.pop('never_synced') else oldest_sync
+        entry['last_sync'] = last_sync
+        entry['lag_seconds'] = round((now - last_sync).total_seconds()) if last_sync else None
+        most_lagging.append(entry)
+
+    return {
+        'since': since,
+        'runs': dict(recent.values_list('status').annotate(count=Count('id')).order_by('status')),
+        'slowest': [
+            {key: round(value, 3) if isinstance(value, float) else value for key, value in entry.items()}
+            for entry in slowest
+        ],
+        'most_lagging': most_lagging,
+    }
+
+
+def prune_sync_runs():
+    """
+    Delete sync runs older than PLAID_SYNC_RUN_RETENTION_DAYS.
+
+    Returns:
+        The number of runs deleted
+    """
+    cutoff = timezone.now() - timedelta(days=settings.PLAID_SYNC_RUN_RETENTION_DAYS)
+    deleted, _ = SyncRun.objects.filter(started_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,96 @@
+"""
+Loading of the plaid-python SDK.
+
+The SDK's top-level package is called `plaid`, which is also the name of the
+legacy `plaid` app directory in backend/. Whenever backend/ is on sys.path
+(manage.py, gunicorn, Celery) a plain `import plaid` finds that directory
+instead of the SDK. `load_plaid_sdk` imports the installed SDK explicitly and
+registers it as `plaid`, so the SDK's own absolute imports (`plaid.model...`)
+keep working.
+
+Importing the SDK takes a noticeable share of a process's startup time and
+memory: its API module alone pulls in hundreds of generated model modules.
+Nothing imports it at module level; code gets SDK classes through `models`,
+`plaid_api()` and `load_plaid_sdk()`, which import what they need on first use.
+"""
+import importlib
+import os
+import re
+import sys
+import threading
+
+_lock = threading.Lock()
+
+
+def _is_sdk(module):
+    return module is not None and hasattr(module, 'ApiClient') and hasattr(module, 'Configuration')
+
+
+def load_plaid_sdk():
+    """
+    Import the plaid-python SDK, bypassing the local `plaid` app.
+
+    Returns:
+        The SDK's top-level `plaid` module
+    """
+    module = sys.modules.get('plaid')
+    if _is_sdk(module):
+        return module
+
+    with _lock:
+        module = sys.modules.get('plaid')
+        if _is_sdk(module):
+            return module
+
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        original_path = sys.path[:]
+        local_modules = {
+            name: sys.modules.pop(name)
+            for name in list(sys.modules)
+            if name == 'plaid' or name.startswith('plaid.')
+        }
+
+        try:
+            sys.path[:] = [path for path in sys.path if os.path.abspath(path or '.') != backend_dir]
+            module = importlib.import_module('plaid')
+        except ImportError:
+            # Put the local app back so nothing else is affected
+            sys.modules.update(local_modules)
+            raise
+        finally:
+            sys.path[:] = original_path
+
+        return module
+
+
+def plaid_api():
+    """
+    Import the SDK's API module (`plaid.api.plaid_api`), holding PlaidApi.
+    """
+    load_plaid_sdk()
+    return importlib.import_module('plaid.api.plaid_api')
+
+
+class _Models:
+    """
+    The SDK's model classes, imported one by one when first used.
+
+    `models.TransactionsSyncRequest` is the class in
+    `plaid.model.transactions_sync_request`; each module only imports the
+    models it refers to.
+    """
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        load_plaid_sdk()
+        module_name = re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
+        try:
+            model = getattr(importlib.import_module(f"plaid.model.{module_name}"), name)
+        except (ImportError, AttributeError):
+            raise AttributeError(f"The Plaid SDK has no model {name}")
+        setattr(self, name, model)
+        return model
+
+
+models = _Models()
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import PlaidItem, PlaidTransaction
+from .models import BalanceCheck, PlaidItem, PlaidTransaction
 from accounts.serializers import AccountSerializer, TransactionSerializer
 
 class PlaidItemSerializer(serializers.ModelSerializer):
@@ -15,9 +15,13 @@ class PlaidItemSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'user', 'account', 'account_id', 'item_id',
             'institution_name', 'last_sync', 'status', 'error_message',
-            'created_at', 'updated_at'
+            'retry_attempts', 'next_retry_at', 'consent_expires_at', 'backfill_status', 'backfill_pages',
+            'backfill_transactions', 'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'id', 'user', 'retry_attempts', 'next_retry_at', 'consent_expires_at', 'backfill_status',
+            'backfill_pages', 'backfill_transactions', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'user', 'created_at', 'updated_at']
         extra_kwargs = {
             'access_token': {'write_only': True}  # Never expose access token in API responses
         }
@@ -29,3 +33,15 @@ class PlaidTransactionSerializer(serializers.ModelSerializer):
         model = PlaidTransaction
         fields = ['id', 'plaid_item', 'transaction', 'plaid_transaction_id', 'imported_at']
         read_only_fields = ['id', 'imported_at']
+
+class BalanceCheckSerializer(serializers.ModelSerializer):
+    account_name = serializers.CharField(source='account.name', read_only=True)
+
+    class Meta:
+        model = BalanceCheck
+        fields = [
+            'id', 'plaid_item', 'account', 'account_name', 'checked_at', 'plaid_balance',
+            'available_balance', 'currency', 'ledger_balance', 'difference', 'drift',
+            'flagged'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,758 @@
+"""
+Transaction sync for Plaid Items.
+
+One Plaid Item (one bank login) can be mapped to several app accounts, with a
+PlaidItem row per account that all share the Item's access token. A sync calls
+/transactions/sync once for the whole Item, routes every transaction to the
+PlaidItem row of its Plaid account, and stores one shared cursor on all rows.
+
+Only one sync of an Item runs at a time, across all processes: a sync holds a
+lease on the Item in Redis, and a sync that can't get it raises
+SyncAlreadyRunning. join_running_sync() waits for the running sync instead.
+
+Pages are fetched from Plaid in a background thread while the previous page is
+written to the database; see _prefetch_pages().
+
+Every sync is recorded as a SyncRun with the time spent in each phase (see
+runs.py). Progress is logged at DEBUG level page by page, and at INFO level
+once per sync.
+
+The first sync of a newly linked Item can return years of history. It is run
+as a backfill (tasks.backfill_plaid_item): a series of syncs of at most
+PLAID_BACKFILL_CHUNK_PAGES pages each, with the Item's progress saved along
+with every page.
+"""
+import logging
+import queue
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+from decimal import Decimal
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from accounts.ingest import resolve_category_account
+from accounts.models import Transaction, TransactionStatus
+from accounts.signals import defer_balance_updates, queue_balance_updates
+
+from .client import (
+    TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION,
+    get_error_code,
+    get_transactions,
+)
+from .errors import record_item_error
+from .locks import Lease
+from .models import PlaidItem, PlaidTransaction
+from .ratelimit import PlaidRateLimited, wait_for_rate_limit
+from .runs import (
+    RUN_ERROR,
+    RUN_INTERRUPTED,
+    RUN_PARTIAL,
+    RUN_RATE_LIMITED,
+    RUN_SUCCESS,
+    finish_sync_run,
+    new_run_stats,
+    start_sync_run,
+)
+
+logger = logging.getLogger(__name__)
+
+# How often a sync starts over when the Item changes during pagination
+MAX_SYNC_RESTARTS = 3
+
+# Redis key prefix of the per-Item sync leases
+SYNC_LEASE_KEY = 'plaid-sync:lease'
+# Cache key prefix of the result of an Item's last sync, for joined requests
+SYNC_RESULT_KEY = 'plaid-sync:result'
+SYNC_RESULT_TIMEOUT = 5 * 60
+
+# Backfill states of a Plaid Item
+BACKFILL_PENDING = 'pending'
+BACKFILL_RUNNING = 'running'
+BACKFILL_COMPLETE = 'complete'
+
+# Rate limit shared by all backfills, on top of the transactions_sync limits,
+# so backfills leave most of the budget to incremental syncs
+BACKFILL_RATE_LIMIT = 'transactions_sync_backfill'
+
+# What the fetch thread puts on the page queue after the last page
+_DONE = object()
+
+
+class SyncAlreadyRunning(Exception):
+    """Another process is syncing the Plaid Item."""
+
+
+def _sync_key(prefix, plaid_item):
+    return f"{prefix}:{plaid_item.user_id}:{plaid_item.item_id}"
+
+
+def _take_lease(lease):
+    try:
+        return lease.acquire()
+    except redis.RedisError as e:
+        # Syncing without the lease risks an overlap; not syncing at all is worse
+        logger.warning(f"Sync lease unavailable, syncing without it: {str(e)}")
+        return True
+
+
+def _extend_lease(lease):
+    if not lease.acquired:
+        # Syncing without the lease since Redis was unavailable
+        return True
+    try:
+        return lease.extend()
+    except redis.RedisError:
+        return True
+
+
+def _extend_slots(slots, plaid_item):
+    """
+    Keep the concurrency slots of a sync (see tasks.sync_plaid_item) for as
+    long as its lease.
+
+    A slot that expired anyway (e.g. a page took longer than the slot TTL)
+    may have been given to another sync; it is taken again if there's room,
+    otherwise the sync goes on over the limit rather than stopping part way.
+    """
+    try:
+        if slots.extend() or slots.acquire():
+            return
+        logger.warning(f"Lost the concurrency slots of the sync of Plaid Item {plaid_item.item_id}; continuing over the limit")
+    except redis.RedisError:
+        pass
+
+
+def _release_lease(lease):
+    try:
+        lease.release()
+    except redis.RedisError:
+        pass
+
+
+def get_item_group(plaid_item):
+    """
+    Get every PlaidItem row of the same Plaid Item, including `plaid_item`.
+
+    Disconnected rows are left out unless `plaid_item` itself is one of them.
+    """
+    items = list(
+        PlaidItem.objects.filter(user=plaid_item.user, item_id=plaid_item.item_id)
+        .exclude(status='disconnected')
+        .select_related('account', 'user')
+    )
+    if plaid_item.id not in {item.id for item in items}:
+        items.append(plaid_item)
+    return items
+
+
+def _get_start_cursor(items):
+    """
+    Pick the cursor a grouped sync starts from.
+
+    Rows synced separately before may disagree. Starting from the oldest
+    cursor is safe, because re-applying transactions is idempotent; a row that
+    was never synced means starting from scratch.
+    """
+    if any(not item.cursor for item in items):
+        return None
+    oldest = min(items, key=lambda item: item.last_sync or timezone.now())
+    return oldest.cursor
+
+
+def _get_restart_point(items, start_cursor, backfill=False):
+    """
+    Pick where a sync starts over from if the Item changes during pagination.
+
+    Plaid requires starting over from the cursor the pagination began with.
+    When an earlier sync stopped part way through (rate limits, a lost lease,
+    an error), the saved cursor is in the middle of the pagination; the
+    cursor it began with is kept in sync_start_cursor, and the pages applied
+    since in sync_pages, until a sync reaches the end.
+
+    Returns:
+        A tuple of (the cursor to start over from, the pages from it to
+        `start_cursor`)
+    """
+    if start_cursor is None:
+        return None, 0
+    for item in items:
+        # The rows of an Item are updated together
+        if item.sync_start_cursor is not None:
+            # '' when the pagination began without a cursor
+            return item.sync_start_cursor or None, item.sync_pages
+    if backfill:
+        # A backfill's pagination began at the very first page
+        return None, max(item.backfill_pages for item in items)
+    return start_cursor, 0
+
+
+def sync_transactions_for_item(plaid_item, backfill=False, slots=None):
+    """
+    Sync transactions for a Plaid Item and every account mapped to it.
+
+    Follows /transactions/sync pagination until Plaid has nothing more to
+    send. Each page is applied in its own database transaction, together with
+    the cursor that follows it, so an interrupted sync resumes after the last
+    page it applied. The cursor the pagination began with is saved too, and
+    stays until a sync reaches the end: that's where a resumed sync starts
+    over if the Item changes during pagination. Re-applying a page is
+    harmless because transactions are matched by their Plaid ID.
+
+    Args:
+        plaid_item: Any PlaidItem row of the Plaid Item
+        backfill: Sync one chunk of the Item's backfill: stop after
+            PLAID_BACKFILL_CHUNK_PAGES pages, and count the pages in the
+            Item's backfill progress
+        slots: The locks.Semaphores slots the caller took for the sync, if
+            any; extended along with the lease on every page
+
+    Returns:
+        A dictionary with the sync results; has_more is True if a backfill
+        chunk stopped before the end
+
+    Raises:
+        SyncAlreadyRunning: If the Item is being synced by another process
+        PlaidRateLimited: If a page couldn't be fetched because of rate
+            limits; the Item is left as it was, to be synced again later
+    """
+    lease = Lease(_sync_key(SYNC_LEASE_KEY, plaid_item), ttl=settings.PLAID_SYNC_LEASE_TTL)
+    if not _take_lease(lease):
+        raise SyncAlreadyRunning(f"Plaid Item {plaid_item.item_id} is already being synced")
+
+    try:
+        result = _sync_item(plaid_item, lease, backfill, slots)
+        # For requests that joined this sync (see join_running_sync)
+        cache.set(
+            _sync_key(SYNC_RESULT_KEY, plaid_item),
+            {'finished_at': time.time(), 'result': result},
+            SYNC_RESULT_TIMEOUT
+        )
+        return result
+    finally:
+        _release_lease(lease)
+
+
+def is_sync_running(plaid_item):
+    """Whether a sync of the Plaid Item is running, in any process."""
+    return Lease.is_held(_sync_key(SYNC_LEASE_KEY, plaid_item))
+
+
+def join_running_sync(plaid_item, timeout):
+    """
+    Wait for the sync of a Plaid Item that another process is running.
+
+    Args:
+        plaid_item: Any PlaidItem row of the Plaid Item
+        timeout: Seconds to wait at most
+
+    Returns:
+        The results of the running sync, or None if it didn't finish in time
+        or failed
+    """
+    started = time.time()
+    lease_key = _sync_key(SYNC_LEASE_KEY, plaid_item)
+    while Lease.is_held(lease_key):
+        if time.time() - started > timeout:
+            return None
+        time.sleep(0.25)
+
+    entry = cache.get(_sync_key(SYNC_RESULT_KEY, plaid_item))
+    if entry is None or entry['finished_at'] < started:
+        return None
+    return entry['result']
+
+
+def _sync_item(plaid_item, lease, backfill=False, slots=None):
+    """Sync a Plaid Item while holding its lease; see sync_transactions_for_item."""
+    items = get_item_group(plaid_item)
+    item_ids = [item.id for item in items]
+    run = start_sync_run(plaid_item, items, backfill)
+    stats = new_run_stats()
+
+    # Initialize result
+    result = {
+        'added': 0,
+        'modified': 0,
+        'removed': 0,
+        'pages': 0,
+        'accounts': len(items),
+        'has_more': False,
+        'errors': []
+    }
+
+    try:
+        # Get the cursor from the last sync
+        start_cursor = _get_start_cursor(items)
+        cursor = start_cursor
+        category_accounts = {}
+
+        # If the Item changes during pagination, Plaid requires starting over
+        # from where the pagination began, possibly in an earlier sync
+        restart_cursor, restart_pages = _get_restart_point(items, start_cursor, backfill)
+        page_limit = settings.PLAID_BACKFILL_CHUNK_PAGES if backfill else None
+        # Pages past the furthest point the pagination had reached; pages
+        # sent again after a restart don't count
+        new_pages = 0
+
+        logger.info(f"Syncing transactions for Plaid Item {plaid_item.item_id} ({len(items)} accounts{', backfill' if backfill else ''})")
+
+        # Closed as soon as the loop ends, so the fetch thread stops too
+        pages = _prefetch_pages(
+            plaid_item, start_cursor, restart_cursor, backfill, page_limit, stats, restart_pages=restart_pages
+        )
+        with closing(pages):
+            waiting_since = time.perf_counter()
+            for plaid_transactions, removed_ids, next_cursor, has_more, replay in pages:
+                stats['fetch_wait_seconds'] += time.perf_counter() - waiting_since
+
+                # Keep the lease while pages keep coming. If it expired and
+                # another sync took over, stop before the cursors get mixed up
+                if not _extend_lease(lease):
+                    raise SyncAlreadyRunning(f"Lost the sync lease of Plaid Item {plaid_item.item_id}")
+                if slots is not None:
+                    _extend_slots(slots, plaid_item)
+
+                # Apply the page, updating each affected account balance once, and
+                # move the cursor past it in the same database transaction
+                with transaction.atomic(), defer_balance_updates():
+                    applying_since = time.perf_counter()
+                    added = result['added']
+                    apply_transactions(items, plaid_transactions, result, category_accounts)
+                    remove_transactions(items, removed_ids, result)
+                    committing_since = time.perf_counter()
+                    stats['apply_seconds'] += committing_since - applying_since
+                    progress = {}
+                    if backfill:
+                        progress['backfill_status'] = BACKFILL_RUNNING
+                        progress['backfill_transactions'] = F('backfill_transactions') + result['added'] - added
+                    if not replay:
+                        new_pages += 1
+                        progress['sync_start_cursor'] = restart_cursor or ''
+                        progress['sync_pages'] = restart_pages + new_pages
+                        if backfill:
+                            progress['backfill_pages'] = F('backfill_pages') + 1
+                    # A page sent again after a restart comes before the
+                    # saved cursor, unless the history now ends sooner
+                    if not replay or not has_more:
+                        progress['cursor'] = next_cursor
+                    if progress:
+                        PlaidItem.objects.filter(id__in=item_ids).update(**progress)
+                # Balances are updated and the transaction committed on the way out
+                stats['commit_seconds'] += time.perf_counter() - committing_since
+
+                result['pages'] += 1
+                cursor = next_cursor
+
+                if page_limit and new_pages >= page_limit and has_more:
+                    # The rest of the backfill is synced by the next chunk
+                    result['has_more'] = True
+                    break
+                waiting_since = time.perf_counter()
+
+        # Clear any earlier failure on every row of the Item: the Item works
+        # again. Unless a backfill has more to import, store the sync time too
+        recovered = dict(
+            status=Case(When(status='disconnected', then=Value('disconnected')), default=Value('active')),
+            error_message=None,
+            retry_attempts=0,
+            next_retry_at=None,
+            updated_at=timezone.now()
+        )
+        if result['has_more']:
+            PlaidItem.objects.filter(id__in=item_ids).update(**recovered)
+            finish_sync_run(run, RUN_PARTIAL, result, stats)
+            logger.info(f"Backfill chunk done for Plaid Item {plaid_item.item_id}: pages={result['pages']}, added={result['added']}, more to come")
+            return result
+
+        PlaidItem.objects.filter(id__in=item_ids).update(
+            last_sync=timezone.now(),
+            # The next sync begins a new pagination from the saved cursor
+            sync_start_cursor=None,
+            sync_pages=0,
+            # Any sync that reaches the end has imported the whole history
+            backfill_status=BACKFILL_COMPLETE,
+            **recovered
+        )
+        finish_sync_run(run, RUN_SUCCESS, result, stats)
+        logger.info(
+            f"Sync completed for Plaid Item {plaid_item.item_id}: pages={result['pages']}, added={result['added']}, "
+            f"modified={result['modified']}, removed={result['removed']}, errors={len(result['errors'])}, "
+            f"fetch={stats['fetch_seconds']:.2f}s, waited={stats['fetch_wait_seconds']:.2f}s, "
+            f"apply={stats['apply_seconds']:.2f}s, commit={stats['commit_seconds']:.2f}s"
+        )
+        logger.debug(f"Saved cursor for future syncs: {cursor[:30]}..." if cursor else "No cursor to save")
+
+        return result
+    except (PlaidRateLimited, SyncAlreadyRunning) as e:
+        # Not a problem with the Item: the pages applied so far are kept and
+        # the next sync resumes from the saved cursor
+        finish_sync_run(run, RUN_RATE_LIMITED if isinstance(e, PlaidRateLimited) else RUN_INTERRUPTED, result, stats, e)
+        logger.info(f"Sync of Plaid Item {plaid_item.item_id} stopped: {str(e)}")
+        raise
+    except Exception as e:
+        # Update the status of every row of the Item: retried later, or
+        # parked until the user re-links it if retrying can't help
+        new_status = record_item_error(item_ids, str(e), get_error_code(e))
+        finish_sync_run(run, RUN_ERROR, result, stats, e)
+        logger.exception(f"Error syncing Plaid Item {plaid_item.item_id} ({new_status}): {str(e)}")
+        raise e
+
+
+def _prefetch_pages(plaid_item, start_cursor, restart_cursor, backfill=False, max_pages=None, stats=None,
+                    restart_pages=0):
+    """
+    Fetch the /transactions/sync pages of a Plaid Item ahead of the caller.
+
+    A thread downloads pages into a queue of PLAID_SYNC_PREFETCH_PAGES pages,
+    so the next page is on its way while the caller writes the current one.
+    The thread only talks to Plaid, never to the database. If the Item changes
+    during pagination, the thread starts over from `restart_cursor` as Plaid
+    requires. The pages up to the furthest point reached before are sent
+    again as replays: their transactions are re-applied (matched by Plaid ID),
+    but they are no progress.
+
+    Args:
+        plaid_item: Any PlaidItem row of the Plaid Item
+        start_cursor: The cursor to start from, None for a first sync
+        restart_cursor: The cursor the pagination began with
+        backfill: Also take each page from the backfill rate limit
+        max_pages: Stop after this many pages that aren't replays, even if
+            Plaid has more
+        stats: Run stats to add the fetch time, API calls and restarts to,
+            see runs.new_run_stats; complete once the generator is closed
+        restart_pages: Pages from `restart_cursor` to `start_cursor`
+
+    Yields:
+        Tuples of (added and modified transactions, removed transaction IDs,
+        next cursor, has_more, replay), in order
+
+    Raises:
+        Whatever fetching a page raised, once the pages before it are yielded
+    """
+    pages = queue.Queue(maxsize=max(1, settings.PLAID_SYNC_PREFETCH_PAGES))
+    stopped = threading.Event()
+    stats = new_run_stats() if stats is None else stats
+
+    def put(entry):
+        # Give up on the queue once the caller has stopped reading from it
+        while not stopped.is_set():
+            try:
+                pages.put(entry, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fetch():
+        cursor = start_cursor
+        restarts = 0
+        has_more = True
+        # Pages from restart_cursor to cursor, and the most there have been
+        position = reached = restart_pages
+        fetched = 0
+        try:
+            while has_more and not stopped.is_set() and fetched != max_pages:
+                fetching_since = time.perf_counter()
+                try:
+                    if backfill:
+                        wait_for_rate_limit(BACKFILL_RATE_LIMIT)
+                    stats['api_calls'] += 1
+                    plaid_transactions, removed_ids, next_cursor, has_more = get_transactions(
+                        plaid_item.access_token,
+                        cursor=cursor
+                    )
+                    logger.debug(f"Retrieved {len(plaid_transactions)} transactions and {len(removed_ids)} removals for Plaid Item {plaid_item.item_id} (has_more={has_more})")
+                except PlaidRateLimited:
+                    raise
+                except Exception as e:
+                    if get_error_code(e) == TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION and restarts < MAX_SYNC_RESTARTS:
+                        # The Item changed while we were paging; Plaid requires
+                        # starting over from the cursor the pagination began with
+                        restarts += 1
+                        stats['restarts'] = restarts
+                        cursor = restart_cursor
+                        position = 0
+                        has_more = True
+                        logger.info(f"Transactions changed during pagination for Plaid Item {plaid_item.item_id}, restarting sync ({restarts}/{MAX_SYNC_RESTARTS})")
+                        continue
+
+                    # Logged with its traceback by the sync that receives it
+                    logger.warning(f"Error getting transactions from Plaid for Plaid Item {plaid_item.item_id}: {str(e)}")
+                    raise e
+                finally:
+                    stats['fetch_seconds'] += time.perf_counter() - fetching_since
+
+                position += 1
+                replay = position <= reached
+                reached = max(reached, position)
+                if not put((plaid_transactions, removed_ids, next_cursor, has_more, replay)):
+                    return
+                cursor = next_cursor
+                if not replay:
+                    fetched += 1
+            put(_DONE)
+        except Exception as e:
+            put(e)
+
+    fetcher = threading.Thread(target=fetch, name=f"plaid-fetch-{plaid_item.item_id}", daemon=True)
+    fetcher.start()
+    try:
+        while True:
+            page = pages.get()
+            if page is _DONE:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        # Also reached when the caller stops early, e.g. on a database error
+        stopped.set()
+        fetcher.join()
+
+
+def _route_transaction(items_by_account, catch_all, plaid_txn):
+    """Find the PlaidItem row a Plaid transaction belongs to, if any."""
+    account_id = plaid_txn.get('account_id')
+    return items_by_account.get(account_id, catch_all)
+
+
+def apply_transactions(items, plaid_transactions, result, category_accounts):
+    """
+    Create or update transactions from one page of Plaid transactions.
+
+    Each transaction goes to the PlaidItem row whose plaid_account_id matches
+    its Plaid account; a row without a plaid_account_id takes the transactions
+    of any account that isn't mapped. The page is processed set-wise: one query
+    finds the transactions that were imported before, new transactions and
+    their PlaidTransaction links are inserted with bulk_create, modifications
+    are written with bulk_update, and balances are updated once for the
+    accounts involved.
+
+    Args:
+        items: The PlaidItem rows of the Plaid Item
+        plaid_transactions: Added and modified Plaid transactions, as the
+            dictionaries Plaid sent; each is stored on its PlaidTransaction
+        result: The sync results dictionary, updated in place
+        category_accounts: Category accounts resolved so far in this sync,
+            shared between pages
+    """
+    items_by_account = {item.plaid_account_id: item for item in items if item.plaid_account_id}
+    catch_all = next((item for item in items if not item.plaid_account_id), None)
+
+    # If Plaid sends the same transaction twice in a page, the last version wins
+    incoming = {}
+    for idx, plaid_txn in enumerate(plaid_transactions):
+        txn_id = plaid_txn.get('transaction_id') or f"unknown-{idx}"
+        target = _route_transaction(items_by_account, catch_all, plaid_txn)
+        if target is None:
+            continue
+        incoming[txn_id] = (target, plaid_txn)
+
+    if not incoming:
+        return
+
+    existing_links = {
+        link.plaid_transaction_id: link
+        for link in PlaidTransaction.objects.filter(
+            plaid_transaction_id__in=list(incoming)
+        ).select_related('transaction')
+    }
+
+    now = timezone.now()
+    new_transactions = []
+    new_links = []
+    modified_transactions = []
+    updated_links = []
+
+    for txn_id, (plaid_item, plaid_txn) in incoming.items():
+        try:
+            date_obj, amount, notes, category_name = parse_plaid_transaction(plaid_txn)
+        except Exception as e:
+            logger.warning(f"Error parsing transaction {txn_id}: {str(e)}")
+            result['errors'].append(f"Error parsing transaction {txn_id}: {str(e)}")
+            continue
+
+        if txn_id in existing_links:
+            # Keep Plaid's latest version for reprocessing, whatever the
+            # transaction's status
+            link = existing_links[txn_id]
+            link.raw = compact_payload(plaid_txn)
+            updated_links.append(link)
+
+            existing_txn = link.transaction
+            # Only update if the transaction is still in REVIEW status
+            if existing_txn.status == TransactionStatus.REVIEW:
+                existing_txn.date = date_obj
+                existing_txn.amount = abs(amount)
+                if notes:
+                    existing_txn.notes = notes
+                existing_txn.updated = now
+                modified_transactions.append(existing_txn)
+            result['modified'] += 1
+            continue
+
+        debit_account, credit_account = transaction_accounts(plaid_item, amount, category_name, category_accounts)
+
+        new_txn = Transaction(
+            date=date_obj,
+            amount=abs(amount),
+            debit=debit_account,
+            credit=credit_account,
+            notes=notes or f"Plaid transaction {txn_id}",
+            status=TransactionStatus.REVIEW,
+            user=plaid_item.user
+        )
+        new_transactions.append(new_txn)
+        new_links.append(PlaidTransaction(
+            plaid_item=plaid_item,
+            transaction=new_txn,
+            plaid_transaction_id=txn_id,
+            raw=compact_payload(plaid_txn)
+        ))
+
+    if modified_transactions:
+        Transaction.objects.bulk_update(modified_transactions, ['date', 'amount', 'notes', 'updated'])
+    if updated_links:
+        PlaidTransaction.objects.bulk_update(updated_links, ['raw'])
+
+    if new_transactions:
+        Transaction.objects.bulk_create(new_transactions)
+        PlaidTransaction.objects.bulk_create(new_links)
+        result['added'] += len(new_transactions)
+
+    # Bulk writes don't send signals
+    queue_balance_updates(
+        account_id
+        for txn in new_transactions + modified_transactions
+        for account_id in (txn.debit_id, txn.credit_id)
+    )
+    logger.debug(f"Applied page for Plaid Item {items[0].item_id}: {len(new_transactions)} new, {len(modified_transactions)} updated")
+
+
+def remove_transactions(items, removed_ids, result):
+    """
+    Delete transactions that Plaid has removed (e.g. pending transactions that
+    never posted).
+
+    Only transactions still in review are deleted; anything the user has
+    already categorized or reconciled is kept. The linked PlaidTransaction rows
+    are deleted with them.
+
+    Args:
+        items: The PlaidItem rows of the Plaid Item
+        removed_ids: Plaid transaction IDs removed since the last page
+        result: The sync results dictionary, updated in place
+    """
+    if not removed_ids:
+        return
+
+    removed = Transaction.objects.filter(
+        status=TransactionStatus.REVIEW,
+        plaid_integration_source__plaid_item__in=items,
+        plaid_integration_source__plaid_transaction_id__in=removed_ids
+    )
+    deleted, deleted_per_model = removed.delete()
+    result['removed'] += deleted_per_model.get(Transaction._meta.label, 0)
+    logger.debug(f"Removed {deleted_per_model.get(Transaction._meta.label, 0)} transactions for Plaid Item {items[0].item_id}")
+
+
+def transaction_accounts(plaid_item, amount, category_name, category_accounts):
+    """
+    Pick the accounts a Plaid transaction moves money between.
+
+    Args:
+        plaid_item: The PlaidItem row the transaction belongs to
+        amount: The amount, with Plaid's sign convention
+        category_name: Plaid's category, if any
+        category_accounts: Category accounts resolved so far, see
+            accounts.ingest.resolve_category_account
+
+    Returns:
+        A tuple of (debit account, credit account)
+    """
+    # In Plaid, positive amounts are debits (money leaving the account)
+    is_debit = amount > 0
+    try:
+        category_account = resolve_category_account(
+            plaid_item.user, category_name, not is_debit, category_accounts
+        )
+    except Exception as e:
+        logger.warning(f"Error finding category account {category_name}: {str(e)}")
+        # Use a default category account
+        category_account = resolve_category_account(
+            plaid_item.user, None, not is_debit, category_accounts
+        )
+
+    if is_debit:
+        # Money leaving the account
+        return category_account, plaid_item.account
+    # Money entering the account
+    return plaid_item.account, category_account
+
+
+def compact_payload(value):
+    """
+    Drop the null and empty fields of a Plaid payload, recursively.
+
+    Most fields of a Plaid transaction (location, payment_meta, ...) are
+    usually null; there's no need to store them for every row.
+    """
+    if isinstance(value, dict):
+        compacted = {}
+        for key, item in value.items():
+            item = compact_payload(item)
+            if item is not None and item != {} and item != []:
+                compacted[key] = item
+        return compacted
+    if isinstance(value, list):
+        return [compact_payload(item) for item in value]
+    return value
+
+
+def parse_plaid_transaction(plaid_txn):
+    """
+    Extract the fields we store from a Plaid transaction.
+
+    Args:
+        plaid_txn: The Plaid transaction, as Plaid sent it or as stored in
+            PlaidTransaction.raw
+
+    Returns:
+        A tuple of (date, amount, notes, category_name); the amount keeps
+        Plaid's sign convention
+    """
+    # Get transaction date
+    date_value = plaid_txn.get('date')
+    if isinstance(date_value, str):
+        date_obj = datetime.strptime(date_value, '%Y-%m-%d').date()
+    elif date_value:
+        # Assume it's already a date object
+        date_obj = date_value
+    else:
+        date_obj = timezone.now().date()
+
+    # Get transaction amount
+    amount = Decimal(str(plaid_txn.get('amount') or 0))
+
+    # Get transaction name/description
+    notes = str(plaid_txn.get('name') or '')
+    if not notes:
+        notes = str(plaid_txn.get('merchant_name') or '')
+
+    # Handle different category formats
+    category = plaid_txn.get('category')
+    if isinstance(category, list) and len(category) > 0:
+        category_name = category[-1]
+    elif isinstance(category, str):
+        category_name = category
+    else:
+        category_name = None
+
+    return date_obj, amount, notes, category_name
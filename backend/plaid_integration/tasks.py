@@ -1,68 +1,415 @@
-from celery import shared_task
+from celery import chord, group, shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.text import slugify
+from datetime import datetime, timedelta
 import logging
+import random
+import time
 
+from . import jobs
+from .locks import Semaphores
 from .models import PlaidItem
+from .ratelimit import PlaidRateLimited
+from .reconcile import reconcile_item
+from .runs import prune_sync_runs
+from .sync import (
+    BACKFILL_COMPLETE,
+    SyncAlreadyRunning,
+    join_running_sync,
+    sync_transactions_for_item,
+)
 
 logger = logging.getLogger(__name__)
 
+# Redis key prefix of the sync concurrency semaphores
+SYNC_SLOTS_KEY = 'plaid-sync:slots'
+# Cache key of the summary of the last nightly sync run
+LAST_SYNC_SUMMARY_KEY = 'plaid-sync:last-summary'
+# How often a sync retries while waiting for a free slot before giving up
+MAX_SLOT_RETRIES = 720
+# Cache key prefix marking an Item's backfill as queued or running
+BACKFILL_KEY = 'plaid-sync:backfill'
+
+def unique_plaid_items(plaid_items):
+    """
+    Pick one PlaidItem row per Plaid Item.
+
+    map_accounts creates a row per linked account, all sharing the Item's
+    access token; syncing one row syncs all of them.
+    """
+    seen = set()
+    unique = []
+    for plaid_item in plaid_items.order_by('id'):
+        key = (plaid_item.user_id, plaid_item.item_id)
+        if key not in seen:
+            seen.add(key)
+            unique.append(plaid_item)
+    return unique
+
 @shared_task
 def sync_all_plaid_accounts():
     """
     Sync transactions for all active Plaid connections.
     This task is scheduled to run daily.
+
+    Dispatches one sync_plaid_item task per Plaid Item so the Items are spread
+    over all Celery workers; summarize_plaid_sync runs once they have all
+    finished.
     """
     logger.info("Starting daily Plaid transaction sync")
 
-    # Get all active Plaid connections
-    plaid_items = PlaidItem.objects.filter(status='active')
-    logger.info(f"Found {plaid_items.count()} active Plaid connections")
+    # Get all active Plaid connections, one per Plaid Item: the other
+    # accounts mapped to an Item are synced together with it
+    active_items = PlaidItem.objects.filter(status='active')
+    if settings.PLAID_WEBHOOK_URL and settings.PLAID_SYNC_SKIP_RECENT_HOURS:
+        # Items with webhooks are synced as soon as Plaid has new data; only
+        # poll the ones that haven't been synced lately, in case a webhook
+        # was missed
+        recent = timezone.now() - timedelta(hours=settings.PLAID_SYNC_SKIP_RECENT_HOURS)
+        active_items = active_items.filter(Q(last_sync__isnull=True) | Q(last_sync__lt=recent))
+    plaid_items = unique_plaid_items(active_items)
+    logger.info(f"Found {len(plaid_items)} active Plaid Items")
 
-    results = {
-        'total': plaid_items.count(),
-        'success': 0,
-        'error': 0,
-        'transactions_added': 0,
-        'transactions_modified': 0,
+    started_at = timezone.now().isoformat()
+    if not plaid_items:
+        return summarize_plaid_sync([], started_at)
+
+    header = group(sync_plaid_item.s(plaid_item.id) for plaid_item in plaid_items)
+    result = chord(header)(summarize_plaid_sync.s(started_at))
+
+    logger.info(f"Dispatched {len(plaid_items)} Plaid Item syncs (summary task {result.id})")
+    return {
+        'total': len(plaid_items),
+        'summary_task_id': result.id
+    }
+
+def _sync_slots(plaid_item):
+    """The global and per-institution concurrency slots an Item's sync needs."""
+    institution = slugify(plaid_item.institution_name or '') or 'unknown'
+    return Semaphores(
+        {
+            SYNC_SLOTS_KEY: settings.PLAID_SYNC_MAX_CONCURRENCY,
+            f"{SYNC_SLOTS_KEY}:institution:{institution}": settings.PLAID_SYNC_MAX_PER_INSTITUTION,
+        },
+        ttl=settings.PLAID_SYNC_SLOT_TTL
+    )
+
+@shared_task(bind=True, max_retries=MAX_SLOT_RETRIES)
+def sync_plaid_item(self, plaid_item_id, pending_key=None):
+    """
+    Sync one Plaid Item, as part of the nightly run or after a webhook.
+
+    Runs only when a global and a per-institution slot are free; otherwise the
+    task is retried later instead of holding a worker while it waits. A sync
+    stopped by Plaid rate limits is retried the same way. If the Item is
+    already being synced elsewhere the task is skipped, or for a webhook sync
+    retried after that sync. An Item whose history hasn't been fully imported
+    yet is handed to its backfill instead (see start_backfill). Never raises,
+    so one failing Item doesn't fail the run: the outcome is returned for
+    summarize_plaid_sync.
+
+    Args:
+        plaid_item_id: The ID of any PlaidItem row of the Plaid Item
+        pending_key: Cache key marking a webhook sync as scheduled, cleared
+            once the sync starts (see webhooks.schedule_item_sync)
+    """
+    outcome = {
+        'plaid_item_id': plaid_item_id,
+        'item_id': None,
+        'institution': None,
+        'status': 'skipped',
+        'added': 0,
+        'modified': 0,
+        'removed': 0,
+        'duration': 0.0,
         'errors': []
     }
 
-    # Import here to avoid circular imports
-    from .views import PlaidViewSet
-    plaid_viewset = PlaidViewSet()
+    try:
+        plaid_item = PlaidItem.objects.get(id=plaid_item_id)
+    except PlaidItem.DoesNotExist:
+        if pending_key:
+            cache.delete(pending_key)
+        outcome['errors'].append('Plaid Item no longer exists')
+        return outcome
 
-    # Sync transactions for each connection
-    for plaid_item in plaid_items:
-        try:
-            logger.info(f"Syncing transactions for Plaid Item {plaid_item.id} ({plaid_item.institution_name})")
+    outcome['item_id'] = plaid_item.item_id
+    outcome['institution'] = plaid_item.institution_name or 'Unknown'
+    # Items in 'error' are synced when retry_plaid_errors finds them due
+    if plaid_item.status not in ('active', 'error'):
+        if pending_key:
+            cache.delete(pending_key)
+        return outcome
+
+    if plaid_item.backfill_status != BACKFILL_COMPLETE:
+        # The backfill syncs the Item up to date in chunks; this makes sure
+        # it is still going (e.g. after a failed chunk) rather than
+        # importing the whole history in one task
+        if pending_key:
+            cache.delete(pending_key)
+        start_backfill(plaid_item)
+        return outcome
+
+    slots = _sync_slots(plaid_item)
+    if not slots.acquire():
+        if self.request.retries >= self.max_retries:
+            logger.warning(f"Gave up waiting for a sync slot for Plaid Item {plaid_item.item_id}")
+            if pending_key:
+                cache.delete(pending_key)
+            outcome['errors'].append('No sync slot became free')
+            return outcome
+        # Spread the retries so waiting tasks don't all come back at once
+        raise self.retry(countdown=settings.PLAID_SYNC_RETRY_DELAY * random.uniform(0.5, 1.5))
+
+    # Webhooks from here on need another sync: this one may miss their data
+    if pending_key:
+        cache.delete(pending_key)
+
+    started = time.monotonic()
+    rate_limited = None
+    already_running = False
+    try:
+        logger.info(f"Syncing transactions for Plaid Item {plaid_item.item_id} ({plaid_item.institution_name})")
+
+        # Sync transactions (errors are recorded on the PlaidItem rows)
+        sync_result = sync_transactions_for_item(plaid_item, slots=slots)
+
+        outcome['status'] = 'success'
+        outcome['added'] = sync_result.get('added', 0)
+        outcome['modified'] = sync_result.get('modified', 0)
+        outcome['removed'] = sync_result.get('removed', 0)
+        outcome['errors'] = sync_result.get('errors', [])
+        logger.info(f"Successfully synced transactions for Plaid Item {plaid_item.item_id}")
+    except PlaidRateLimited as e:
+        rate_limited = e
+    except SyncAlreadyRunning:
+        logger.info(f"Plaid Item {plaid_item.item_id} is already being synced")
+        already_running = True
+    except Exception as e:
+        logger.error(f"Error syncing transactions for Plaid Item {plaid_item.item_id}: {str(e)}")
+        outcome['status'] = 'error'
+        outcome['errors'] = [str(e)]
+    finally:
+        slots.release()
+        outcome['duration'] = round(time.monotonic() - started, 3)
+
+    if already_running:
+        if pending_key and self.request.retries < self.max_retries:
+            # The running sync may have fetched its pages before the webhook
+            # that scheduled this one; sync again once it is done
+            raise self.retry(countdown=settings.PLAID_SYNC_RETRY_DELAY * random.uniform(0.5, 1.5))
+        outcome['status'] = 'skipped'
+        return outcome
+
+    if rate_limited is not None:
+        if self.request.retries >= self.max_retries:
+            outcome['errors'] = [str(rate_limited)]
+            return outcome
+        logger.info(f"Plaid Item {plaid_item.item_id} hit a rate limit, retrying in {rate_limited.retry_after:.0f}s")
+        raise self.retry(countdown=rate_limited.retry_after + random.uniform(0, settings.PLAID_SYNC_RETRY_DELAY))
+
+    return outcome
+
+def _backfill_key(plaid_item):
+    return f"{BACKFILL_KEY}:{plaid_item.user_id}:{plaid_item.item_id}"
+
+def start_backfill(plaid_item):
+    """
+    Queue the backfill of a Plaid Item, unless it is already queued or running.
+
+    Args:
+        plaid_item: Any PlaidItem row of the Plaid Item
+
+    Returns:
+        True if a backfill was queued
+    """
+    # The key is refreshed by every chunk, and expires if the chain of chunks
+    # dies (e.g. with its worker), so the next attempt starts a new one
+    if not cache.add(_backfill_key(plaid_item), plaid_item.id, settings.PLAID_SYNC_SLOT_TTL):
+        return False
+    backfill_plaid_item.delay(plaid_item.id)
+    return True
+
+@shared_task(bind=True, max_retries=MAX_SLOT_RETRIES)
+def backfill_plaid_item(self, plaid_item_id):
+    """
+    Import the transaction history of a newly linked Plaid Item, a chunk at a
+    time.
+
+    Each run syncs up to PLAID_BACKFILL_CHUNK_PAGES pages and queues the next
+    chunk, so a long history never holds a worker for long and a failure only
+    loses the chunk in progress: the next attempt resumes from the cursor saved
+    with the last page. Routed to its own queue (settings.CELERY_TASK_ROUTES),
+    served by a small worker, and limited to its own share of the
+    transactions_sync rate limit. Progress is kept on the PlaidItem rows
+    (backfill_status, backfill_pages, backfill_transactions), and the pages
+    imported so far are visible right away.
+
+    A failed chunk is recorded on the Item like any failed sync, and
+    retry_plaid_errors resumes the backfill when the retry is due.
+    """
+    try:
+        plaid_item = PlaidItem.objects.get(id=plaid_item_id)
+    except PlaidItem.DoesNotExist:
+        return None
+
+    key = _backfill_key(plaid_item)
+    if plaid_item.status not in ('active', 'error') or plaid_item.backfill_status == BACKFILL_COMPLETE:
+        cache.delete(key)
+        return None
+    cache.set(key, plaid_item.id, settings.PLAID_SYNC_SLOT_TTL)
+
+    retry_in = None
+    try:
+        result = sync_transactions_for_item(plaid_item, backfill=True)
+    except PlaidRateLimited as e:
+        retry_in = e.retry_after + random.uniform(0, settings.PLAID_SYNC_RETRY_DELAY)
+    except SyncAlreadyRunning:
+        # e.g. a sync the user asked for; it may well finish the history
+        retry_in = settings.PLAID_SYNC_RETRY_DELAY * random.uniform(0.5, 1.5)
+    except Exception as e:
+        # Recorded on the PlaidItem rows, and retried by retry_plaid_errors
+        logger.error(f"Error in backfill of Plaid Item {plaid_item.item_id}: {str(e)}")
+        cache.delete(key)
+        return None
 
-            # Sync transactions
-            sync_result = plaid_viewset._sync_transactions_for_item(plaid_item)
+    if retry_in is not None:
+        if self.request.retries >= self.max_retries:
+            logger.warning(f"Gave up the backfill of Plaid Item {plaid_item.item_id}, it resumes with the next sync")
+            cache.delete(key)
+            return None
+        raise self.retry(countdown=retry_in)
 
-            # Update results
-            results['success'] += 1
-            results['transactions_added'] += sync_result.get('added', 0)
-            results['transactions_modified'] += sync_result.get('modified', 0)
+    if result['has_more']:
+        # Back of the queue, so other Items' backfills get their turn
+        backfill_plaid_item.apply_async(args=(plaid_item_id,), countdown=settings.PLAID_BACKFILL_CHUNK_DELAY)
+    else:
+        cache.delete(key)
+        logger.info(f"Backfill of Plaid Item {plaid_item.item_id} complete")
+    return result
 
-            # Handle errors
-            if sync_result.get('errors', []):
-                for error in sync_result['errors']:
-                    results['errors'].append(f"Plaid Item {plaid_item.id}: {error}")
+@shared_task(bind=True, max_retries=MAX_SLOT_RETRIES)
+def run_sync_job(self, job_id, plaid_item_id):
+    """
+    Run a sync a user asked for (see jobs.start_sync_job).
+
+    Routed to its own queue (settings.CELERY_TASK_ROUTES) so it never waits
+    behind the nightly fan-out, and it doesn't take the nightly run's
+    concurrency slots; the rate limiter still applies. If the Item is already
+    being synced, the job waits for that sync and reports its results. While
+    the Item's history is still being imported, the job only makes sure the
+    backfill is going and reports its progress.
+    """
+    try:
+        plaid_item = PlaidItem.objects.get(id=plaid_item_id)
+    except PlaidItem.DoesNotExist:
+        jobs.update_sync_job(job_id, state=jobs.ERROR, error='Plaid Item not found', finished_at=timezone.now().isoformat())
+        return None
+
+    if plaid_item.backfill_status != BACKFILL_COMPLETE:
+        start_backfill(plaid_item)
+        result = {
+            'added': 0,
+            'modified': 0,
+            'removed': 0,
+            'backfill_status': plaid_item.backfill_status,
+            'backfill_pages': plaid_item.backfill_pages,
+            'backfill_transactions': plaid_item.backfill_transactions,
+        }
+        jobs.update_sync_job(job_id, state=jobs.SUCCESS, result=result, finished_at=timezone.now().isoformat())
+        return result
+
+    jobs.update_sync_job(job_id, state=jobs.RUNNING, started_at=timezone.now().isoformat())
+    retry_in = None
+    try:
+        result = sync_transactions_for_item(plaid_item)
+    except SyncAlreadyRunning:
+        result = join_running_sync(plaid_item, timeout=settings.PLAID_SYNC_LEASE_TTL)
+        if result is None:
+            # The other sync failed or is still going; try again after it
+            retry_in = settings.PLAID_SYNC_RETRY_DELAY * random.uniform(0.5, 1.5)
+        else:
+            result = dict(result, joined=True)
+    except PlaidRateLimited as e:
+        retry_in = e.retry_after + random.uniform(0, 5)
+    except Exception as e:
+        # The error is also recorded on the PlaidItem rows
+        logger.error(f"Error in sync job {job_id} for Plaid Item {plaid_item.item_id}: {str(e)}")
+        jobs.update_sync_job(job_id, state=jobs.ERROR, error=str(e), finished_at=timezone.now().isoformat())
+        return None
+
+    if retry_in is not None:
+        if self.request.retries >= self.max_retries:
+            jobs.update_sync_job(job_id, state=jobs.ERROR, error='Gave up waiting for Plaid', finished_at=timezone.now().isoformat())
+            return None
+        jobs.update_sync_job(job_id, state=jobs.QUEUED)
+        raise self.retry(countdown=retry_in)
+
+    jobs.update_sync_job(job_id, state=jobs.SUCCESS, result=result, finished_at=timezone.now().isoformat())
+    return result
+
+@shared_task
+def summarize_plaid_sync(outcomes, started_at):
+    """
+    Aggregate the outcomes of a nightly Plaid sync run.
+
+    The summary is logged, stored in the cache under LAST_SYNC_SUMMARY_KEY and
+    returned.
+    """
+    finished_at = timezone.now()
+    summary = {
+        'started_at': started_at,
+        'finished_at': finished_at.isoformat(),
+        'duration': round((finished_at - datetime.fromisoformat(started_at)).total_seconds(), 3),
+        'total': len(outcomes),
+        'success': 0,
+        'error': 0,
+        'skipped': 0,
+        'transactions_added': 0,
+        'transactions_modified': 0,
+        'transactions_removed': 0,
+        'institutions': {},
+        'slowest': [],
+        'errors': []
+    }
+
+    for outcome in outcomes:
+        status = outcome['status']
+        summary[status] += 1
+        summary['transactions_added'] += outcome['added']
+        summary['transactions_modified'] += outcome['modified']
+        summary['transactions_removed'] += outcome['removed']
+        for error in outcome['errors']:
+            summary['errors'].append(f"Plaid Item {outcome['item_id'] or outcome['plaid_item_id']}: {error}")
 
-            logger.info(f"Successfully synced transactions for Plaid Item {plaid_item.id}")
-        except Exception as e:
-            logger.error(f"Error syncing transactions for Plaid Item {plaid_item.id}: {str(e)}")
-            results['error'] += 1
-            results['errors'].append(f"Plaid Item {plaid_item.id}: {str(e)}")
+        institution = summary['institutions'].setdefault(outcome['institution'] or 'Unknown', {
+            'items': 0,
+            'success': 0,
+            'error': 0,
+            'skipped': 0,
+            'sync_seconds': 0.0
+        })
+        institution['items'] += 1
+        institution[status] += 1
+        institution['sync_seconds'] = round(institution['sync_seconds'] + outcome['duration'], 3)
 
-            # Update the Plaid Item status
-            plaid_item.status = 'error'
-            plaid_item.error_message = str(e)
-            plaid_item.save()
+    slowest = sorted(outcomes, key=lambda outcome: outcome['duration'], reverse=True)[:10]
+    summary['slowest'] = [
+        {'item_id': outcome['item_id'], 'institution': outcome['institution'], 'duration': outcome['duration']}
+        for outcome in slowest if outcome['duration']
+    ]
 
-    logger.info(f"Completed daily Plaid transaction sync: {results}")
-    return results
+    cache.set(LAST_SYNC_SUMMARY_KEY, summary, None)
+    logger.info(
+        f"Completed daily Plaid transaction sync in {summary['duration']}s: "
+        f"{summary['success']} synced, {summary['error']} failed, {summary['skipped']} skipped, "
+        f"{summary['transactions_added']} added, {summary['transactions_modified']} modified, "
+        f"{summary['transactions_removed']} removed"
+    )
+    return summary
 
 @shared_task
 def check_plaid_errors():
@@ -73,64 +420,114 @@ def check_plaid_errors():
     logger.info("Checking for Plaid connections with errors")
 
     # Get all Plaid connections with errors
-    error_items = PlaidItem.objects.filter(status='error')
+    error_items = PlaidItem.objects.filter(status__in=['error', 'relink_required'])
     logger.info(f"Found {error_items.count()} Plaid connections with errors")
 
     # TODO: Implement notification logic
     # For now, just log the errors
     for item in error_items:
-        logger.warning(f"Plaid Item {item.id} ({item.institution_name}) has error: {item.error_message}")
+        if item.status == 'relink_required':
+            logger.warning(f"Plaid Item {item.id} ({item.institution_name}) needs to be linked again: {item.error_message}")
+        else:
+            logger.warning(
+                f"Plaid Item {item.id} ({item.institution_name}) has error: {item.error_message} "
+                f"(attempt {item.retry_attempts}, next retry at {item.next_retry_at})"
+            )
 
     return {
-        'error_count': error_items.count()
+        'error_count': error_items.filter(status='error').count(),
+        'relink_required_count': error_items.filter(status='relink_required').count()
     }
 
 @shared_task
-def retry_plaid_errors():
+def reconcile_plaid_balances():
+    """
+    Compare the bank balances of all linked accounts with the ledger.
+    This task is scheduled to run daily, after the nightly sync.
+
+    Dispatches one reconcile_plaid_item task per Plaid Item: each makes one
+    Plaid call for all accounts of its Item.
     """
-    Retry Plaid connections with errors.
+    plaid_items = unique_plaid_items(PlaidItem.objects.filter(status='active', plaid_account_id__isnull=False))
+    for plaid_item in plaid_items:
+        reconcile_plaid_item.delay(plaid_item.id)
+
+    logger.info(f"Dispatched balance checks of {len(plaid_items)} Plaid Items")
+    return {'total': len(plaid_items)}
+
+@shared_task(bind=True, max_retries=5)
+def reconcile_plaid_item(self, plaid_item_id):
+    """
+    Compare the bank balances of a Plaid Item's accounts with the ledger.
+
+    Waits for a running sync of the Item to finish first, and retries later
+    if Plaid's rate limits are reached.
+    """
+    try:
+        plaid_item = PlaidItem.objects.get(id=plaid_item_id)
+    except PlaidItem.DoesNotExist:
+        return {'plaid_item_id': plaid_item_id, 'status': 'skipped'}
+
+    outcome = {'plaid_item_id': plaid_item_id, 'item_id': plaid_item.item_id, 'status': 'success'}
+    try:
+        checks = reconcile_item(plaid_item)
+    except SyncAlreadyRunning:
+        if self.request.retries >= self.max_retries:
+            return dict(outcome, status='skipped')
+        raise self.retry(countdown=settings.PLAID_SYNC_RETRY_DELAY * random.uniform(0.5, 1.5))
+    except PlaidRateLimited as e:
+        if self.request.retries >= self.max_retries:
+            return dict(outcome, status='error', error=str(e))
+        raise self.retry(countdown=e.retry_after + random.uniform(0, settings.PLAID_SYNC_RETRY_DELAY))
+    except Exception as e:
+        # Failures to reach the Item are the sync's business; just skip it
+        logger.error(f"Error checking the balances of Plaid Item {plaid_item.item_id}: {str(e)}")
+        return dict(outcome, status='error', error=str(e))
+
+    outcome['checked'] = len(checks)
+    outcome['flagged'] = sum(1 for check in checks if check.flagged)
+    return outcome
+
+@shared_task
+def prune_plaid_sync_runs():
+    """
+    Delete the records of Plaid syncs older than PLAID_SYNC_RUN_RETENTION_DAYS.
     This task is scheduled to run daily.
     """
-    logger.info("Retrying Plaid connections with errors")
+    deleted = prune_sync_runs()
+    logger.info(f"Deleted {deleted} Plaid sync runs")
+    return {'deleted': deleted}
 
-    # Get all Plaid connections with errors
-    error_items = PlaidItem.objects.filter(status='error')
-    logger.info(f"Found {error_items.count()} Plaid connections with errors")
+@shared_task
+def retry_plaid_errors():
+    """
+    Retry Plaid connections with transient errors whose retry time has come.
+    This task is scheduled to run every few minutes.
 
-    results = {
-        'total': error_items.count(),
-        'success': 0,
-        'still_error': 0
-    }
+    Each due Item is synced by sync_plaid_item, sharing the nightly run's
+    concurrency slots. A sync that fails again is rescheduled with a longer
+    delay (see errors.record_item_error); Items that need to be re-linked are
+    never picked up here.
+    """
+    now = timezone.now()
+
+    # Only load Items that are due, one per Plaid Item
+    due_items = unique_plaid_items(PlaidItem.objects.filter(
+        Q(next_retry_at__lte=now) | Q(next_retry_at__isnull=True),
+        status='error'
+    ))
+    if not due_items:
+        return {'due': 0}
+
+    logger.info(f"Retrying {len(due_items)} Plaid Items with errors")
+    for plaid_item in due_items:
+        # Claim the retry, so the next run doesn't dispatch the Item again
+        # while its sync is still waiting for a slot
+        PlaidItem.objects.filter(
+            user=plaid_item.user_id,
+            item_id=plaid_item.item_id,
+            status='error'
+        ).update(next_retry_at=now + timedelta(seconds=settings.PLAID_SYNC_SLOT_TTL))
+        sync_plaid_item.delay(plaid_item.id)
 
-    # Import here to avoid circular imports
-    from .views import PlaidViewSet
-    plaid_viewset = PlaidViewSet()
-
-    # Retry each connection
-    for plaid_item in error_items:
-        try:
-            logger.info(f"Retrying Plaid Item {plaid_item.id} ({plaid_item.institution_name})")
-
-            # Reset the error status
-            plaid_item.status = 'active'
-            plaid_item.error_message = None
-            plaid_item.save()
-
-            # Sync transactions
-            plaid_viewset._sync_transactions_for_item(plaid_item)
-
-            # Update results
-            results['success'] += 1
-            logger.info(f"Successfully retried Plaid Item {plaid_item.id}")
-        except Exception as e:
-            logger.error(f"Error retrying Plaid Item {plaid_item.id}: {str(e)}")
-            results['still_error'] += 1
-
-            # Update the Plaid Item status
-            plaid_item.status = 'error'
-            plaid_item.error_message = str(e)
-            plaid_item.save()
-
-    logger.info(f"Completed retry of Plaid connections with errors: {results}")
-    return results
+    return {'due': len(due_items)}
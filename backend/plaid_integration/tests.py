@@ -0,0 +1,298 @@
+import json
+from decimal import Decimal
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import Account, AccountTypes
+from accounts.numbering import reserve_account_numbers
+
+from .client import TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION
+from .errors import record_item_error
+from .fake_plaid import fake_transaction
+from .locks import Semaphores, get_redis
+from .reconcile import reconcile_item
+from .models import PlaidItem, PlaidTransaction
+from .ratelimit import PlaidRateLimited
+from .sync import BACKFILL_COMPLETE, sync_transactions_for_item
+from .webhooks import handle_webhook
+
+User = get_user_model()
+
+PLAID_ACCOUNT_ID = 'plaid-account-1'
+
+
+class PlaidApiError(Exception):
+    """An API error as the Plaid SDK raises it: the error JSON is in `body`."""
+
+    def __init__(self, error_code):
+        super().__init__(error_code)
+        self.body = json.dumps({'error_code': error_code})
+
+
+def mutation_during_pagination():
+    return PlaidApiError(TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION)
+
+
+class ScriptedPlaid:
+    """
+    Stands in for client.get_transactions: serves the pages of a transaction
+    history by cursor, failing calls as scripted.
+
+    Cursors are 'c0' (no cursor) to 'c<pages>'; each page holds
+    `page_size` transactions.
+
+    Args:
+        pages: Pages in the history
+        page_size: Transactions per page
+        failures: Exceptions the next calls raise in order, None for a call
+            that succeeds
+    """
+
+    def __init__(self, pages, page_size=3, failures=()):
+        self.pages = pages
+        self.page_size = page_size
+        self.failures = list(failures)
+        self.cursors = []
+
+    def __call__(self, access_token, cursor=None):
+        self.cursors.append(cursor)
+        if self.failures:
+            failure = self.failures.pop(0)
+            if failure is not None:
+                raise failure
+        page = int((cursor or 'c0')[1:])
+        transactions = [
+            fake_transaction(index, PLAID_ACCOUNT_ID)
+            for index in range(page * self.page_size, (page + 1) * self.page_size)
+        ]
+        return transactions, [], f"c{page + 1}", page + 1 < self.pages
+
+
+def create_plaid_item(email):
+    """A user with a checking account linked to a one-account Plaid Item."""
+    user = User.objects.create_user(email=email, first_name='Plaid', last_name='Sync')
+    account = Account.objects.create(
+        user=user,
+        name='Checking',
+        num=reserve_account_numbers(user, 1)[0],
+        type=AccountTypes.asset,
+        balance=0,
+    )
+    return PlaidItem.objects.create(
+        user=user,
+        account=account,
+        item_id='item-1',
+        access_token='access-sandbox-1',
+        plaid_account_id=PLAID_ACCOUNT_ID,
+        institution_name='Test Bank',
+    )
+
+
+class ItemErrorTests(TestCase):
+
+    def setUp(self):
+        self.plaid_item = create_plaid_item('plaid-errors@example.com')
+
+    def test_pending_expiration_keeps_item_syncing(self):
+        status = record_item_error([self.plaid_item.id], 'Plaid: PENDING_EXPIRATION', 'PENDING_EXPIRATION')
+
+        self.plaid_item.refresh_from_db()
+        self.assertEqual(status, 'active')
+        self.assertEqual(self.plaid_item.status, 'active')
+        self.assertIsNone(self.plaid_item.next_retry_at)
+        self.assertIsNotNone(self.plaid_item.consent_expires_at)
+        self.assertGreater(self.plaid_item.consent_expires_at, timezone.now())
+
+    def test_login_required_parks_item(self):
+        status = record_item_error([self.plaid_item.id], 'ITEM_LOGIN_REQUIRED: login changed', 'ITEM_LOGIN_REQUIRED')
+
+        self.plaid_item.refresh_from_db()
+        self.assertEqual(status, 'relink_required')
+        self.assertEqual(self.plaid_item.status, 'relink_required')
+
+
+class ItemWebhookTests(TestCase):
+
+    def setUp(self):
+        self.plaid_item = create_plaid_item('plaid-webhooks@example.com')
+
+    def test_pending_expiration_records_expiry(self):
+        outcome = handle_webhook({
+            'webhook_type': 'ITEM',
+            'webhook_code': 'PENDING_EXPIRATION',
+            'item_id': self.plaid_item.item_id,
+            'consent_expiration_time': '2026-10-26T13:25:17.766Z',
+        })
+
+        self.assertEqual(outcome, 'consent expiration recorded')
+        self.plaid_item.refresh_from_db()
+        self.assertEqual(self.plaid_item.status, 'active')
+        self.assertEqual(self.plaid_item.consent_expires_at, datetime(2026, 10, 26, 13, 25, 17, 766000, tzinfo=dt_timezone.utc))
+
+    def test_permission_revoked_parks_item(self):
+        outcome = handle_webhook({
+            'webhook_type': 'ITEM',
+            'webhook_code': 'USER_PERMISSION_REVOKED',
+            'item_id': self.plaid_item.item_id,
+        })
+
+        self.assertEqual(outcome, 'item error recorded')
+        self.plaid_item.refresh_from_db()
+        self.assertEqual(self.plaid_item.status, 'relink_required')
+
+
+class SemaphoresTests(TestCase):
+
+    def setUp(self):
+        prefix = f"test-slots:{uuid.uuid4().hex}"
+        self.keys = [f"{prefix}:global", f"{prefix}:institution"]
+        self.addCleanup(get_redis().delete, *self.keys)
+
+    def test_extend_keeps_slots_past_ttl(self):
+        slots = Semaphores({key: 1 for key in self.keys}, ttl=1)
+        self.assertTrue(slots.acquire())
+        time.sleep(0.6)
+        self.assertTrue(slots.extend())
+        time.sleep(0.6)
+
+        # Past the original expiry, the slots are still taken
+        self.assertEqual(Semaphores.in_use(self.keys[1]), 1)
+        self.assertFalse(Semaphores({key: 1 for key in self.keys}, ttl=1).acquire())
+
+        slots.release()
+        self.assertEqual(Semaphores.in_use(self.keys[0]), 0)
+
+    def test_expired_slots_are_not_extended(self):
+        slots = Semaphores({key: 1 for key in self.keys}, ttl=0.2)
+        self.assertTrue(slots.acquire())
+        time.sleep(0.3)
+
+        # Another sync may hold the slot by now
+        other = Semaphores({key: 1 for key in self.keys}, ttl=60)
+        self.assertTrue(other.acquire())
+        self.assertFalse(slots.extend())
+        self.assertEqual(Semaphores.in_use(self.keys[0]), 1)
+        other.release()
+
+
+class ReconcileTests(TestCase):
+
+    def setUp(self):
+        self.plaid_item = create_plaid_item('plaid-reconcile@example.com')
+
+    def check(self, bank_balance):
+        accounts = [{'account_id': PLAID_ACCOUNT_ID, 'balances': {'current': bank_balance, 'iso_currency_code': 'USD'}}]
+        with mock.patch('plaid_integration.reconcile.get_accounts', return_value=accounts):
+            checks = reconcile_item(self.plaid_item)
+        self.assertEqual(len(checks), 1)
+        return checks[0]
+
+    def test_flags_drift_from_the_opening_difference(self):
+        # The ledger has no history from before the link: the opening balance
+        # is the baseline, not a discrepancy
+        first = self.check(500.0)
+        self.assertEqual(first.difference, Decimal('-500.00'))
+        self.assertEqual(first.drift, Decimal('0.00'))
+        self.assertFalse(first.flagged)
+        self.assertFalse(self.check(500.0).flagged)
+
+        # The bank moves without the ledger following: flagged, until the
+        # difference comes back
+        drifted = self.check(510.0)
+        self.assertEqual(drifted.drift, Decimal('-10.00'))
+        self.assertTrue(drifted.flagged)
+        self.assertTrue(self.check(510.0).flagged)
+
+        recovered = self.check(500.5)
+        self.assertEqual(recovered.drift, Decimal('-0.50'))
+        self.assertFalse(recovered.flagged)
+
+
+class SyncRestartTests(TestCase):
+    """Syncs that start over because the Item changed during pagination."""
+
+    def setUp(self):
+        self.plaid_item = create_plaid_item('plaid-sync@example.com')
+
+    def sync(self, plaid, **kwargs):
+        with mock.patch('plaid_integration.sync.get_transactions', plaid):
+            return sync_transactions_for_item(self.plaid_item, **kwargs)
+
+    def test_slots_extended_with_every_page(self):
+        slots = mock.Mock(spec=Semaphores)
+        slots.extend.return_value = True
+
+        result = self.sync(ScriptedPlaid(pages=3), slots=slots)
+
+        self.assertEqual(result['pages'], 3)
+        self.assertEqual(slots.extend.call_count, 3)
+        slots.acquire.assert_not_called()
+
+    def test_restart_after_resumed_sync(self):
+        # A completed sync leaves the cursor at the end of page 2
+        self.sync(ScriptedPlaid(pages=2))
+        self.plaid_item.refresh_from_db()
+        self.assertEqual(self.plaid_item.cursor, 'c2')
+        self.assertIsNone(self.plaid_item.sync_start_cursor)
+
+        # New pages arrive; the next sync is rate limited after one page
+        interrupted = ScriptedPlaid(pages=5, failures=[None, PlaidRateLimited('transactions_sync', 1)])
+        with self.assertRaises(PlaidRateLimited):
+            self.sync(interrupted)
+        self.plaid_item.refresh_from_db()
+        self.assertEqual(self.plaid_item.cursor, 'c3')
+        self.assertEqual(self.plaid_item.sync_start_cursor, 'c2')
+
+        # The sync resuming from c3 starts over from c2, where the
+        # pagination began, not from its own start
+        resumed = ScriptedPlaid(pages=5, failures=[mutation_during_pagination()])
+        result = self.sync(resumed)
+        self.assertEqual(resumed.cursors, ['c3', 'c2', 'c3', 'c4'])
+        self.assertFalse(result['has_more'])
+
+        self.plaid_item.refresh_from_db()
+        self.assertEqual(self.plaid_item.cursor, 'c5')
+        self.assertIsNone(self.plaid_item.sync_start_cursor)
+        # Re-applied pages don't duplicate transactions
+        self.assertEqual(PlaidTransaction.objects.filter(plaid_item=self.plaid_item).count(), 15)
+
+    @override_settings(PLAID_BACKFILL_CHUNK_PAGES=2)
+    def test_backfill_restart_keeps_progress(self):
+        # The first chunk imports pages 1 and 2
+        first = self.sync(ScriptedPlaid(pages=6), backfill=True)
+        self.assertTrue(first['has_more'])
+
+        # The second chunk imports page 3, then the Item changes: it starts
+        # over from the first page of history. Pages 1 to 3 are sent again
+        # without counting toward the chunk, which then imports page 4
+        restarted = ScriptedPlaid(pages=6, failures=[None, mutation_during_pagination()])
+        second = self.sync(restarted, backfill=True)
+        self.assertEqual(restarted.cursors, ['c2', 'c3', None, 'c1', 'c2', 'c3'])
+        self.assertTrue(second['has_more'])
+
+        self.plaid_item.refresh_from_db()
+        # The cursor never moved back to a page imported before
+        self.assertEqual(self.plaid_item.cursor, 'c4')
+        self.assertEqual(self.plaid_item.backfill_pages, 4)
+        self.assertEqual(self.plaid_item.sync_pages, 4)
+        self.assertEqual(self.plaid_item.sync_start_cursor, '')
+
+        # The third chunk picks up at page 5 and finishes
+        last = ScriptedPlaid(pages=6)
+        third = self.sync(last, backfill=True)
+        self.assertEqual(last.cursors, ['c4', 'c5'])
+        self.assertFalse(third['has_more'])
+
+        self.plaid_item.refresh_from_db()
+        self.assertEqual(self.plaid_item.cursor, 'c6')
+        self.assertEqual(self.plaid_item.backfill_status, BACKFILL_COMPLETE)
+        self.assertEqual(self.plaid_item.backfill_pages, 6)
+        self.assertEqual(self.plaid_item.backfill_transactions, 18)
+        self.assertIsNone(self.plaid_item.sync_start_cursor)
+        self.assertEqual(PlaidTransaction.objects.filter(plaid_item=self.plaid_item).count(), 18)
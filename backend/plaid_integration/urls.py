@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PlaidViewSet, PlaidItemViewSet
+from .views import PlaidViewSet, PlaidItemViewSet, PlaidWebhookView
 
 router = DefaultRouter()
 router.register('items', PlaidItemViewSet, basename='plaid-item')
@@ -10,6 +10,7 @@ plaid_router = DefaultRouter()
 plaid_router.register('', PlaidViewSet, basename='plaid')
 
 urlpatterns = [
+    path('webhook/', PlaidWebhookView.as_view(), name='plaid-webhook'),
     path('', include(router.urls)),
     path('api/', include(plaid_router.urls)),
 ]
@@ -1,21 +1,23 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.utils import timezone
-from django.db import transaction
-from decimal import Decimal
+from rest_framework.reverse import reverse
+from rest_framework.views import APIView
 
-from .models import PlaidItem, PlaidTransaction
-from .serializers import PlaidItemSerializer, PlaidTransactionSerializer
-from accounts.models import Account, Transaction, TransactionStatus
+from .models import BalanceCheck, PlaidItem, SyncRun
+from .serializers import BalanceCheckSerializer, PlaidItemSerializer, PlaidTransactionSerializer
+from accounts.models import Account
 from accounts.permissions import IsOwner
 from .client import (
     create_link_token,
-    exchange_public_token,
-    get_transactions,
-    get_institution,
-    get_accounts
+    exchange_public_token
 )
+from .jobs import get_sync_job, start_sync_job
+from .metadata import get_institution_metadata, get_item_accounts
+from .runs import sync_run_summary
+from .sync import sync_transactions_for_item
+from .tasks import run_sync_job, start_backfill
+from .webhooks import WebhookVerificationError, handle_webhook, verify_webhook
 
 class PlaidViewSet(viewsets.ViewSet):
     """
@@ -85,11 +87,11 @@ class PlaidViewSet(viewsets.ViewSet):
             # Exchange the public token for an access token
             access_token, item_id = exchange_public_token(public_token)
 
-            # Get institution information
+            # Get institution information (stored locally, see metadata.py)
             institution_name = "Financial Institution"
             if institution_id:
                 try:
-                    institution = get_institution(institution_id)
+                    institution = get_institution_metadata(institution_id)
                     institution_name = institution.name
                 except Exception as e:
                     # Log the error but continue
@@ -103,10 +105,21 @@ class PlaidViewSet(viewsets.ViewSet):
                     'item_id': item_id,
                     'access_token': access_token,
                     'institution_name': institution_name,
-                    'status': 'active'
+                    'status': 'active',
+                    'error_message': None,
+                    'retry_attempts': 0,
+                    'next_retry_at': None,
+                    # Linking again renews the user's consent
+                    'consent_expires_at': None
                 }
             )
 
+            # Never synced: its history is imported by a backfill once the
+            # accounts are mapped (see map_accounts)
+            if not plaid_item.cursor:
+                plaid_item.backfill_status = 'pending'
+                plaid_item.save(update_fields=['backfill_status'])
+
             # Mark the account as a bank feed account
             account.inBankFeed = True
             account.save()
@@ -137,31 +150,30 @@ class PlaidViewSet(viewsets.ViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Get accounts from Plaid
-            plaid_accounts = get_accounts(access_token)
+            # Get accounts from Plaid, or from the cache while linking
+            plaid_accounts = get_item_accounts(access_token)
 
-            # Convert Plaid account objects to dictionaries
+            # Keep the fields the mapping UI needs
             serializable_accounts = []
             for account in plaid_accounts:
                 try:
-                    # Extract relevant fields from the account object
                     account_dict = {
-                        'account_id': str(getattr(account, 'account_id', '')),
-                        'name': str(getattr(account, 'name', '')),
-                        'mask': str(getattr(account, 'mask', '')),
-                        'type': str(getattr(account, 'type', '')),  # Convert AccountType to string
-                        'subtype': str(getattr(account, 'subtype', '')) if getattr(account, 'subtype', None) else None,  # Convert subtype to string
+                        'account_id': str(account.get('account_id') or ''),
+                        'name': str(account.get('name') or ''),
+                        'mask': str(account.get('mask') or ''),
+                        'type': str(account.get('type') or ''),
+                        'subtype': str(account['subtype']) if account.get('subtype') else None,
                     }
 
-                    # Handle balances separately to avoid nested attribute errors
-                    balances = getattr(account, 'balances', None)
+                    # Handle balances separately, they may be missing
+                    balances = account.get('balances')
                     if balances:
                         account_dict['balances'] = {
-                            'available': float(getattr(balances, 'available', 0)) if getattr(balances, 'available', None) is not None else None,
-                            'current': float(getattr(balances, 'current', 0)) if getattr(balances, 'current', None) is not None else None,
-                            'limit': float(getattr(balances, 'limit', 0)) if getattr(balances, 'limit', None) is not None else None,
-                            'iso_currency_code': str(getattr(balances, 'iso_currency_code', '')) if getattr(balances, 'iso_currency_code', None) else None,
-                            'unofficial_currency_code': str(getattr(balances, 'unofficial_currency_code', '')) if getattr(balances, 'unofficial_currency_code', None) else None
+                            'available': float(balances['available']) if balances.get('available') is not None else None,
+                            'current': float(balances['current']) if balances.get('current') is not None else None,
+                            'limit': float(balances['limit']) if balances.get('limit') is not None else None,
+                            'iso_currency_code': balances.get('iso_currency_code') or None,
+                            'unofficial_currency_code': balances.get('unofficial_currency_code') or None
                         }
                     else:
                         account_dict['balances'] = {
@@ -219,6 +231,7 @@ class PlaidViewSet(viewsets.ViewSet):
 
             # Create PlaidItem entries for each mapping
             created_items = []
+            needs_backfill = False
             # Note: In the frontend, the mapping is:
             # { plaid_account_id: app_account_id }
             for plaid_account_id, app_account_id in account_mapping.items():
@@ -257,7 +270,10 @@ class PlaidViewSet(viewsets.ViewSet):
                             'access_token': access_token,
                             'plaid_account_id': plaid_account_id,
                             'institution_name': institution_name,
-                            'status': 'active'
+                            'status': 'active',
+                            'error_message': None,
+                            'retry_attempts': 0,
+                            'next_retry_at': None
                         }
                     )
 
@@ -265,6 +281,8 @@ class PlaidViewSet(viewsets.ViewSet):
                     account.inBankFeed = True
                     account.save()
 
+                    if not plaid_item.cursor:
+                        needs_backfill = True
                     created_items.append(plaid_item.id)
                 except Exception as e:
                     # Log the specific error for this mapping
@@ -274,11 +292,22 @@ class PlaidViewSet(viewsets.ViewSet):
                         status=status.HTTP_500_INTERNAL_SERVER_ERROR
                     )
 
+            # Import the transaction history in the background, in chunks:
+            # the client follows its progress on the Plaid Items
+            if needs_backfill and created_items:
+                PlaidItem.objects.filter(user=request.user, item_id=item_id).exclude(status='disconnected').update(
+                    backfill_status='pending',
+                    backfill_pages=0,
+                    backfill_transactions=0
+                )
+                start_backfill(PlaidItem.objects.get(id=created_items[0]))
+
             # Return success response
             return Response({
                 "status": "success",
                 "mapped_accounts": len(created_items),
-                "plaid_item_ids": created_items
+                "plaid_item_ids": created_items,
+                "backfill": needs_backfill
             })
         except Exception as e:
             # Log the full error
@@ -293,7 +322,11 @@ class PlaidViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['post'])
     def sync_transactions(self, request):
         """
-        Sync transactions for a Plaid Item.
+        Start syncing transactions for a Plaid Item.
+
+        The sync runs in the background: the response (202) holds a job that
+        can be polled with sync_status. If the Item already has a sync job
+        waiting or running, that job is returned instead of starting another.
         """
         try:
             # Get the Plaid Item ID from the request
@@ -318,10 +351,15 @@ class PlaidViewSet(viewsets.ViewSet):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            # Sync transactions
-            result = self._sync_transactions_for_item(plaid_item)
+            # Queue the sync, or join the one already queued for the Item
+            job, created = start_sync_job(plaid_item)
+            if created:
+                run_sync_job.delay(job['job_id'], plaid_item.id)
 
-            return Response(result)
+            return Response(
+                dict(self._job_data(job), coalesced=not created),
+                status=status.HTTP_202_ACCEPTED
+            )
         except Exception as e:
             # Log the full error
             import traceback
@@ -332,322 +370,38 @@ class PlaidViewSet(viewsets.ViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    def _sync_transactions_for_item(self, plaid_item):
-        """
-        Sync transactions for a Plaid Item.
-
-        Args:
-            plaid_item: The PlaidItem object
-
-        Returns:
-            A dictionary with the sync results
-        """
-        # Initialize result
-        result = {
-            'added': 0,
-            'modified': 0,
-            'removed': 0,
-            'errors': []
-        }
-
-        try:
-            # Get the cursor from the last sync
-            cursor = plaid_item.cursor
-
-            # Log the sync attempt
-            print(f"Syncing transactions for Plaid Item {plaid_item.id} with access_token={plaid_item.access_token[:5]}...")
-
-            # Get transactions from Plaid
-            try:
-                plaid_transactions, next_cursor, has_more = get_transactions(
-                    plaid_item.access_token,
-                    cursor=cursor
-                )
-                print(f"Retrieved {len(plaid_transactions)} transactions from Plaid")
-
-                # Log the first transaction for debugging
-                if plaid_transactions:
-                    first_txn = plaid_transactions[0]
-                    print(f"First transaction: {str(first_txn)[:100]}...")
-                    print(f"Transaction attributes: {dir(first_txn)[:100]}...")
-            except Exception as e:
-                import traceback
-                print(f"Error getting transactions from Plaid: {str(e)}")
-                print(traceback.format_exc())
-                raise e
-
-            # Process transactions
-            with transaction.atomic():
-                for idx, plaid_txn in enumerate(plaid_transactions):
-                    try:
-                        # Get transaction ID safely
-                        txn_id = getattr(plaid_txn, 'transaction_id', f"unknown-{idx}")
-                        print(f"Processing transaction {txn_id}")
-
-                        # Skip transactions that don't match the Plaid account ID if specified
-                        account_id = getattr(plaid_txn, 'account_id', None)
-                        if plaid_item.plaid_account_id and account_id != plaid_item.plaid_account_id:
-                            print(f"Skipping transaction {txn_id} - account ID mismatch: {account_id} != {plaid_item.plaid_account_id}")
-                            continue
-
-                        # Check if we've already imported this transaction
-                        try:
-                            existing = PlaidTransaction.objects.filter(
-                                plaid_transaction_id=txn_id
-                            ).first()
-                        except Exception as e:
-                            print(f"Error checking for existing transaction {txn_id}: {str(e)}")
-                            result['errors'].append(f"Error checking for existing transaction {txn_id}: {str(e)}")
-                            continue
-
-                        if existing:
-                            # Update existing transaction
-                            try:
-                                self._update_transaction(existing.transaction, plaid_txn, plaid_item)
-                                result['modified'] += 1
-                                print(f"Updated transaction {txn_id}")
-                            except Exception as e:
-                                print(f"Error updating transaction {txn_id}: {str(e)}")
-                                result['errors'].append(f"Error updating transaction {txn_id}: {str(e)}")
-                        else:
-                            # Create new transaction
-                            try:
-                                new_txn = self._create_transaction(plaid_txn, plaid_item)
-                                if new_txn:
-                                    result['added'] += 1
-                                    print(f"Created new transaction {txn_id}")
-                            except Exception as e:
-                                print(f"Error creating transaction {txn_id}: {str(e)}")
-                                result['errors'].append(f"Error creating transaction {txn_id}: {str(e)}")
-                    except Exception as e:
-                        print(f"Error processing transaction: {str(e)}")
-                        result['errors'].append(f"Error processing transaction: {str(e)}")
-
-            # Update the Plaid Item with the new cursor and sync time
-            plaid_item.last_sync = timezone.now()
-            plaid_item.cursor = next_cursor  # Store the cursor for future syncs
-            plaid_item.save()
-            print(f"Sync completed for Plaid Item {plaid_item.id}: added={result['added']}, modified={result['modified']}, errors={len(result['errors'])}")
-            print(f"Saved cursor for future syncs: {next_cursor[:30]}..." if next_cursor else "No cursor to save")
-
-            return result
-        except Exception as e:
-            # Update the Plaid Item status
-            plaid_item.status = 'error'
-            plaid_item.error_message = str(e)
-            plaid_item.save()
-
-            import traceback
-            print(f"Error in _sync_transactions_for_item: {str(e)}")
-            print(traceback.format_exc())
-
-            raise e
-
-    def _create_transaction(self, plaid_txn, plaid_item):
+    @action(detail=False, methods=['get'], url_path=r'sync_status/(?P<job_id>[0-9a-f]+)')
+    def sync_status(self, request, job_id=None):
         """
-        Create a transaction from a Plaid transaction.
+        Get the state of a sync job started by sync_transactions.
 
-        Args:
-            plaid_txn: The Plaid transaction
-            plaid_item: The PlaidItem object
-
-        Returns:
-            The created Transaction object
+        The state is 'queued', 'running', 'success' (with the sync results)
+        or 'error'.
         """
-        try:
-            # Get transaction ID for logging
-            txn_id = getattr(plaid_txn, 'transaction_id', 'unknown')
-            print(f"Creating transaction {txn_id}")
-
-            # Get the account
-            account = plaid_item.account
-
-            # Get transaction date
-            try:
-                # Try to get the date as a string first
-                date_str = getattr(plaid_txn, 'date', None)
-                if date_str:
-                    # Convert string to date if needed
-                    if isinstance(date_str, str):
-                        from datetime import datetime
-                        date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-                    else:
-                        # Assume it's already a date object
-                        date_obj = date_str
-                else:
-                    date_obj = timezone.now().date()
-
-                print(f"Transaction date: {date_obj}")
-            except Exception as e:
-                print(f"Error parsing date for transaction {txn_id}: {str(e)}")
-                date_obj = timezone.now().date()
-                print(f"Using current date instead: {date_obj}")
-
-            # Get transaction amount
-            try:
-                amount_str = str(getattr(plaid_txn, 'amount', 0))
-                amount = Decimal(amount_str)
-                is_debit = amount > 0  # In Plaid, positive amounts are debits (money leaving the account)
-                print(f"Transaction amount: {amount}, is_debit: {is_debit}")
-            except Exception as e:
-                print(f"Error parsing amount for transaction {txn_id}: {str(e)}")
-                amount = Decimal('0')
-                is_debit = True
-                print(f"Using default amount: {amount}")
-
-            # Get transaction name/description
-            try:
-                notes = str(getattr(plaid_txn, 'name', ''))
-                if not notes:
-                    notes = str(getattr(plaid_txn, 'merchant_name', ''))
-                if not notes:
-                    notes = f"Plaid transaction {txn_id}"
-                print(f"Transaction notes: {notes}")
-            except Exception as e:
-                print(f"Error getting notes for transaction {txn_id}: {str(e)}")
-                notes = f"Plaid transaction {txn_id}"
-                print(f"Using default notes: {notes}")
-
-            # Find or create a category account
-            try:
-                from accounts.tasks import find_or_create_category_account
-                category = getattr(plaid_txn, 'category', None)
-                print(f"Transaction category: {category}")
-
-                # Handle different category formats
-                if isinstance(category, list) and len(category) > 0:
-                    category_name = category[-1]
-                elif isinstance(category, str):
-                    category_name = category
-                else:
-                    category_name = None
-
-                print(f"Using category name: {category_name}")
-
-                category_account = find_or_create_category_account(
-                    plaid_item.user,
-                    category_name,
-                    not is_debit  # Invert for our system
-                )
-                print(f"Category account: {category_account.name} (ID: {category_account.id})")
-            except Exception as e:
-                print(f"Error finding category account for transaction {txn_id}: {str(e)}")
-                # Use a default category account
-                from accounts.tasks import find_or_create_category_account
-                category_account = find_or_create_category_account(
-                    plaid_item.user,
-                    None,  # No category name, will use default
-                    not is_debit
-                )
-                print(f"Using default category account: {category_account.name} (ID: {category_account.id})")
-
-            # Create the transaction
-            if is_debit:
-                # Money leaving the account
-                debit_account = category_account
-                credit_account = account
-            else:
-                # Money entering the account
-                debit_account = account
-                credit_account = category_account
-
-            # Create the transaction
-            transaction = Transaction.objects.create(
-                date=date_obj,
-                amount=abs(amount),
-                debit=debit_account,
-                credit=credit_account,
-                notes=notes,
-                status=TransactionStatus.REVIEW,
-                user=plaid_item.user
-            )
-            print(f"Created transaction: ID={transaction.id}, date={transaction.date}, amount={transaction.amount}")
-
-            # Create the PlaidTransaction link
-            plaid_transaction = PlaidTransaction.objects.create(
-                plaid_item=plaid_item,
-                transaction=transaction,
-                plaid_transaction_id=txn_id
+        job = get_sync_job(job_id)
+        if job is None or job['user_id'] != request.user.id:
+            return Response(
+                {"detail": "Sync job not found"},
+                status=status.HTTP_404_NOT_FOUND
             )
-            print(f"Created PlaidTransaction link: ID={plaid_transaction.id}, plaid_transaction_id={plaid_transaction.plaid_transaction_id}")
+        return Response(self._job_data(job))
 
-            return transaction
-        except Exception as e:
-            import traceback
-            print(f"Error in _create_transaction: {str(e)}")
-            print(traceback.format_exc())
-            raise e
+    def _job_data(self, job):
+        data = {key: value for key, value in job.items() if key != 'user_id'}
+        data['status_url'] = reverse('plaid-sync-status', kwargs={'job_id': job['job_id']}, request=self.request)
+        return data
 
-    def _update_transaction(self, transaction, plaid_txn, plaid_item):
+    def _sync_transactions_for_item(self, plaid_item):
         """
-        Update a transaction from a Plaid transaction.
+        Sync transactions for a Plaid Item and every account mapped to it.
 
         Args:
-            transaction: The Transaction object to update
-            plaid_txn: The Plaid transaction
             plaid_item: The PlaidItem object
 
         Returns:
-            The updated Transaction object
+            A dictionary with the sync results
         """
-        try:
-            # Get transaction ID for logging
-            txn_id = getattr(plaid_txn, 'transaction_id', 'unknown')
-            print(f"Updating transaction {txn_id} (DB ID: {transaction.id})")
-
-            # Only update if the transaction is still in REVIEW status
-            if transaction.status == TransactionStatus.REVIEW:
-                # Get transaction date
-                try:
-                    # Try to get the date as a string first
-                    date_str = getattr(plaid_txn, 'date', None)
-                    if date_str:
-                        # Convert string to date if needed
-                        if isinstance(date_str, str):
-                            from datetime import datetime
-                            date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-                        else:
-                            # Assume it's already a date object
-                            date_obj = date_str
-
-                        transaction.date = date_obj
-                        print(f"Updated transaction date to: {date_obj}")
-                except Exception as e:
-                    print(f"Error updating date for transaction {txn_id}: {str(e)}")
-                    # Keep the existing date
-
-                # Get transaction amount
-                try:
-                    amount_str = str(getattr(plaid_txn, 'amount', 0))
-                    amount = abs(Decimal(amount_str))
-                    transaction.amount = amount
-                    print(f"Updated transaction amount to: {amount}")
-                except Exception as e:
-                    print(f"Error updating amount for transaction {txn_id}: {str(e)}")
-                    # Keep the existing amount
-
-                # Get transaction name/description
-                try:
-                    notes = str(getattr(plaid_txn, 'name', ''))
-                    if notes:
-                        transaction.notes = notes
-                        print(f"Updated transaction notes to: {notes}")
-                except Exception as e:
-                    print(f"Error updating notes for transaction {txn_id}: {str(e)}")
-                    # Keep the existing notes
-
-                # Save the transaction
-                transaction.save()
-                print(f"Transaction {transaction.id} updated successfully")
-            else:
-                print(f"Transaction {transaction.id} not updated - status is not REVIEW")
-
-            return transaction
-        except Exception as e:
-            import traceback
-            print(f"Error in _update_transaction: {str(e)}")
-            print(traceback.format_exc())
-            raise e
+        return sync_transactions_for_item(plaid_item)
 
 class PlaidItemViewSet(viewsets.ModelViewSet):
     """
@@ -679,3 +433,97 @@ class PlaidItemViewSet(viewsets.ModelViewSet):
         account.save()
 
         return Response({"status": "disconnected"})
+
+    @action(detail=True, methods=['get'])
+    def balance_checks(self, request, pk=None):
+        """
+        Get the history of balance checks of a linked account, latest first:
+        the bank's balance, the ledger's, and whether they differed by more
+        than the tolerance. Query parameter: limit (default 30).
+        """
+        plaid_item = self.get_object()
+        try:
+            limit = min(max(int(request.query_params.get('limit', 30)), 1), 365)
+        except ValueError:
+            return Response(
+                {"detail": "limit must be a number"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        checks = BalanceCheck.objects.filter(account=plaid_item.account).select_related('account')
+        return Response(BalanceCheckSerializer(checks.order_by('-checked_at')[:limit], many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def balance_discrepancies(self, request):
+        """
+        Get the linked accounts whose latest balance check was flagged.
+        """
+        latest = (
+            BalanceCheck.objects.filter(plaid_item__user=request.user)
+            .exclude(plaid_item__status='disconnected')
+            .select_related('account')
+            .order_by('account_id', '-checked_at')
+            .distinct('account_id')
+        )
+        flagged = [check for check in latest if check.flagged]
+        return Response(BalanceCheckSerializer(flagged, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def sync_summary(self, request):
+        """
+        Summarize the user's recent Plaid syncs: the slowest Items, with how
+        long each phase took, and the Items furthest behind.
+
+        Query parameters: days (default 7) and limit (default 10).
+        """
+        try:
+            days = min(max(int(request.query_params.get('days', 7)), 1), 90)
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            return Response(
+                {"detail": "days and limit must be numbers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(sync_run_summary(
+            SyncRun.objects.filter(plaid_item__user=request.user),
+            self.get_queryset(),
+            days=days,
+            limit=limit
+        ))
+
+class PlaidWebhookView(APIView):
+    """
+    Receives webhooks from Plaid.
+
+    Plaid doesn't authenticate as a user; instead every request is checked
+    against the JWT in its Plaid-Verification header before it is acted on.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        # Verify against the exact bytes Plaid signed
+        body = request.body
+        try:
+            payload = verify_webhook(body, request.headers.get('Plaid-Verification'))
+        except WebhookVerificationError as e:
+            print(f"Rejected Plaid webhook: {str(e)}")
+            return Response(
+                {"detail": "Webhook verification failed"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            outcome = handle_webhook(payload)
+        except Exception as e:
+            # Let Plaid know so it can deliver the webhook again
+            import traceback
+            print(f"Error handling Plaid webhook: {str(e)}")
+            print(traceback.format_exc())
+            return Response(
+                {"detail": f"Error handling webhook: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        return Response({"status": outcome})
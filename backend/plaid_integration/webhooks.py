@@ -0,0 +1,226 @@
+"""
+Plaid webhook verification and handling.
+
+Plaid signs every webhook with a JWT in the Plaid-Verification header. The JWT
+is signed (ES256) with a key that is fetched by its key ID from
+/webhook_verification_key/get, and its payload holds the SHA-256 of the request
+body and the time it was issued. A webhook is only acted on once all of these
+check out.
+
+Transaction webhooks don't sync anything themselves: they schedule a sync of
+the affected Plaid Item a little later, and further webhooks for the same Item
+in the meantime are folded into that one sync.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import time
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .errors import record_consent_expiration, record_item_error
+from .models import PlaidItem
+
+logger = logging.getLogger(__name__)
+
+# Cache key prefixes of verification keys and of scheduled webhook syncs
+VERIFICATION_KEY_CACHE_KEY = 'plaid-webhook:key'
+PENDING_SYNC_KEY = 'plaid-webhook:pending'
+
+# How long a fetched verification key is cached
+VERIFICATION_KEY_TIMEOUT = 24 * 60 * 60
+
+# Webhook codes that mean new transaction data is ready to be synced
+TRANSACTION_SYNC_CODES = {
+    'SYNC_UPDATES_AVAILABLE',
+    # Sent to Items that haven't moved to /transactions/sync yet
+    'INITIAL_UPDATE',
+    'HISTORICAL_UPDATE',
+    'DEFAULT_UPDATE',
+    'TRANSACTIONS_REMOVED',
+}
+
+
+class WebhookVerificationError(Exception):
+    """The webhook could not be shown to come from Plaid."""
+
+
+def fetch_verification_key(key_id):
+    """
+    Get the public key (a JWK dictionary) Plaid signed webhooks with.
+
+    Keys are cached; a key Plaid has marked as expired is never used.
+    """
+    cache_key = f"{VERIFICATION_KEY_CACHE_KEY}:{key_id}"
+    key = cache.get(cache_key)
+    if key is None:
+        from .client import get_webhook_verification_key
+
+        key = get_webhook_verification_key(key_id)
+        cache.set(cache_key, key, VERIFICATION_KEY_TIMEOUT)
+
+    if key.get('expired_at'):
+        raise WebhookVerificationError(f"Verification key {key_id} has expired")
+    return key
+
+
+def verify_webhook(body, signed_jwt, get_key=None, now=None):
+    """
+    Check that a webhook request was sent by Plaid.
+
+    Args:
+        body: The raw request body (bytes)
+        signed_jwt: The Plaid-Verification header
+        get_key: Function returning the JWK dictionary for a key ID, defaults
+            to fetch_verification_key; replace it to verify recorded webhooks
+            without network access
+        now: The current Unix time, defaults to time.time()
+
+    Returns:
+        The decoded webhook payload
+
+    Raises:
+        WebhookVerificationError: If any check fails
+    """
+    if not signed_jwt:
+        raise WebhookVerificationError('Missing Plaid-Verification header')
+
+    try:
+        header = jwt.get_unverified_header(signed_jwt)
+    except jwt.InvalidTokenError as e:
+        raise WebhookVerificationError(f"Malformed verification token: {str(e)}")
+    if header.get('alg') != 'ES256':
+        raise WebhookVerificationError(f"Unexpected signing algorithm {header.get('alg')}")
+    if not header.get('kid'):
+        raise WebhookVerificationError('Verification token has no key ID')
+
+    try:
+        jwk = (get_key or fetch_verification_key)(header['kid'])
+        public_key = jwt.algorithms.ECAlgorithm.from_jwk(json.dumps(jwk))
+        # The token age is checked below against Plaid's limit instead
+        claims = jwt.decode(signed_jwt, public_key, algorithms=['ES256'], options={'verify_iat': False})
+    except WebhookVerificationError:
+        raise
+    except Exception as e:
+        raise WebhookVerificationError(f"Invalid signature: {str(e)}")
+
+    now = time.time() if now is None else now
+    issued_at = claims.get('iat')
+    if not isinstance(issued_at, (int, float)) or now - issued_at > settings.PLAID_WEBHOOK_MAX_AGE:
+        raise WebhookVerificationError('Verification token is too old')
+
+    body_hash = hashlib.sha256(body).hexdigest()
+    if not hmac.compare_digest(body_hash, str(claims.get('request_body_sha256', ''))):
+        raise WebhookVerificationError('Request body does not match the signed hash')
+
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise WebhookVerificationError('Request body is not JSON')
+
+
+def schedule_item_sync(plaid_item):
+    """
+    Schedule a sync of a Plaid Item in PLAID_WEBHOOK_SYNC_DELAY seconds.
+
+    Nothing is scheduled while a sync for the Item is already waiting to start;
+    the pending marker is cleared when the sync starts, so a webhook that
+    arrives during a sync schedules one more.
+
+    Returns:
+        True if a sync was scheduled
+    """
+    from .tasks import sync_plaid_item
+
+    pending_key = f"{PENDING_SYNC_KEY}:{plaid_item.item_id}"
+    # The marker outlives the delay in case the workers are backed up
+    if not cache.add(pending_key, plaid_item.id, settings.PLAID_WEBHOOK_SYNC_DELAY + settings.PLAID_SYNC_SLOT_TTL):
+        return False
+
+    sync_plaid_item.apply_async(
+        args=(plaid_item.id,),
+        kwargs={'pending_key': pending_key},
+        countdown=settings.PLAID_WEBHOOK_SYNC_DELAY
+    )
+    return True
+
+
+def handle_webhook(payload):
+    """
+    Act on a verified Plaid webhook.
+
+    Args:
+        payload: The decoded webhook payload
+
+    Returns:
+        A short description of what was done, for logging and the response
+    """
+    webhook_type = payload.get('webhook_type')
+    webhook_code = payload.get('webhook_code')
+    item_id = payload.get('item_id')
+
+    items = PlaidItem.objects.filter(item_id=item_id).exclude(status='disconnected')
+    plaid_item = items.order_by('id').first() if item_id else None
+    if plaid_item is None:
+        logger.info(f"Ignoring {webhook_type} {webhook_code} webhook for unknown Plaid Item {item_id}")
+        return 'unknown item'
+
+    if webhook_type == 'TRANSACTIONS' and webhook_code in TRANSACTION_SYNC_CODES:
+        # An Item waiting for a retry is synced too: Plaid has data for it again
+        if plaid_item.status not in ('active', 'error'):
+            return 'item not active'
+        scheduled = schedule_item_sync(plaid_item)
+        logger.info(f"{webhook_code} for Plaid Item {item_id}: sync {'scheduled' if scheduled else 'already pending'}")
+        return 'sync scheduled' if scheduled else 'sync already pending'
+
+    if webhook_type == 'ITEM' and webhook_code == 'ERROR':
+        error = payload.get('error') or {}
+        message = error.get('error_message') or 'Plaid reported an error'
+        if error.get('error_code'):
+            message = f"{error['error_code']}: {message}"
+        new_status = record_item_error(list(items.values_list('id', flat=True)), message, error.get('error_code'))
+        logger.warning(f"Plaid Item {item_id} reported an error ({new_status}): {message}")
+        return 'item error recorded'
+
+    if webhook_type == 'ITEM' and webhook_code == 'PENDING_EXPIRATION':
+        # The Item keeps syncing until consent runs out; the user is asked to
+        # go through Link again before then
+        expires_at = parse_datetime(payload.get('consent_expiration_time') or '')
+        record_consent_expiration(list(items.values_list('id', flat=True)), expires_at)
+        logger.warning(f"Consent for Plaid Item {item_id} expires {expires_at.isoformat() if expires_at else 'soon'}")
+        return 'consent expiration recorded'
+
+    if webhook_type == 'ITEM' and webhook_code == 'USER_PERMISSION_REVOKED':
+        # The user has to go through Link again before syncing can continue
+        record_item_error(list(items.values_list('id', flat=True)), f"Plaid: {webhook_code}", webhook_code)
+        logger.warning(f"Plaid Item {item_id} needs attention: {webhook_code}")
+        return 'item error recorded'
+
+    if webhook_type == 'ITEM' and webhook_code == 'NEW_ACCOUNTS_AVAILABLE':
+        from .metadata import forget_item_accounts
+
+        # The next account list shown for mapping must include them
+        forget_item_accounts(plaid_item.access_token)
+        logger.info(f"Plaid Item {item_id} has new accounts available")
+        return 'account list refreshed'
+
+    if webhook_type == 'ITEM' and webhook_code == 'LOGIN_REPAIRED':
+        items.filter(status__in=['error', 'relink_required']).update(
+            status='active',
+            error_message=None,
+            retry_attempts=0,
+            next_retry_at=None,
+            updated_at=timezone.now()
+        )
+        plaid_item.status = 'active'
+        schedule_item_sync(plaid_item)
+        logger.info(f"Plaid Item {item_id} was repaired, sync scheduled")
+        return 'item reactivated'
+
+    logger.info(f"Ignoring {webhook_type} {webhook_code} webhook for Plaid Item {item_id}")
+    return 'ignored'
@@ -2,11 +2,14 @@ import { ButtonStyles as buttonStyles, FormStyles as formStyles, ModalStyles as
 import { useCallback, useRef, useState } from 'react';
 
 import Modal from '../common/Modal';
+import { previewCSVTransactions } from '../../services/transactionService';
 import { useDropzone } from 'react-dropzone';
 
 const CSVUploadModal = ({ isOpen, onClose, onUpload, selectedAccountId }) => {
   const [file, setFile] = useState(null);
+  const [fileContent, setFileContent] = useState(null);
   const [csvData, setCsvData] = useState([]);
+  const [preview, setPreview] = useState(null);
   const [columnMapping, setColumnMapping] = useState({
     date: null,
     description: null,
@@ -14,15 +17,18 @@ const CSVUploadModal = ({ isOpen, onClose, onUpload, selectedAccountId }) => {
     category: null,
     has_header: true
   });
-  const [step, setStep] = useState(1); // 1: File selection, 2: Column mapping
+  const [step, setStep] = useState(1); // 1: File selection, 2: Column mapping, 3: Review
   const [error, setError] = useState(null);
+  const [isPreviewing, setIsPreviewing] = useState(false);
   const [isUploading, setIsUploading] = useState(false);
   const fileInputRef = useRef(null);
 
   // Reset state when modal is closed
   const handleClose = () => {
     setFile(null);
+    setFileContent(null);
     setCsvData([]);
+    setPreview(null);
     setColumnMapping({
       date: null,
       description: null,
@@ -32,6 +38,7 @@ const CSVUploadModal = ({ isOpen, onClose, onUpload, selectedAccountId }) => {
     });
     setStep(1);
     setError(null);
+    setIsPreviewing(false);
     setIsUploading(false);
     onClose();
   };
@@ -57,6 +64,7 @@ const CSVUploadModal = ({ isOpen, onClose, onUpload, selectedAccountId }) => {
     reader.onload = (e) => {
       try {
         const text = e.target.result;
+        setFileContent(text);
         const rows = text.split('\n').map(row => row.split(',').map(cell => cell.trim()));
 
         // Remove empty rows
@@ -121,8 +129,9 @@ const CSVUploadModal = ({ isOpen, onClose, onUpload, selectedAccountId }) => {
     });
   };
 
-  // Handle upload
-  const handleUpload = async () => {
+  // Handle preview: the server parses the file with the chosen mapping and
+  // reports duplicates and new accounts before anything is written
+  const handlePreview = async () => {
     // Validate mapping
     if (columnMapping.date === null || columnMapping.amount === null) {
       setError('Date and Amount columns are required.');
@@ -134,22 +143,38 @@ const CSVUploadModal = ({ isOpen, onClose, onUpload, selectedAccountId }) => {
       return;
     }
 
+    setIsPreviewing(true);
+    setError(null);
+
+    try {
+      const result = await previewCSVTransactions(fileContent, columnMapping, selectedAccountId);
+      setPreview(result);
+      setStep(3);
+    } catch (error) {
+      console.error('Error previewing CSV:', error);
+      setError('Error previewing CSV file. Please check the column mapping.');
+    } finally {
+      setIsPreviewing(false);
+    }
+  };
+
+  // Handle upload
+  const handleUpload = async () => {
     setIsUploading(true);
     setError(null);
 
     try {
-      // Convert file to base64 for sending to the server
-      const reader = new FileReader();
-      reader.readAsText(file);
-      reader.onload = async () => {
-        const fileContent = reader.result;
-
-        // Call the onUpload callback with the file content and column mapping
-        await onUpload(fileContent, columnMapping, selectedAccountId);
-
-        // Close the modal after successful upload
-        handleClose();
-      };
+      // Reuse the rows parsed by the preview; the file content is sent as a
+      // fallback in case the preview has expired
+      await onUpload(
+        fileContent,
+        preview ? preview.column_mapping : columnMapping,
+        selectedAccountId,
+        preview ? preview.upload_token : null
+      );
+
+      // Close the modal after successful upload
+      handleClose();
     } catch (error) {
       console.error('Error uploading CSV:', error);
       setError('Error uploading CSV file. Please try again.');
@@ -309,12 +334,97 @@ const CSVUploadModal = ({ isOpen, onClose, onUpload, selectedAccountId }) => {
             >
               Back
             </button>
+            <button
+              className={buttonStyles.primaryButton}
+              onClick={handlePreview}
+              disabled={isPreviewing || columnMapping.date === null || columnMapping.amount === null}
+            >
+              {isPreviewing ? 'Checking...' : 'Preview'}
+            </button>
+            <button
+              className={buttonStyles.cancelButton}
+              onClick={handleClose}
+              disabled={isPreviewing}
+            >
+              Cancel
+            </button>
+          </div>
+        </div>
+      )}
+
+      {step === 3 && preview && (
+        <div className={modalStyles.modalBody}>
+          <h3>Review Import</h3>
+          {preview.truncated && (
+            <p>This file is large: the counts below are from its first {preview.total} rows.</p>
+          )}
+          <ul>
+            <li>{preview.valid} of {preview.total} rows are ready to import</li>
+            {preview.duplicates > 0 && (
+              <li>{preview.duplicates} rows were already imported and will be skipped</li>
+            )}
+            {preview.failed > 0 && <li>{preview.failed} rows have errors and will be skipped</li>}
+            {preview.date_format && <li>Date format: {preview.date_format}</li>}
+          </ul>
+
+          {preview.accounts.new.length > 0 && (
+            <div className={formStyles.formGroup}>
+              <p>These category accounts will be created:</p>
+              <ul>
+                {preview.accounts.new.map((account) => (
+                  <li key={account.name}>{account.name} ({account.type})</li>
+                ))}
+              </ul>
+            </div>
+          )}
+
+          {preview.errors.length > 0 && (
+            <div className={formStyles.formGroup}>
+              {preview.errors.map((rowError, index) => (
+                <p key={index} className={formStyles.errorText}>{rowError}</p>
+              ))}
+            </div>
+          )}
+
+          <div className={formStyles.previewTable}>
+            <table>
+              <thead>
+                <tr>
+                  <th>Date</th>
+                  <th>Description</th>
+                  <th>Amount</th>
+                  <th>Category</th>
+                </tr>
+              </thead>
+              <tbody>
+                {preview.sample.slice(0, 5).map((row) => (
+                  <tr key={row.row_index}>
+                    <td>{row.date}</td>
+                    <td>{row.description}</td>
+                    <td>{row.amount}</td>
+                    <td>{row.category}</td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+          </div>
+
+          {error && <p className={formStyles.errorText}>{error}</p>}
+
+          <div className={modalStyles.modalFooter}>
+            <button
+              className={buttonStyles.backButton}
+              onClick={() => setStep(2)}
+              disabled={isUploading}
+            >
+              Back
+            </button>
             <button
               className={buttonStyles.primaryButton}
               onClick={handleUpload}
-              disabled={isUploading || columnMapping.date === null || columnMapping.amount === null}
+              disabled={isUploading || preview.valid === 0}
             >
-              {isUploading ? 'Uploading...' : 'Upload'}
+              {isUploading ? 'Importing...' : 'Import'}
             </button>
             <button
               className={buttonStyles.cancelButton}
@@ -1,4 +1,4 @@
-import { mapAccounts, syncTransactions } from '../../services/plaidService';
+import { mapAccounts, syncTransactions, waitForBackfill } from '../../services/plaidService';
 import { useEffect, useState } from 'react';
 
 import Modal from '../common/Modal';
@@ -72,19 +72,40 @@ const PlaidAccountMappingModal = ({
         accountMapping
       );
 
-      // Sync transactions for each mapped account
-      const syncPromises = result.plaid_item_ids.map(id => syncTransactions(id));
-      const syncResults = await Promise.all(syncPromises);
-
-      // Calculate total transactions added
-      const totalAdded = syncResults.reduce((sum, result) => sum + result.added, 0);
-
-      // Show success message
-      showSuccess(`Successfully connected ${result.mapped_accounts} accounts. Added ${totalAdded} transactions.`);
+      if (result.backfill) {
+        // A new bank login: its history is imported in the background. Refresh
+        // as it comes in, so recent transactions show before the import is done
+        showSuccess(`Successfully connected ${result.mapped_accounts} accounts. Importing transactions...`);
+        if (onSuccess) {
+          onSuccess(result);
+        }
 
-      // Call the success callback
-      if (onSuccess) {
-        onSuccess(result);
+        waitForBackfill(result.plaid_item_ids[0], () => onSuccess && onSuccess(result))
+          .then(item => {
+            if (item.backfill_status === 'complete') {
+              showSuccess(`Imported ${item.backfill_transactions} transactions from ${institutionName || 'your bank'}.`);
+            } else {
+              showError(`Importing transactions from ${institutionName || 'your bank'} is delayed: ${item.error_message || 'it will be retried'}`);
+            }
+          })
+          .catch(err => console.error('Error following the transaction import:', err));
+      } else {
+        // Sync transactions for each mapped account
+        const syncPromises = result.plaid_item_ids.map(id => syncTransactions(id));
+        const syncResults = await Promise.all(syncPromises);
+
+        // Calculate total transactions added; accounts of the same bank login
+        // share one sync job, so count each job once
+        const jobResults = new Map(syncResults.map(result => [result.job_id, result]));
+        const totalAdded = [...jobResults.values()].reduce((sum, result) => sum + result.added, 0);
+
+        // Show success message
+        showSuccess(`Successfully connected ${result.mapped_accounts} accounts. Added ${totalAdded} transactions.`);
+
+        // Call the success callback
+        if (onSuccess) {
+          onSuccess(result);
+        }
       }
 
       // Close the modal
@@ -339,7 +339,7 @@ export default function Transactions() {
   };
 
   // Handle CSV upload
-  const handleCSVUpload = async (fileContent, columnMapping, accountId) => {
+  const handleCSVUpload = async (fileContent, columnMapping, accountId, uploadToken = null) => {
     try {
       setLoading(true);
 
@@ -349,14 +349,19 @@ export default function Transactions() {
       console.log('CSV Upload - Account ID:', accountId);
 
       // Call the API to upload CSV transactions
-      const result = await uploadCSVTransactions(fileContent, columnMapping, accountId);
+      const result = await uploadCSVTransactions(fileContent, columnMapping, accountId, uploadToken);
 
       // Debug logging
       console.log('CSV Upload - API response:', result);
 
       // Show success message
       const successCount = result.success || 0;
-      showSuccess(`Successfully imported ${successCount} transactions`);
+      const duplicateCount = result.duplicates || 0;
+      showSuccess(
+        duplicateCount > 0
+          ? `Successfully imported ${successCount} transactions (${duplicateCount} duplicates skipped)`
+          : `Successfully imported ${successCount} transactions`
+      );
 
       // If there were errors, show them
       if (result.errors && result.errors.length > 0) {
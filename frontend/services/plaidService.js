@@ -111,18 +111,63 @@ export const mapAccounts = async (accessToken, itemId, institutionName, accountM
 };
 
 // Sync transactions for a Plaid Item
-export const syncTransactions = async (plaidItemId) => {
+// The sync runs in the background; this polls its job until it finishes and
+// returns the sync results (with the job_id, shared by requests for the same bank login)
+export const syncTransactions = async (plaidItemId, pollInterval = 1000) => {
   try {
     const response = await apiClient.post('/plaid/api/sync_transactions/', {
       plaid_item_id: plaidItemId
     });
-    return response.data;
+
+    let job = response.data;
+    while (job.state === 'queued' || job.state === 'running') {
+      await new Promise(resolve => setTimeout(resolve, pollInterval));
+      job = await getSyncStatus(job.job_id);
+    }
+
+    if (job.state === 'error') {
+      throw new Error(job.error || 'Sync failed');
+    }
+    return { ...job.result, job_id: job.job_id };
   } catch (error) {
     console.error('Error syncing transactions:', error);
     throw error;
   }
 };
 
+// Get the state of a background sync job
+export const getSyncStatus = async (jobId) => {
+  try {
+    const response = await apiClient.get(`/plaid/api/sync_status/${jobId}/`);
+    return response.data;
+  } catch (error) {
+    console.error(`Error fetching sync job ${jobId}:`, error);
+    throw error;
+  }
+};
+
+// Follow the import of a newly linked Plaid Item's transaction history (its backfill)
+// Polls the Item until the backfill is complete or the Item needs attention, calling
+// onProgress with the Item whenever more history has been imported; returns the Item
+export const waitForBackfill = async (plaidItemId, onProgress, pollInterval = 2000) => {
+  let pages = null;
+  while (true) {
+    const item = await getPlaidItem(plaidItemId);
+    if (item.backfill_pages !== pages) {
+      pages = item.backfill_pages;
+      if (onProgress) {
+        onProgress(item);
+      }
+    }
+
+    // A failed chunk is retried later by the backend; stop following it here
+    if (item.backfill_status === 'complete' || item.status !== 'active') {
+      return item;
+    }
+    await new Promise(resolve => setTimeout(resolve, pollInterval));
+  }
+};
+
 // Get all Plaid Items for the current user
 export const getPlaidItems = async () => {
   try {
@@ -143,13 +143,30 @@ export const bulkUpdateTransactions = async (ids, updateData, selectedAccountId)
   }
 };
 
+// Preview a CSV import without writing anything. The returned upload_token
+// can be passed to uploadCSVTransactions to reuse the parsed rows.
+export const previewCSVTransactions = async (fileContent, columnMapping, selectedAccountId) => {
+  try {
+    const response = await apiClient.post('/transactions/preview_csv/', {
+      file_content: fileContent,
+      column_mapping: columnMapping,
+      selected_account_id: selectedAccountId
+    });
+    return response.data;
+  } catch (error) {
+    console.error('Error previewing CSV transactions:', error);
+    throw error;
+  }
+};
+
 // Upload CSV file for transaction import
-export const uploadCSVTransactions = async (fileContent, columnMapping, selectedAccountId) => {
+export const uploadCSVTransactions = async (fileContent, columnMapping, selectedAccountId, uploadToken = null) => {
   try {
     const response = await apiClient.post('/transactions/upload_csv/', {
       file_content: fileContent,
       column_mapping: columnMapping,
-      selected_account_id: selectedAccountId
+      selected_account_id: selectedAccountId,
+      upload_token: uploadToken
     });
     return response.data;
   } catch (error) {